@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+allele_trajectories.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Częstość allelu każdej mutacji m2 w kohortach urodzenia (Year, Decade,
+  FiveYr – jak w merge_homozygosity.load_cohorts), łącznie ze wszystkich replik
+• Podstawa testu oczyszczania (purging): czy częstości silnie szkodliwych
+  alleli maleją w kolejnych kohortach
+
+Jądro obliczeń:
+• Macierz wskaźników osobnik → kohorta ma jedną jedynkę w wierszu, więc
+  przechowywana jest rzadko: osobniki posortowane po kohorcie + granice
+  kohort (układ CSC)
+• Iloczyn dawek (warianty × osobniki) i macierzy wskaźników to sumy
+  odcinków kolumn (np.add.reduceat) → liczby alleli (warianty × kohorty);
+  bez tabel długich i bez groupby po mutacjach
+• Liczniki sumowane są w tablicach mutacje m2 × lata; Decade i FiveYr
+  to ten sam iloczyn zastosowany do kolumn lat
+• Wiersze to mutacje katalogu, nie pozycje: kilka rekordów VCF jednej
+  pozycji trafia do swoich mutacji (M2Index), a rekord wspólny kilku
+  mutacji liczony jest każdej z nich – częstość nigdy nie przekracza 1
+
+Wynik (.parquet, wiersz na mutację m2):
+• mutation_id, position (pozycja SLiM), selection_coef (własny mutacji)
+• multi_hit – pozycja ma kilka mutacji m2 (kolizja pozycji)
+• freq_<poziom>_<kohorta> – częstość allelu (float32)
+• n_<poziom>_<kohorta>    – liczba zgenotypowanych chromosomów (uint32)
+• Metadane: liczba i lista replik
+
+Uruchamianie:
+python allele_trajectories.py --workers 24
+python allele_trajectories.py --start 1 --end 50 --out m2_cohort_freq_1_50.parquet
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from calculate_genetic_load import (
+    BASE_DIR, MUTATION_DATA, decode_m2_blocks, decode_m2_blocks_store, discover_replicates,
+    load_mutation_index, replicate_source,
+)
+from genotype_store import is_store, open_store
+from merge_homozygosity import PED_FILE, load_cohorts
+
+OUT_PARQUET = BASE_DIR / "results" / "m2_cohort_freq.parquet"
+LEVELS = {"Year": 1, "Decade": 10, "FiveYr": 5}  # szerokość kohorty w latach
+
+# ── Rzadka macierz wskaźników kohort ────────────────────────────────────
+
+class CohortIndicator:
+    """
+    Macierz osobniki × kohorty (jedna jedynka w wierszu) w układzie CSC:
+    permutacja osobników posortowanych po kohorcie i początki kohort.
+    codes: kohorta każdego osobnika (indeks 0..n_cohorts−1, −1 = brak).
+    """
+
+    def __init__(self, codes, n_cohorts):
+        codes = np.asarray(codes, dtype=np.int64)
+        self.n_cohorts = n_cohorts
+        self.order = np.flatnonzero(codes >= 0)
+        self.order = self.order[np.argsort(codes[self.order], kind="stable")]
+        self.sizes = np.bincount(codes[self.order], minlength=n_cohorts)
+        self.nonempty = np.flatnonzero(self.sizes)
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])[self.nonempty]
+
+    def sum(self, block):
+        """block (wiersze × osobniki) @ wskaźniki → wiersze × kohorty"""
+        block = np.asarray(block)
+        out = np.zeros((block.shape[0], self.n_cohorts), dtype=np.int64)
+        if len(self.nonempty) and block.shape[0]:
+            out[:, self.nonempty] = np.add.reduceat(
+                block[:, self.order].astype(np.int64), self.starts, axis=1)
+        return out
+
+
+def cohort_codes(samples, birth_year, years):
+    """Indeks roku urodzenia (w tablicy years) dla każdej próbki VCF; −1 gdy brak"""
+    ids = pd.to_numeric(pd.Series(list(samples)), errors="coerce")
+    year = ids.map(birth_year).to_numpy(dtype=np.float64)
+    codes = np.searchsorted(years, np.nan_to_num(year, nan=-1))
+    known = ~np.isnan(year) & (codes < len(years))
+    known[known] &= years[codes[known]] == year[known]
+    return np.where(known, codes, -1)
+
+
+def mutation_keys(mutation_index):
+    """Klucz na osi (pozycja SLiM + 1) każdej mutacji katalogu"""
+    return np.repeat(mutation_index.keys, mutation_index.count)
+
+
+def record_mutations(mutation_index, keys, mutations):
+    """
+    (records, rows): rekordy bloku i wiersze mutacji katalogu, do których
+    trafiają – rekord wspólny (mutations = −1) rozpisany na wszystkie
+    mutacje swojej pozycji.
+    """
+    shared = mutations < 0
+    sites = np.searchsorted(mutation_index.keys, keys[shared])
+    first = mutations.copy()
+    count = np.ones(len(mutations), dtype=np.int64)
+    first[shared] = mutation_index.first[sites]
+    count[shared] = mutation_index.count[sites]
+    records = np.repeat(np.arange(len(mutations)), count)
+    k = np.arange(len(records)) - np.repeat(np.cumsum(count) - count, count)
+    return records, np.repeat(first, count) + k
+
+# ── Jedna replika ───────────────────────────────────────────────────────
+
+def replicate_counts(source, mutation_index, birth_year, years):
+    """
+    Liczniki jednej repliki dla obecnych w niej mutacji m2:
+    (mutation_rows, alt, missing, sizes) – alt / missing: mutacje × lata
+    (allele alternatywne, brakujące genotypy), sizes: osobniki w latach.
+    """
+    if is_store(source):
+        store = open_store(source)
+        samples = store.samples
+        blocks = decode_m2_blocks_store(store, mutation_index, mutations=True)
+    else:
+        from cyvcf2 import VCF
+        vcf = VCF(str(source))
+        samples, blocks = vcf.samples, decode_m2_blocks(vcf, mutation_index, mutations=True)
+
+    indicator = CohortIndicator(cohort_codes(samples, birth_year, years), len(years))
+    rows, alt, missing = [], [], []
+    for _, dosage, keys, mutations in blocks:
+        records, mutation_rows = record_mutations(mutation_index, keys, mutations)
+        rows.append(mutation_rows)
+        alt.append(indicator.sum(np.maximum(dosage, 0))[records])
+        missing.append(indicator.sum(dosage < 0)[records])
+    if not rows:
+        empty = np.zeros((0, len(years)), dtype=np.int64)
+        return np.zeros(0, dtype=np.int64), empty, empty, indicator.sizes
+    return np.concatenate(rows), np.vstack(alt), np.vstack(missing), indicator.sizes
+
+
+_STATE = None
+
+
+def _init_worker(state):
+    """Inicjalizacja procesu roboczego: indeks m2 i kohorty przekazywane raz na proces"""
+    global _STATE
+    _STATE = state
+
+
+def counts_for_folder(folder_id):
+    source = replicate_source(folder_id)
+    if source is None:
+        return folder_id, None
+    return folder_id, replicate_counts(source, *_STATE)
+
+# ── Kohorty i wynik ─────────────────────────────────────────────────────
+
+class CohortCounts:
+    """Liczniki zsumowane po replikach: mutacje m2 × lata urodzenia"""
+
+    def __init__(self, n_mutations, years):
+        self.years = years
+        self.alt = np.zeros((n_mutations, len(years)), dtype=np.int64)
+        self.missing = np.zeros((n_mutations, len(years)), dtype=np.int64)
+        self.chromosomes = np.zeros(len(years), dtype=np.int64)
+        self.folders = []
+
+    def add(self, folder_id, counts):
+        rows, alt, missing, sizes = counts
+        # Wiersze mutacji z rekordów repliki (rekord wspólny – każda mutacja pozycji)
+        np.add.at(self.alt, rows, alt)
+        np.add.at(self.missing, rows, missing)
+        self.chromosomes += 2 * sizes
+        self.folders.append(folder_id)
+
+    def level(self, width):
+        """(etykiety kohort, alt, n) dla kohort o szerokości width lat"""
+        groups = (self.years // width) * width
+        labels, starts = np.unique(groups, return_index=True)
+        if not len(labels):
+            return labels, self.alt, self.alt
+        alt = np.add.reduceat(self.alt, starts, axis=1)
+        missing = np.add.reduceat(self.missing, starts, axis=1)
+        chromosomes = np.add.reduceat(self.chromosomes, starts)
+        return labels, alt, chromosomes[None, :] - 2 * missing
+
+    def to_table(self, mutation_index):
+        """Tabela szeroka: wiersz na mutację m2, kolumny freq_/n_ dla każdego poziomu i kohorty"""
+        columns = {"mutation_id": mutation_index.ids,
+                   "position": mutation_keys(mutation_index) - 1,  # pozycje VCF → pozycje SLiM
+                   "selection_coef": mutation_index.mutation_coefs.astype(np.float32),
+                   "multi_hit": np.repeat(mutation_index.count > 1, mutation_index.count)}
+        for name, width in LEVELS.items():
+            labels, alt, n = self.level(width)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                freq = np.where(n > 0, alt / n, np.nan).astype(np.float32)
+            for k, label in enumerate(labels):
+                columns[f"freq_{name}_{label}"] = freq[:, k]
+                columns[f"n_{name}_{label}"] = n[:, k].astype(np.uint32)
+        table = pa.table(columns)
+        meta = {b"replicates": json.dumps(sorted(self.folders)).encode()}
+        return table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+
+# ── Główna funkcja ──────────────────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-cohort allele frequencies of m2 mutations pooled over replicates.")
+    ap.add_argument("--start", type=int, help="pierwsza replika (domyślnie wszystkie znalezione)")
+    ap.add_argument("--end", type=int, help="ostatnia replika (włącznie)")
+    ap.add_argument("--workers", type=int, default=1, help="liczba procesów równoległych")
+    ap.add_argument("--mutations", default=MUTATION_DATA, help="zrzut mutacji m2 SLiM lub katalog .m2cat")
+    ap.add_argument("--contigs", help="przesunięcia kontigów na osi SLiM (<plik>.contigs.tsv, .fai, GFF3 lub VCF)")
+    ap.add_argument("--ped-file", default=PED_FILE, help="rodowód z datami urodzenia (Excel)")
+    ap.add_argument("--out", default=OUT_PARQUET, help="plik wynikowy .parquet")
+    args = ap.parse_args()
+
+    mutation_index = load_mutation_index(args.mutations, contigs=args.contigs)
+    n_mutations = len(mutation_index.mutation_coefs)
+
+    cohorts = load_cohorts(ped_file=args.ped_file).dropna(subset=["Year"])
+    birth_year = dict(zip(cohorts["ID"], cohorts["Year"]))
+    years = np.unique(cohorts["Year"].to_numpy(dtype=np.int64))
+
+    folder_ids = [f for f in discover_replicates()
+                  if (args.start is None or f >= args.start)
+                  and (args.end is None or f <= args.end)]
+    print(f"Replik do przetworzenia: {len(folder_ids)}, mutacji m2: {n_mutations}, "
+          f"lat urodzenia: {len(years)}")
+
+    totals = CohortCounts(n_mutations, years)
+    state = (mutation_index, birth_year, years)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(state,)) as pool:
+        futs = [pool.submit(counts_for_folder, f) for f in folder_ids]
+        for fut in tqdm(as_completed(futs), total=len(futs), desc="Kohorty m2",
+                        unit="rep", file=sys.stdout):
+            folder_id, counts = fut.result()
+            if counts is not None:
+                totals.add(folder_id, counts)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(totals.to_table(mutation_index), out, compression="zstd")
+    print(f"[✓] Częstości {n_mutations} mutacji m2 z {len(totals.folders)} replik zapisano do: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -7,71 +7,163 @@ Cel:
 • Wczytuje plik wygenerowany przez gfftoslim4.py (feature start end)
 • Zlicza liczbę regionów każdego typu (EXON, INTRON, NC)
 • Oblicza średnie długości i procentowy udział
+
+Profile gęstości (--density):
+• Dla każdego okna (jak w plikach homozygotyczności) liczba i odsetek
+  pozycji EXON / INTRON / NC
+• Pokrycie z tablicy różnicowej na granicach przedziałów
+  (intervals.coverage) – koszt liniowy względem liczby przedziałów i okien,
+  niezależny od długości genomu
+• Wynik .parquet z kolumną window (numer kolumny macierzy homozygotyczności),
+  więc profil dołącza się do okien jednym złączeniem
+• Okna: --layout-from <plik repliki .parquet> (window_layout) albo
+  --window-size/--step-size i długości z <plik>.contigs.tsv (gff_to_slim.py)
+  lub --length
+
+Uruchamianie:
+python analiza_gffslim.py slim_elements.txt
+python analiza_gffslim.py slim_elements.txt --density feature_density.parquet --layout-from output_files/out_1.parquet
+python analiza_gffslim.py bed_to_slim.txt --slim-positions --density feature_density.parquet --length 106932631
 """
 
+import argparse
 import sys
 import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from homozygosity_io import contig_layout, layout_contigs, read_window_layout, window_bounds
+from intervals import coverage, merge
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def merge_intervals(intervals):
-    """Scala nakładające się lub przylegające przedziały"""
-    if not intervals:
-        return []
-    intervals.sort(key=lambda x: x[0])
-    merged = [list(intervals[0])]
-    for s, e in intervals[1:]:
-        if s <= merged[-1][1] + 1:
-            merged[-1][1] = max(merged[-1][1], e)
-        else:
-            merged.append([s, e])
-    return merged
+FEATURES = ("EXON", "INTRON", "NC")
+
+# ── Wczytywanie ─────────────────────────────────────────────────────────
+
+def read_elements(filename, slim_positions=False):
+    """
+    Tabela (feature, start, end); nagłówek i niepoprawne wiersze są pomijane.
+    slim_positions: pozycje SLiM (0-based, np. bed_to_slim.txt) → pozycje VCF (+1).
+    """
+    table = pd.read_csv(filename, sep=r"\s+", header=None, usecols=[0, 1, 2],
+                        names=["feature", "start", "end"], dtype=str)
+    table["feature"] = table["feature"].str.upper()
+    for col in ("start", "end"):
+        table[col] = pd.to_numeric(table[col], errors="coerce")
+    table = table.dropna().astype({"start": np.int64, "end": np.int64})
+    if slim_positions:
+        table[["start", "end"]] += 1
+    return table.reset_index(drop=True)
+
+
+def read_contigs_table(filename):
+    """<plik>.contigs.tsv z gff_to_slim.py: [(contig, offset, length)] lub None"""
+    path = Path(str(filename) + ".contigs.tsv")
+    if not path.exists():
+        return None
+    table = pd.read_csv(path, sep="\t", dtype={"contig": str})
+    return list(table[["contig", "offset", "length"]].itertuples(index=False, name=None))
+
+# ── Podsumowanie ────────────────────────────────────────────────────────
 
 def analyze_file(filename):
-    exon_count = intron_count = nc_count = 0
-    exon_total = intron_total = nc_total = 0
-    intervals = []
-
-    with open(filename, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.startswith("feature"): continue
-            parts = line.strip().split()
-            if len(parts) < 3:
-                continue
-            feature = parts[0].upper()
-            try:
-                start, end = int(parts[1]), int(parts[2])
-            except ValueError:
-                continue
-            intervals.append((start, end))
-            length = end - start + 1
-            if feature == "EXON":
-                exon_count += 1
-                exon_total += length
-            elif feature == "INTRON":
-                intron_count += 1
-                intron_total += length
-            elif feature == "NC":
-                nc_count += 1
-                nc_total += length
-
-    merged = merge_intervals(intervals)
-    total_length = sum(e - s + 1 for s, e in merged)
-    print("Liczba exonów:", exon_count)
-    print("Liczba intronów:", intron_count)
-    print("Liczba regionów NC:", nc_count)
-    print("Średnia długość exonu:", exon_total / max(1, exon_count))
-    print("Średnia długość intronu:", intron_total / max(1, intron_count))
-    print("Średnia długość NC:", nc_total / max(1, nc_count))
-    print("Procent EXON:", exon_total / total_length * 100 if total_length else 0, "%")
-    print("Procent INTRON:", intron_total / total_length * 100 if total_length else 0, "%")
-    print("Procent NC:", nc_total / total_length * 100 if total_length else 0, "%")
+    table = read_elements(filename)
+    lengths = (table["end"] - table["start"] + 1).groupby(table["feature"])
+    counts = {f: int(lengths.size().get(f, 0)) for f in FEATURES}
+    totals = {f: int(lengths.sum().get(f, 0)) for f in FEATURES}
+
+    starts, ends = merge(table["start"].to_numpy(), table["end"].to_numpy())
+    total_length = int((ends - starts + 1).sum())
+    print("Liczba exonów:", counts["EXON"])
+    print("Liczba intronów:", counts["INTRON"])
+    print("Liczba regionów NC:", counts["NC"])
+    print("Średnia długość exonu:", totals["EXON"] / max(1, counts["EXON"]))
+    print("Średnia długość intronu:", totals["INTRON"] / max(1, counts["INTRON"]))
+    print("Średnia długość NC:", totals["NC"] / max(1, counts["NC"]))
+    print("Procent EXON:", totals["EXON"] / total_length * 100 if total_length else 0, "%")
+    print("Procent INTRON:", totals["INTRON"] / total_length * 100 if total_length else 0, "%")
+    print("Procent NC:", totals["NC"] / total_length * 100 if total_length else 0, "%")
     print("Łączna długość regionu:", total_length)
 
+# ── Profile gęstości w oknach ───────────────────────────────────────────
+
+def density_windows(layout, offsets=None):
+    """
+    Okna wszystkich kontigów w kolejności kolumn macierzy homozygotyczności.
+    offsets: nazwa kontigu → przesunięcie w pliku elementów (domyślnie
+    kontigi kolejno, jak w połączonym wyniku gff_to_slim.py).
+    """
+    frames, shift = [], 0
+    for name, length in layout_contigs(layout):
+        starts, ends, centers = window_bounds(length, layout["window_size"], layout["step_size"])
+        offset = offsets.get(name, shift) if offsets else shift
+        frames.append(pd.DataFrame({
+            "contig": name, "window_start": starts, "window_end": ends,
+            "window_center": centers, "offset": offset,
+        }))
+        shift += length
+    windows = pd.concat(frames, ignore_index=True)
+    windows.insert(0, "window", np.arange(len(windows)))
+    if "contigs" not in layout:
+        windows = windows.drop(columns="contig")
+    return windows
+
+
+def feature_density(table, windows):
+    """Dla każdego typu: pozycje okna pokryte elementami (<typ>_bp) i ich odsetek (<typ>_density)"""
+    lo = (windows["window_start"] + windows["offset"]).to_numpy()
+    hi = (windows["window_end"] + windows["offset"]).to_numpy()
+    width = hi - lo + 1
+    out = windows.drop(columns="offset")
+    for feat in FEATURES:
+        sel = table["feature"] == feat
+        bp = coverage(table["start"][sel].to_numpy(), table["end"][sel].to_numpy(), lo, hi)
+        out[f"{feat.lower()}_bp"] = bp
+        out[f"{feat.lower()}_density"] = (bp / width).astype(np.float32)
+    return out
+
+
+def density_layout(args, table):
+    """window_layout okien profilu i przesunięcia kontigów w pliku elementów"""
+    contigs = read_contigs_table(args.file)
+    offsets = {name: offset for name, offset, _ in contigs} if contigs else None
+    if args.layout_from:
+        layout = read_window_layout(args.layout_from)
+        if layout is None:
+            sys.exit(f"Brak window_layout w pliku: {args.layout_from}")
+        return layout, offsets if "contigs" in layout else None
+    if contigs:
+        return contig_layout([(name, length) for name, _, length in contigs],
+                             args.window_size, args.step_size), offsets
+    length = args.length or int(table["end"].max())
+    return contig_layout([("1", length)], args.window_size, args.step_size), None
+
+# ── Główna funkcja ──────────────────────────────────────────────────────
+
 def main():
-    if len(sys.argv) != 2:
-        print("Użycie: python analiza_gff.py <plik.txt>")
-        sys.exit(1)
-    analyze_file(sys.argv[1])
+    ap = argparse.ArgumentParser(description="Summarize SLiM element files; optional windowed feature density.")
+    ap.add_argument("file", help="plik feature/start/end (np. wynik gff_to_slim.py)")
+    ap.add_argument("--density", help="zapisz profile gęstości EXON/INTRON/NC w oknach do .parquet")
+    ap.add_argument("--layout-from", help="okna jak w pliku repliki homozygotyczności (.parquet/.arrow)")
+    ap.add_argument("--window-size", type=int, default=200000)
+    ap.add_argument("--step-size", type=int, default=10000)
+    ap.add_argument("--length", type=int, help="długość genomu (domyślnie koniec ostatniego elementu)")
+    ap.add_argument("--slim-positions", action="store_true",
+                    help="pozycje SLiM 0-based (np. bed_to_slim.txt) zamiast GFF3/VCF")
+    args = ap.parse_args()
+
+    if not args.density:
+        analyze_file(args.file)
+        return
+
+    table = read_elements(args.file, args.slim_positions)
+    layout, offsets = density_layout(args, table)
+    profile = feature_density(table, density_windows(layout, offsets))
+    profile.to_parquet(args.density, index=False)
+    print(f"[✓] Profile gęstości ({len(profile)} okien) zapisano do: {args.density}")
 
 if __name__ == '__main__':
     main()
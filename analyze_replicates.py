@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+analyze_replicates.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Jednoprzebiegowa analiza replik finalout_<id>_genomes.vcf.gz
+  (lub gotowych magazynów finalout_<id>_genomes.gts, patrz genotype_store.py)
+• Każdy VCF dekodowany jest dokładnie raz, a z tego samego bloku
+  genotypów liczone są jednocześnie:
+    ➤ homozygotyczność w oknach przesuwnych (macierz osobniki × okna)
+    ➤ ROH% każdego osobnika (okna >= próg × step_size / długość genomu)
+    ➤ obciążenie m2: suma s dla homozygot i heterozygot, liczba mutacji
+• Wiele kontigów: przy magazynie .gts lub VCF z indeksem .tbi/.csi każdy
+  kontig to osobne zadanie puli (replika × kontig); wyniki kontigów
+  składane są w jedną macierz, a ROH% liczony względem sumy ich długości
+• Statystyki replik na bieżąco (online_stats.py): po każdej zakończonej
+  replice aktualizowane są średnie, wariancje i rezerwuary kwantyli
+  homozygotyczności, ROH% i obciążenia dla osobników i kohort urodzenia;
+  stan i podsumowania z CI zapisywane co --stats-every replik, --resume
+  pomija repliki już dołączone do stanu
+• Wiersze repliki zapisywane są na dysk przed dołączeniem jej do stanu
+  statystyk (partycja zbioru --dataset albo zbioru roboczego
+  <out>_parts scalanego na końcu do --out), więc przerwany przebieg
+  wznowiony przez --resume nie gubi wierszy replik zapisanych w stanie
+
+Dane wyjściowe:
+• output_files/out_<id>.parquet       – macierz homozygotyczności repliki
+                                        (format homozygosity_io.py)
+• results/replicate_summary.parquet   – jeden wiersz na (ID, Folder):
+    ID, Folder, avg_hom, ROH_pct, selection_homo, selection_hetero,
+    mutation_count, selection_total, Year, Decade, FiveYr
+  (--dataset: zamiast jednego pliku partycje Folder=out_<id> zbioru
+  results/replicate_summary_dataset, dopisywane po każdej replice)
+• results/replicate_stats.npz         – stan statystyk online
+• results/replicate_stats_by_id.parquet, ..._by_cohort.parquet –
+  średnie, sd, CI i kwantyle metryk dla osobników i kohort
+
+Uruchamianie:
+python analyze_replicates.py --workers 24
+python analyze_replicates.py --start 1 --end 50 --window-size 200000 --step-size 10000
+python analyze_replicates.py --workers 24 --dataset --resume --stats-every 25
+"""
+
+# ── Importy ─────────────────────────────────────────────────────────────
+import argparse
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from cyvcf2 import VCF
+from tqdm import tqdm
+
+from calculate_genetic_load import (
+    BASE_DIR, LoadAccumulator, discover_replicates, load_mutation_index, replicate_source,
+    report_extra, store_m2_rows
+)
+from genome import GENOME_LENGTH, contig_lengths, has_index, load_contigs
+from genotype_store import is_store, open_store
+from homozygosity_io import quantize, write_homozygosity_matrix
+from merge_homozygosity import PED_FILE, load_cohorts
+from online_stats import open_stats
+from results_dataset import REPLICATE_DATASET, append_partition, read_results
+from roh import ROH_THRESHOLD, roh_pct_from_layout
+from vcf_to_homozygosity import (
+    CHUNK_SIZE, STORE_CHUNK_SIZE, WindowCounter, codes_from_dosage, combine_contigs,
+    encode_genotypes
+)
+
+# ── Ścieżki ─────────────────────────────────────────────────────────────
+HOM_DIR = BASE_DIR / "output_files"
+OUT_PARQUET = BASE_DIR / "results" / "replicate_summary.parquet"
+STATS_FILE = BASE_DIR / "results" / "replicate_stats.npz"
+STATS_METRICS = ("avg_hom", "ROH_pct", "selection_homo", "selection_hetero",
+                 "mutation_count", "selection_total")
+
+# ── Analiza jednej repliki ──────────────────────────────────────────────
+
+def analyze_vcf(vcf, mutation_index, window_size=200000, step_size=10000,
+                chunk_size=CHUNK_SIZE, contigs=None, region=None):
+    """
+    Jeden przebieg po otwartym cyvcf2.VCF (lub po regionie region, np. "2"
+    w zindeksowanym pliku). Warianty kolejnych kontigów trafiają do osobnych
+    liczników okien; obciążenie m2 sumowane jest po wszystkich kontigach.
+    Zwraca (sample_names, contigs, parts, load), parts[k] = (centers, matrix)
+    kontigu k, load to LoadAccumulator.
+    """
+    contigs = list(contig_lengths(vcf) if contigs is None else contigs)
+    discover = not contigs  # VCF bez ##contig – kontigi w kolejności z pliku
+    samples = vcf.samples
+    n_samples = len(samples)
+
+    counters = {name: WindowCounter(length, n_samples, window_size, step_size)
+                for name, length in contigs}
+    load = LoadAccumulator(n_samples)
+    matcher = mutation_index.matcher(vcf)
+
+    code_block = np.empty((chunk_size, n_samples), dtype=np.int8)
+    pos_block = np.empty(chunk_size, dtype=np.int64)
+    m2_block = np.empty((chunk_size, n_samples), dtype=np.int8)
+    coef_block = np.empty(chunk_size)
+    current, n, m = None, 0, 0
+
+    for variant in (vcf(region) if region else vcf):
+        counter = counters.get(variant.CHROM)
+        if counter is None:
+            if not discover:
+                continue
+            contigs.append((variant.CHROM, GENOME_LENGTH))
+            counter = counters[variant.CHROM] = WindowCounter(
+                GENOME_LENGTH, n_samples, window_size, step_size)
+        if counter is not current:
+            if n:
+                current.update(pos_block[:n], code_block[:n])
+            current, n = counter, 0
+
+        # Jedno dekodowanie genotypów na wariant
+        gt = variant.genotype.array()
+        code_block[n] = encode_genotypes(gt)
+        pos_block[n] = variant.POS
+        n += 1
+        if n == chunk_size:
+            current.update(pos_block, code_block)
+            n = 0
+
+        # Mutacja m2 (uwzględnia +1 w pozycjonowaniu i przesunięcie kontigu);
+        # pełny blok liczony przy kolejnym rekordzie m2, bo drugi rekord tej
+        # samej pozycji poprawia współczynnik poprzedniego
+        hit = matcher(variant.CHROM, variant.POS)
+        if hit is not None:
+            if hit[3] is not None:
+                coef_block[m - 1] = hit[3][0]
+            if m == chunk_size:
+                load.update(coef_block, m2_block)
+                m = 0
+            m2_block[m] = gt[:, 0] + gt[:, 1]  # suma alleli
+            coef_block[m] = hit[0]
+            m += 1
+
+    if n:
+        current.update(pos_block[:n], code_block[:n])
+    if m:
+        load.update(coef_block[:m], m2_block[:m])
+    report_extra(matcher.extra)
+
+    return samples, contigs, [counters[name].result() for name, _ in contigs], load
+
+
+def analyze_store(store, mutation_index, window_size=200000, step_size=10000,
+                  chunk_size=STORE_CHUNK_SIZE, contigs=None):
+    """Jak analyze_vcf, ale z magazynu .gts (memmap, bez dekodowania VCF)"""
+    if contigs is None:
+        contigs = contig_lengths(store)
+    samples = store.samples
+    load = LoadAccumulator(len(samples))
+    parts = []
+    for chrom_name, chrom_length in contigs:
+        counter = WindowCounter(chrom_length, len(samples), window_size, step_size)
+        for positions, dosages in store.iter_blocks(chunk_size, chrom=chrom_name):
+            counter.update(positions, codes_from_dosage(dosages))
+        parts.append(counter.result())
+
+        rows, coefs, _, _ = store_m2_rows(store, mutation_index, chrom_name)
+        for start in range(0, len(rows), chunk_size):
+            stop = start + chunk_size
+            load.update(coefs[start:stop], store.dosages(rows[start:stop]))
+    return samples, contigs, parts, load
+
+
+def analyze_part(source, mutation_index, window_size, step_size, contigs=None):
+    """
+    Zadanie puli: cała replika (contigs=None) albo wybrane kontigi –
+    wycinek magazynu .gts lub zapytanie o region w zindeksowanym VCF.
+    """
+    if is_store(source):
+        return analyze_store(open_store(source), mutation_index, window_size,
+                             step_size, contigs=contigs)
+    region = contigs[0][0] if contigs and len(contigs) == 1 and has_index(source) else None
+    return analyze_vcf(VCF(str(source)), mutation_index, window_size, step_size,
+                       contigs=contigs, region=region)
+
+
+def replicate_tasks(folder_id):
+    """
+    Źródło repliki i lista zadań: po jednym na kontig, gdy źródło pozwala
+    czytać kontigi osobno (.gts albo VCF z indeksem), inaczej jedno zadanie.
+    """
+    source = replicate_source(folder_id)
+    if source is None:
+        return None, []
+    contigs = load_contigs(source)
+    if len(contigs) > 1 and (is_store(source) or has_index(source)):
+        return source, [[contig] for contig in contigs]
+    return source, [contigs]
+
+
+def summarize_replicate(folder_id, samples, contigs, parts, load, window_size,
+                        step_size, threshold, hom_dir=HOM_DIR):
+    """Łączy kontigi repliki, zapisuje macierz okien i zwraca ramkę podsumowania"""
+    centers, matrix, layout = combine_contigs(contigs, parts, window_size, step_size)
+    # Te same wartości co w zapisanym pliku kolumnowym (4 miejsca, float32)
+    matrix = quantize(matrix)
+    # Mianownik genomowy: suma długości wszystkich kontigów
+    roh = roh_pct_from_layout(matrix, layout, threshold)
+
+    folder = f"out_{folder_id}"
+    write_homozygosity_matrix(Path(hom_dir) / f"{folder}.parquet", samples, centers, matrix, layout)
+
+    summary = load.to_frame(samples, folder, carriers_only=False)
+    summary.insert(2, "avg_hom", matrix.mean(axis=1))
+    summary.insert(3, "ROH_pct", roh)
+    return summary
+
+
+def analyze_replicate(folder_id, mutation_index, window_size, step_size,
+                      threshold, hom_dir=HOM_DIR):
+    """Analizuje replikę (wszystkie kontigi w jednym procesie), zwraca ramkę podsumowania"""
+    source = replicate_source(folder_id)
+    if source is None:
+        return None
+    samples, contigs, parts, load = analyze_part(source, mutation_index, window_size, step_size)
+    return summarize_replicate(folder_id, samples, contigs, parts, load,
+                               window_size, step_size, threshold, hom_dir)
+
+
+_MUTATION_INDEX = None
+
+
+def _init_worker(mutation_index):
+    """Inicjalizacja procesu roboczego: indeks m2 przekazywany raz na proces"""
+    global _MUTATION_INDEX
+    _MUTATION_INDEX = mutation_index
+
+
+def analyze_task(source, window_size, step_size, contigs):
+    """Zadanie puli (replika × kontig) z indeksem m2 procesu roboczego"""
+    return analyze_part(source, _MUTATION_INDEX, window_size, step_size, contigs)
+
+# ── Główna funkcja ──────────────────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Fused homozygosity / ROH / m2 load pass.")
+    ap.add_argument("--start", type=int, help="pierwsza replika (domyślnie: wszystkie)")
+    ap.add_argument("--end", type=int, help="ostatnia replika (włącznie)")
+    ap.add_argument("--workers", type=int, default=24,
+                    help="liczba procesów równoległych")
+    ap.add_argument("--window-size", type=int, default=200000)
+    ap.add_argument("--step-size", type=int, default=10000)
+    ap.add_argument("--roh-threshold", type=float, default=ROH_THRESHOLD)
+    ap.add_argument("--out", type=Path, default=OUT_PARQUET)
+    ap.add_argument("--contigs", help="przesunięcia kontigów na osi SLiM dla mutacji m2 "
+                                      "(<plik>.contigs.tsv, .fai, GFF3 lub VCF)")
+    ap.add_argument("--dataset", action="store_true",
+                    help="dopisuj każdą replikę jako partycję zbioru wyników zamiast jednego pliku")
+    ap.add_argument("--stats", type=Path, default=STATS_FILE,
+                    help="plik stanu statystyk online (.npz)")
+    ap.add_argument("--stats-every", type=int, default=10,
+                    help="zapis stanu i podsumowań z CI co tyle replik")
+    ap.add_argument("--resume", action="store_true",
+                    help="kontynuuj stan --stats, pomijając dołączone już repliki "
+                         "(--out: dopisanie do istniejącego pliku)")
+    args = ap.parse_args()
+
+    stats = open_stats(args.stats, STATS_METRICS, resume=args.resume)
+    # Zbiór roboczy wierszy replik (bez --dataset), scalany na końcu do --out
+    parts_dir = args.out.parent / f"{args.out.stem}_parts"
+    if not args.resume and parts_dir.exists():
+        shutil.rmtree(parts_dir)
+    folder_ids = [f for f in discover_replicates()
+                  if (args.start is None or f >= args.start)
+                  and (args.end is None or f <= args.end)
+                  and f"out_{f}" not in stats]
+    print(f"Replik do przetworzenia: {len(folder_ids)}"
+          + (f" (w stanie statystyk: {len(stats.folders)})" if stats.folders else ""))
+
+    # Kohorty urodzenia z rodowodu – dołączane do każdej repliki
+    cohorts = None
+    if PED_FILE.exists():
+        cohorts = load_cohorts()
+        cohorts["ID"] = cohorts["ID"].astype(str)
+
+    mutation_index = load_mutation_index(contigs=args.contigs)
+
+    # Zadania (replika, kontig): kontigi jednej repliki liczone równolegle,
+    # replika składana i zapisywana, gdy skończą się wszystkie jej kontigi
+    tasks = []
+    for folder_id in folder_ids:
+        source, parts = replicate_tasks(folder_id)
+        tasks.extend((folder_id, source, k, contigs) for k, contigs in enumerate(parts))
+    pending = {}
+    for folder_id, *_ in tasks:
+        pending[folder_id] = pending.get(folder_id, 0) + 1
+
+    done = {}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(mutation_index,)) as pool:
+        futs = {pool.submit(analyze_task, source, args.window_size,
+                            args.step_size, contigs): (folder_id, k)
+                for folder_id, source, k, contigs in tasks}
+        for fut in tqdm(as_completed(futs),
+                        total=len(futs),
+                        desc="Analiza replik", unit="zad",
+                        file=sys.stdout):
+            folder_id, k = futs[fut]
+            done.setdefault(folder_id, {})[k] = fut.result()
+            if len(done[folder_id]) < pending[folder_id]:
+                continue
+            by_part = done.pop(folder_id)
+            results = [by_part[i] for i in range(pending[folder_id])]
+            load = results[0][3]
+            for part in results[1:]:
+                load.add(part[3])
+            frame = summarize_replicate(
+                folder_id, results[0][0],
+                [c for part in results for c in part[1]],
+                [p for part in results for p in part[2]],
+                load, args.window_size, args.step_size, args.roh_threshold
+            )
+            frame["ID"] = frame["ID"].astype(str)
+            if cohorts is not None:
+                frame = frame.merge(cohorts, on="ID", how="left")
+
+            # Wiersze repliki na dysk przed zapisem stanu, który ją pomija
+            append_partition(frame, REPLICATE_DATASET if args.dataset else parts_dir,
+                             frame["Folder"].iloc[0])
+            # Statystyki online: replika dołączana zaraz po zakończeniu
+            stats.add(frame)
+            if args.stats_every and len(stats.folders) % args.stats_every == 0:
+                stats.save(args.stats)
+                stats.write_summaries(args.stats)
+
+    if not stats.folders:
+        print("Brak replik do zapisania.")
+        return
+    stats.save(args.stats)
+    out_id, out_cohort = stats.write_summaries(args.stats)
+    print(f"[✓] Statystyki {len(stats.folders)} replik zapisano do: {out_id}, {out_cohort}")
+
+    if args.dataset:
+        print(f"[✓] Repliki dopisano do zbioru: {REPLICATE_DATASET}")
+        return
+    if not parts_dir.exists():
+        return
+    # Repliki z tego przebiegu (i przerwanego, wznawianego przez --resume)
+    staged = read_results(parts_dir)
+    staged = staged[["ID", "Folder"] + [c for c in staged.columns if c not in ("ID", "Folder")]]
+    frames = [staged]
+    # --resume: wiersze replik z wcześniejszych przebiegów zostają w pliku
+    if args.resume and args.out.exists():
+        previous = pd.read_parquet(args.out)
+        previous["ID"] = previous["ID"].astype(str)
+        frames.insert(0, previous[~previous["Folder"].isin(set(staged["Folder"]))])
+    summary = (pd.concat(frames, ignore_index=True)
+                 .sort_values(["Folder", "ID"], ignore_index=True))
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_parquet(args.out, index=False)
+    shutil.rmtree(parts_dir)
+    print(f"[✓] Zapisano {len(summary)} wierszy do: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bgzf_index.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Kompresja VCF replik do BGZF (bloki gzip ≤ 64 KB, jak bgzip)
+  z indeksem tabix (.tbi) lub CSI (.csi) – zapytania o regiony
+  (vcf("chr:start-end")) bez rozpakowywania całego pliku
+• Strumieniowo: plik czytany wiersz po wierszu, indeks budowany
+  w tym samym przebiegu; zwykłe archiwa .gz (gzip finalout_*.vcf)
+  można przepakować do BGZF bez pliku pośredniego
+• Czysty Python (zlib) – bez pysam i bez programów bgzip/tabix
+
+Uruchamianie:
+python bgzf_index.py finalout_*_genomes.vcf.gz --workers 24
+python bgzf_index.py finalout_17_genomes.vcf --csi
+"""
+
+import argparse
+import gzip
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from tqdm import tqdm
+
+# ── BGZF ────────────────────────────────────────────────────────────────
+BGZF_BLOCK_SIZE = 0xFF00   # maks. dane nieskompresowane w bloku (jak htslib)
+BGZF_HEADER = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+# Parametry binowania: tabix = 14 bitów, 5 poziomów (zakres do 2^29 pz)
+MIN_SHIFT = 14
+DEPTH = 5
+
+
+def is_bgzf(path):
+    """Czy plik zaczyna się nagłówkiem bloku BGZF"""
+    with open(path, "rb") as fh:
+        head = fh.read(16)
+    return len(head) == 16 and head[:4] == BGZF_HEADER[:4] and head[12:14] == b"BC"
+
+
+class BgzfWriter:
+    """Zapis strumienia jako bloki BGZF; tell() zwraca wirtualny offset"""
+
+    def __init__(self, path, level=6):
+        self.fh = open(path, "wb")
+        self.level = level
+        self.buffer = bytearray()
+        self.block_offset = 0   # offset skompresowany bieżącego bloku
+
+    def tell(self):
+        return (self.block_offset << 16) | len(self.buffer)
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self._flush_block(BGZF_BLOCK_SIZE)
+
+    def _flush_block(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        comp = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        deflated = comp.compress(data) + comp.flush()
+        block = (BGZF_HEADER + struct.pack("<H", len(deflated) + 25) + deflated
+                 + struct.pack("<II", zlib.crc32(data), len(data)))
+        self.fh.write(block)
+        self.block_offset += len(block)
+
+    def close(self):
+        if self.buffer:
+            self._flush_block(len(self.buffer))
+        self.fh.write(BGZF_EOF)
+        self.fh.close()
+
+# ── Indeks (binowanie jak w htslib) ─────────────────────────────────────
+
+def reg2bin(beg, end, min_shift=MIN_SHIFT, depth=DEPTH):
+    """Najmniejszy bin zawierający [beg, end) (0-based)"""
+    end -= 1
+    s, t = min_shift, ((1 << (3 * depth)) - 1) // 7
+    for level in range(depth, 0, -1):
+        if beg >> s == end >> s:
+            return t + (beg >> s)
+        s += 3
+        t -= 1 << (3 * level - 3)
+    return 0
+
+
+def bin_first_window(bin_no, min_shift=MIN_SHIFT, depth=DEPTH):
+    """Pierwsze okno liniowe (2^min_shift pz) obejmowane przez bin"""
+    level, first = 0, 0
+    while bin_no >= first + (1 << (3 * level)):
+        first += 1 << (3 * level)
+        level += 1
+    return (bin_no - first) << (3 * (depth - level))
+
+
+class RefIndex:
+    """Biny (z listą fragmentów) i indeks liniowy jednego kontigu"""
+
+    def __init__(self):
+        self.bins = {}
+        self.linear = []
+
+    def add(self, beg, end, v_start, v_end):
+        chunks = self.bins.setdefault(reg2bin(beg, end), [])
+        if chunks and chunks[-1][1] == v_start:
+            chunks[-1][1] = v_end
+        else:
+            chunks.append([v_start, v_end])
+        last = (end - 1) >> MIN_SHIFT
+        if len(self.linear) <= last:
+            self.linear.extend([0] * (last + 1 - len(self.linear)))
+        for w in range(beg >> MIN_SHIFT, last + 1):
+            if self.linear[w] == 0:
+                self.linear[w] = v_start
+
+    def filled_linear(self):
+        """Puste okna dostają offset poprzedniego (jak htslib)"""
+        out = list(self.linear)
+        for w in range(1, len(out)):
+            if out[w] == 0:
+                out[w] = out[w - 1]
+        return out
+
+
+def _tabix_header(names):
+    # format VCF (2), kolumny seq/beg/end = 1/2/0, znak komentarza '#', skip = 0
+    blob = b"".join(n.encode() + b"\0" for n in names)
+    return struct.pack("<iiiiii", 2, 1, 2, 0, ord("#"), 0) + struct.pack("<i", len(blob)) + blob
+
+
+def write_tbi(path, names, refs):
+    out = BgzfWriter(path)
+    out.write(b"TBI\1" + struct.pack("<i", len(names)) + _tabix_header(names))
+    for name in names:
+        ref = refs[name]
+        out.write(struct.pack("<i", len(ref.bins)))
+        for bin_no in sorted(ref.bins):
+            chunks = ref.bins[bin_no]
+            out.write(struct.pack("<Ii", bin_no, len(chunks)))
+            out.write(b"".join(struct.pack("<QQ", *c) for c in chunks))
+        linear = ref.filled_linear()
+        out.write(struct.pack("<i", len(linear)) + struct.pack(f"<{len(linear)}Q", *linear))
+    out.close()
+
+
+def write_csi(path, names, refs):
+    out = BgzfWriter(path)
+    aux = _tabix_header(names)
+    out.write(b"CSI\1" + struct.pack("<iii", MIN_SHIFT, DEPTH, len(aux)) + aux)
+    out.write(struct.pack("<i", len(names)))
+    for name in names:
+        ref = refs[name]
+        linear = ref.filled_linear()
+        out.write(struct.pack("<i", len(ref.bins)))
+        for bin_no in sorted(ref.bins):
+            chunks = ref.bins[bin_no]
+            w = bin_first_window(bin_no)
+            loff = linear[w] if w < len(linear) else chunks[0][0]
+            out.write(struct.pack("<IQi", bin_no, loff, len(chunks)))
+            out.write(b"".join(struct.pack("<QQ", *c) for c in chunks))
+    out.close()
+
+# ── Kompresja + indeksowanie VCF ────────────────────────────────────────
+
+def _open_text(path):
+    """VCF zwykły lub skompresowany (gzip/BGZF – wieloczłonowy gzip)"""
+    with open(path, "rb") as fh:
+        magic = fh.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else open(path, "rb")
+
+
+def index_path(vcf_gz, csi=False):
+    return Path(str(vcf_gz) + (".csi" if csi else ".tbi"))
+
+
+def bgzip_vcf(src, dst=None, csi=False, level=6, force=False):
+    """
+    Zapisuje src (VCF, .vcf.gz lub BGZF) jako BGZF z indeksem.
+    dst domyślnie: src z końcówką .gz (dla .vcf) lub src (przepakowanie
+    w miejscu). Zapis przez pliki tymczasowe; zwraca ścieżkę BGZF.
+    Pominięcie, gdy dst jest już BGZF z indeksem (chyba że force).
+    """
+    src = Path(src)
+    dst = Path(dst) if dst else (src if src.suffix == ".gz" else src.with_name(src.name + ".gz"))
+    idx = index_path(dst, csi)
+    if not force and dst.exists() and idx.exists() and is_bgzf(dst):
+        return dst
+
+    tmp = dst.with_name(dst.name + ".tmp")
+    tmp_idx = idx.with_name(idx.name + ".tmp")
+    out = BgzfWriter(tmp, level)
+    names, refs = [], {}
+
+    with _open_text(src) as fh:
+        for line in fh:
+            if line.startswith(b"#"):
+                out.write(line)
+                continue
+            fields = line.split(b"\t", 4)
+            chrom = fields[0].decode()
+            beg = int(fields[1]) - 1
+            end = beg + max(1, len(fields[3]))
+            if chrom not in refs:
+                names.append(chrom)
+                refs[chrom] = RefIndex()
+            v_start = out.tell()
+            out.write(line)
+            refs[chrom].add(beg, end, v_start, out.tell())
+    out.close()
+
+    (write_csi if csi else write_tbi)(tmp_idx, names, refs)
+    os.replace(tmp, dst)
+    os.replace(tmp_idx, idx)
+    if src != dst and src.suffix != ".gz":
+        src.unlink()
+    return dst
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="BGZF-compress and index replicate VCFs (tabix/CSI).")
+    ap.add_argument("vcf", nargs="+", help="pliki .vcf lub .vcf.gz")
+    ap.add_argument("--csi", action="store_true", help="indeks CSI zamiast .tbi")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--force", action="store_true", help="przepakuj także pliki już zindeksowane")
+    args = ap.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futs = {pool.submit(bgzip_vcf, v, None, args.csi, 6, args.force): v for v in args.vcf}
+        for fut in tqdm(as_completed(futs), total=len(futs), desc="BGZF"):
+            fut.result()
+
+if __name__ == "__main__":
+    main()
@@ -11,119 +11,586 @@ Cel:
 • Dane łączone są z rokiem urodzenia (Year) z ROH
 • Wynik to jeden plik .parquet (np. part1.parquet), który później scala merge_mut.py
 
+Jądro obliczeń:
+• Mutacje m2 z binarnego katalogu (mutation_catalog.py, memmap) budowanego
+  raz z pliku SLiM i odświeżanego po zmianie pliku
+• Pozycje m2 wyszukiwane są w indeksie zbudowanym raz (M2Index: pozycja → s);
+  kilka mutacji w jednej pozycji – jeden współczynnik na rekord VCF (k-ty
+  rekord pozycji = k-ta mutacja), --collisions tylko dla pozycji z jednym
+  rekordem (np. sum nie jest już liczony raz na każdy rekord)
+• Wiele kontigów: rekord (CHROM, POS) przeliczany na oś pozycji SLiM
+  przesunięciem kontigu (--contigs: <plik>.contigs.tsv z gff_to_slim.py,
+  .fai, GFF3 lub VCF); bez --contigs tylko pierwszy kontig, pozostałe
+  pomijane z ostrzeżeniem
+• Genotypy nośników trafiają do bloku NumPy; sumy homo/hetero i liczby
+  mutacji akumulowane są w tablicach o długości liczby osobników
+• Pamięć zależy od liczby osobników, a nie od liczby wariantów × osobników
+
+Wczytywanie:
+• Pliki .vcf.gz czytane są bezpośrednio (bez rozpakowania do /tmp)
+• Jeśli obok VCF istnieje aktualny magazyn finalout_<id>_genomes.gts
+  (genotype_store.py), genotypy m2 czytane są z niego przez memmap
+• Wątek tła dekoduje kolejną replikę, gdy bieżąca jest liczona
+  (kolejka ograniczona do PREFETCH_DEPTH bloków)
+
+Klasy regionów (--regions):
+• Mutacje m2 etykietowane klasą EXON / INTRON / NC z tabeli elementów SLiM
+  (bed_to_slim.txt; intervals.RegionIndex – jedno searchsorted na blok)
+• Dodatkowe kolumny selection_homo_<klasa>, selection_hetero_<klasa>,
+  mutation_count_<klasa> dla każdego osobnika
+
+Scenariusze dominacji (--dominance):
+• Model SLiM (founders_sim_slim) ma m2 z h = 0.5; dla kilku h naraz
+  (domyślnie 0, 0.1, 0.25, 0.5) w tym samym przebiegu po VCF:
+    – realized_load = Σ_hom s + h·Σ_het s (obciążenie ujawnione)
+    – masked_load   = (1 − h)·Σ_het s     (obciążenie ukryte)
+    – fitness       = Π_hom (1 + s) · Π_het (1 + h·s)   (jak w SLiM, ≥ 0)
+• Macierze nośników bloku budowane raz; log-dopasowanie wszystkich h to
+  jeden iloczyn macierzy (scenariusze × warianty) @ (warianty × osobniki)
+• Wynik w jednej tabeli z kolumną h (wiersz na osobnika i scenariusz);
+  przy --dataset zbiór results/genetic_load_dominance_dataset
+
+Tryb równoległy:
+• Bez --start/--end wyszukiwane są wszystkie pliki finalout_*_genomes.vcf.gz
+• --workers N rozdziela repliki na pulę N procesów (jak merge_homozygosity.collect)
+• Wynik trafia do jednego pliku .parquet albo (--dataset) do zbioru
+  results/genetic_load_dataset partycjonowanego po Folder (patrz results_dataset.py)
+
 Uruchamianie:
 python vcf_to_genetic_load.py --start 1 --end 50 --out part1.parquet
+python calculate_genetic_load.py --workers 24 --out genetic_load_combined.parquet
+python calculate_genetic_load.py --workers 24 --regions bed_to_slim.txt
+python calculate_genetic_load.py --workers 24 --dominance 0 0.1 0.25 0.5 --out genetic_load_dominance.parquet
 """
 
 # ── Importy ─────────────────────────────────────────────────────────────
 import pandas as pd
+import numpy as np
 import cyvcf2
-import os
-import gzip
-import shutil
 import argparse
+import queue
+import re
+import sys
+import threading
+from itertools import chain, groupby
+from operator import itemgetter
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-
-# ── Argumenty wejściowe ─────────────────────────────────────────────────
-parser = argparse.ArgumentParser(description="Batch VCF processing for selection coefficients.")
-parser.add_argument("--start", type=int, required=True, help="Start folder ID.")
-parser.add_argument("--end", type=int, required=True, help="End folder ID (inclusive).")
-parser.add_argument("--out", type=str, required=True, help="Output Parquet file name.")
-args = parser.parse_args()
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from genome import contig_lengths, load_offsets
+from genotype_store import is_store, is_up_to_date, open_store, store_path
+from intervals import load_regions
+from mutation_catalog import COLLISION_RULES, open_catalog
+from results_dataset import (DOMINANCE_DATASET, HOM_DATASET, LOAD_DATASET, append_partition,
+                             read_results)
 
 # ── Ścieżki ─────────────────────────────────────────────────────────────
 BASE_DIR = Path("/media/raid/home/kpatan/slim/homozygosity")
 VCF_DIR = Path("/media/raid/home/kpatan/slim/py_ped_sim")
 MUTATION_DATA = Path("/media/raid/home/kpatan/slim/mutations_output_final_m2.txt")
 YEAR_DATA = BASE_DIR / "results" / "homozyg_100rep.parquet"
-OUT_PARQUET = BASE_DIR / "results" / args.out
+
+# Liczba wariantów m2 zbieranych do jednego bloku genotypów
+CHUNK_SIZE = 1024
+
+# Maksymalna liczba zdekodowanych bloków czekających w kolejce prefetch
+PREFETCH_DEPTH = 8
+
+# Scenariusze współczynnika dominacji h dla --dominance bez wartości
+DOMINANCE_H = (0.0, 0.1, 0.25, 0.5)
+
+RESULT_COLUMNS = [
+    "ID", "Folder", "selection_homo", "selection_hetero",
+    "mutation_count", "selection_total", "Year"
+]
 
 # ── Wczytanie danych pomocniczych ──────────────────────────────────────
-# Informacje o mutacjach m2 i ich współczynnikach selekcyjnych
-mutation_df = pd.read_csv(
-    MUTATION_DATA, sep="\t", 
-    names=["Mutation_ID", "Position", "Type", "selection_coef"]
-)
-mutation_df["Position"] = mutation_df["Position"].astype(int)
 
-# Informacje o latach urodzenia osobników z ROH
-year_data = pd.read_parquet(YEAR_DATA)[["ID", "Year"]].drop_duplicates()
-year_data["ID"] = year_data["ID"].astype(str)  # identyfikatory z VCF są tekstowe
+def load_mutation_index(path=MUTATION_DATA, collisions="first", contigs=None):
+    """
+    Wczytuje mutacje m2 z katalogu .m2cat (budowanego przy pierwszym użyciu
+    lub po zmianie pliku) i buduje indeks (M2Index): pozycja w VCF → współczynnik
+    selekcji. Pozycje SLiM są 0-based, więc kluczem jest Position + 1.
+    Kilka mutacji w tej samej pozycji: reguła collisions (first = pierwsza
+    z pliku, jak dotąd iloc[0]; min / mean / sum – patrz mutation_catalog).
+    contigs: plik z przesunięciami kontigów na osi SLiM (genome.load_offsets).
+    """
+    catalog = open_catalog(path)
+    n_multi = len(catalog.multi_hits)
+    if n_multi:
+        extra = int(catalog.multi_hits[:, 2].sum()) - n_multi
+        print(f"[!] {n_multi} pozycji m2 z kilkoma mutacjami ({extra} dodatkowych) "
+              f"– współczynnik na rekord VCF, przy jednym rekordzie wg reguły '{collisions}'")
+    offsets = load_offsets(contigs) if contigs else None
+    return catalog.index(collisions, offsets)
+
+
+def load_year_data(path=YEAR_DATA):
+    """
+    Informacje o latach urodzenia osobników z ROH.
+    Jeśli istnieje zbiór results/homozyg_dataset, czytane są z niego
+    tylko kolumny ID i Year (bez wczytywania całych plików).
+    """
+    if path == YEAR_DATA and HOM_DATASET.exists():
+        year_data = read_results(HOM_DATASET, columns=["ID", "Year"])
+    else:
+        year_data = pd.read_parquet(path, columns=["ID", "Year"])
+    year_data = year_data.drop_duplicates()
+    year_data["ID"] = year_data["ID"].astype(str)  # identyfikatory z VCF są tekstowe
+    return year_data
+
+# ── Jądro: obciążenie genetyczne jednej repliki ─────────────────────────
+
+def decode_m2_blocks(vcf, mutation_index, chunk_size=CHUNK_SIZE, mutations=False):
+    """
+    Dekoduje genotypy mutacji m2 z obiektu cyvcf2.VCF.
+    Zwraca bloki (coefs, allele_sums, positions), gdzie allele_sums ma kształt
+    (liczba wariantów w bloku × liczba osobników), a positions to pozycje VCF
+    na osi SLiM (offset kontigu + POS). mutations=True – czwarty element:
+    wiersz mutacji w katalogu (−1 – rekord wspólny kilku mutacji pozycji).
+    """
+    n_samples = len(vcf.samples)
+    matcher = mutation_index.matcher(vcf)
+    gt_block = np.empty((chunk_size, n_samples), dtype=np.int8)
+    coef_block = np.empty(chunk_size)
+    pos_block = np.empty(chunk_size, dtype=np.int64)
+    mut_block = np.empty(chunk_size, dtype=np.int64)
+
+    def block(n):
+        out = coef_block[:n], gt_block[:n], pos_block[:n]
+        return out + (mut_block[:n],) if mutations else out
+
+    n = 0
+    for variant in vcf:
+        # Znajdź pasującą mutację m2 (uwzględnia +1 w pozycjonowaniu i kontig)
+        hit = matcher(variant.CHROM, variant.POS)
+        if hit is None:
+            continue
+        coef, key, mutation, previous = hit
+        if previous is not None:
+            # Drugi rekord tej samej pozycji: poprawka współczynnika poprzedniego
+            coef_block[n - 1], mut_block[n - 1] = previous
+        # Pełny blok oddawany dopiero przy kolejnym rekordzie (możliwa poprawka)
+        if n == chunk_size:
+            yield block(n)
+            gt_block = np.empty((chunk_size, n_samples), dtype=np.int8)
+            coef_block = np.empty(chunk_size)
+            pos_block = np.empty(chunk_size, dtype=np.int64)
+            mut_block = np.empty(chunk_size, dtype=np.int64)
+            n = 0
+        gt = variant.genotype.array()
+        gt_block[n] = gt[:, 0] + gt[:, 1]  # suma alleli
+        coef_block[n], pos_block[n], mut_block[n] = coef, key, mutation
+        n += 1
+    if n:
+        yield block(n)
+    report_extra(matcher.extra)
+
+
+class LoadAccumulator:
+    """
+    Sumy obciążenia m2 dla każdego osobnika, aktualizowane blokami
+    (coefs, allele_sums) – allele_sums: warianty × osobniki.
+    Z indeksem regions (intervals.RegionIndex) i pozycjami wariantów sumy
+    liczone są też osobno dla każdej klasy regionu (klasy × osobniki).
+    Z listą dominance (wartości h) – log-dopasowanie każdego scenariusza
+    (scenariusze × osobniki); obciążenia są liniowe w h, więc wynikają z sum s.
+    """
+
+    def __init__(self, n_samples, regions=None, dominance=None):
+        self.sel_homo = np.zeros(n_samples)
+        self.sel_hetero = np.zeros(n_samples)
+        self.mutation_count = np.zeros(n_samples, dtype=np.int64)
+        self.regions = regions
+        if regions is not None:
+            n_classes = len(regions.classes)
+            self.region_homo = np.zeros((n_classes, n_samples))
+            self.region_hetero = np.zeros((n_classes, n_samples))
+            self.region_count = np.zeros((n_classes, n_samples), dtype=np.int64)
+        self.dominance = None if dominance is None else np.asarray(dominance, dtype=np.float64)
+        if self.dominance is not None:
+            self.log_w_homo = np.zeros(n_samples)
+            self.log_w_hetero = np.zeros((len(self.dominance), n_samples))
+
+    def update(self, s, allele_sums, positions=None):
+        # suma alleli: 2 = homozygota szkodliwa, 1 = heterozygota
+        homo = allele_sums == 2
+        hetero = allele_sums == 1
+        self.sel_homo += 2 * (s @ homo)
+        self.sel_hetero += s @ hetero
+        self.mutation_count += 2 * homo.sum(axis=0) + hetero.sum(axis=0)
+        if self.regions is not None and positions is not None:
+            # Pozycje VCF są o 1 większe od pozycji SLiM w tabeli regionów
+            one_hot = self.regions.one_hot(np.asarray(positions) - 1)
+            weighted = (one_hot * s[:, None]).T  # klasy × warianty
+            self.region_homo += 2 * (weighted @ homo)
+            self.region_hetero += weighted @ hetero
+            self.region_count += one_hot.T.astype(np.int64) @ (2 * homo + hetero)
+        if self.dominance is not None:
+            # log(1 + h·s) dla wszystkich scenariuszy naraz; SLiM przycina
+            # dopasowanie do 0 (s < −1), tu do najmniejszej liczby dodatniej
+            tiny = np.finfo(np.float64).tiny
+            self.log_w_homo += np.log(np.maximum(1 + s, tiny)) @ homo
+            self.log_w_hetero += np.log(np.maximum(1 + np.outer(self.dominance, s), tiny)) @ hetero
+
+    def add(self, other):
+        """Dodaje sumy innego akumulatora (np. z innego kontigu tej samej repliki)"""
+        self.sel_homo += other.sel_homo
+        self.sel_hetero += other.sel_hetero
+        self.mutation_count += other.mutation_count
+        if self.regions is not None and other.regions is not None:
+            self.region_homo += other.region_homo
+            self.region_hetero += other.region_hetero
+            self.region_count += other.region_count
+        if self.dominance is not None and other.dominance is not None:
+            self.log_w_homo += other.log_w_homo
+            self.log_w_hetero += other.log_w_hetero
+        return self
+
+    def to_frame(self, samples, folder_id, carriers_only=True):
+        """
+        Ramka (ID, Folder, selection_homo, selection_hetero, mutation_count,
+        selection_total); domyślnie tylko nośnicy co najmniej jednej mutacji.
+        """
+        rows = self.mutation_count > 0 if carriers_only else slice(None)
+        sum_df = pd.DataFrame({
+            "ID": np.asarray(samples, dtype=object)[rows],
+            "Folder": folder_id,
+            "selection_homo": self.sel_homo[rows],
+            "selection_hetero": self.sel_hetero[rows],
+            "mutation_count": self.mutation_count[rows],
+        })
+        sum_df["selection_total"] = sum_df["selection_homo"] + sum_df["selection_hetero"]
+        if self.regions is not None:
+            for k, name in enumerate(self.regions.classes):
+                name = name.lower()
+                sum_df[f"selection_homo_{name}"] = self.region_homo[k][rows]
+                sum_df[f"selection_hetero_{name}"] = self.region_hetero[k][rows]
+                sum_df[f"mutation_count_{name}"] = self.region_count[k][rows]
+        if self.dominance is not None:
+            sum_df = self.dominance_frame(sum_df, rows)
+        return sum_df
+
+    def dominance_frame(self, sum_df, rows):
+        """Ramka wydłużona o scenariusze: wiersz na (osobnik, h)"""
+        homo = self.sel_homo[rows] / 2  # selection_homo liczy oba allele
+        hetero = self.sel_hetero[rows]
+        frames = []
+        for k, h in enumerate(self.dominance):
+            log_w = self.log_w_homo[rows] + self.log_w_hetero[k][rows]
+            frames.append(sum_df.assign(
+                h=h,
+                realized_load=homo + h * hetero,
+                masked_load=(1 - h) * hetero,
+                log_fitness=log_w,
+                fitness=np.exp(log_w),
+            ))
+        return pd.concat(frames, ignore_index=True)
+
+
+def score_blocks(samples, folder_id, blocks, regions=None, dominance=None):
+    """Akumuluje obciążenie m2 z bloków (coefs, allele_sums, positions) dla nośników"""
+    acc = LoadAccumulator(len(samples), regions, dominance)
+    for s, allele_sums, positions in blocks:
+        acc.update(s, allele_sums, positions)
+    return acc.to_frame(samples, folder_id)
+
+
+def genetic_load_from_vcf(vcf, folder_id, mutation_index, chunk_size=CHUNK_SIZE, regions=None,
+                          dominance=None):
+    """Liczy obciążenie m2 dla każdego osobnika z otwartego obiektu cyvcf2.VCF"""
+    blocks = decode_m2_blocks(vcf, mutation_index, chunk_size)
+    return score_blocks(vcf.samples, folder_id, blocks, regions, dominance)
+
+# ── Magazyn genotypów .gts (genotype_store.py) ─────────────────────────
+
+def report_extra(n_extra):
+    """Ostrzeżenie o rekordach VCF ponad liczbę mutacji m2 w ich pozycji"""
+    if n_extra:
+        print(f"[!] {n_extra} rekordów VCF ponad liczbę mutacji m2 w pozycji – pominięte")
+
+
+def m2_rows(positions, mutation_index, offset=0):
+    """
+    Wektorowe dopasowanie pozycji wariantów jednego kontigu do indeksu m2.
+    Zwraca (rows, coefs): numery wierszy z mutacją m2 i ich współczynniki
+    (jeden na rekord, patrz M2Index.records).
+    """
+    rows, coefs, _, n_extra = mutation_index.records(positions, offset)
+    report_extra(n_extra)
+    return rows, coefs
+
+
+def store_m2_rows(store, mutation_index, chrom=None):
+    """
+    (rows, coefs, keys, mutations) mutacji m2 w magazynie – kontig po
+    kontigu, z jego przesunięciem na osi SLiM (keys); mutations – wiersze
+    katalogu jak w decode_m2_blocks; chrom: tylko wybrany kontig.
+    """
+    names = [name for name, _ in contig_lengths(store)]
+    parts, n_extra = [], 0
+    for name in ([chrom] if chrom is not None else names):
+        offset = mutation_index.offset_of(name, names[0] if names else None)
+        if offset is None:
+            continue
+        lo, hi = store.contig_rows(name)
+        rows, coefs, mutations, extra = mutation_index.records(store.positions[lo:hi], offset)
+        parts.append((rows + lo, coefs, store.positions[rows + lo] + offset, mutations))
+        n_extra += extra
+    if not names and chrom is None:  # magazyn bez listy kontigów
+        rows, coefs, mutations, n_extra = mutation_index.records(store.positions)
+        parts.append((rows, coefs, store.positions[rows], mutations))
+    report_extra(n_extra)
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0), empty, empty
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def decode_m2_blocks_store(store, mutation_index, chunk_size=CHUNK_SIZE, mutations=False):
+    """Bloki (coefs, dawki, pozycje na osi[, mutacje]) m2 z magazynu – bez dekodowania tekstu VCF"""
+    rows, coefs, keys, rows_mutation = store_m2_rows(store, mutation_index)
+    for start in range(0, len(rows), chunk_size):
+        stop = start + chunk_size
+        out = coefs[start:stop], store.dosages(rows[start:stop]), keys[start:stop]
+        yield out + (rows_mutation[start:stop],) if mutations else out
+
+
+def genetic_load_from_store(store, folder_id, mutation_index, chunk_size=CHUNK_SIZE, regions=None,
+                            dominance=None):
+    """Liczy obciążenie m2 dla każdego osobnika z otwartego magazynu .gts"""
+    blocks = decode_m2_blocks_store(store, mutation_index, chunk_size)
+    return score_blocks(store.samples, folder_id, blocks, regions, dominance)
+
 
-# ── Główna pętla przetwarzania folderów ────────────────────────────────
-all_results = []
+def genetic_load_from_source(path, folder_id, mutation_index, regions=None, dominance=None):
+    """Obciążenie z magazynu .gts albo z pliku VCF, zależnie od ścieżki"""
+    if is_store(path):
+        return genetic_load_from_store(open_store(path), folder_id, mutation_index,
+                                       regions=regions, dominance=dominance)
+    return genetic_load_from_vcf(cyvcf2.VCF(str(path)), folder_id, mutation_index,
+                                 regions=regions, dominance=dominance)
 
-for folder_id in range(args.start, args.end + 1):
+# ── Wczytywanie z wyprzedzeniem (prefetch) ──────────────────────────────
+
+def prefetch(iterable, depth=PREFETCH_DEPTH):
+    """
+    Iteruje po `iterable` w wątku tła, trzymając w kolejce najwyżej `depth`
+    elementów. Dekompresja i dekodowanie kolejnej repliki trwa więc
+    równolegle z liczeniem bieżącej. Wyjątki z wątku są przekazywane dalej.
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except BaseException as exc:
+            put((False, exc))
+            return
+        put((False, None))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, item = q.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def discover_replicates(vcf_dir=VCF_DIR):
+    """Numery wszystkich replik z plikami finalout_<id>_genomes.vcf.gz lub .gts (rosnąco)"""
+    ids = (re.fullmatch(r"finalout_(\d+)_genomes\.(vcf\.gz|gts)", p.name)
+           for p in Path(vcf_dir).glob("finalout_*_genomes.*"))
+    return sorted({int(m[1]) for m in ids if m})
+
+
+def replicate_vcf(folder_id):
+    """Ścieżka do VCF repliki albo None, jeśli plik nie istnieje"""
     vcf_file = VCF_DIR / f"finalout_{folder_id}_genomes.vcf.gz"
     if not vcf_file.exists():
         print(f"[!] Plik nie istnieje: {vcf_file}")
-        continue
+        return None
+    return vcf_file
 
-    try:
-        # Rozpakuj VCF do tymczasowego pliku
-        with NamedTemporaryFile(delete=False, suffix=".vcf") as temp_vcf:
-            temp_vcf_path = temp_vcf.name
-        with gzip.open(vcf_file, 'rb') as f_in, open(temp_vcf_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
-
-        # Wczytaj VCF
-        vcf = cyvcf2.VCF(temp_vcf_path)
-        for variant in vcf:
-            corrected_position = variant.POS
-            # Znajdź pasującą mutację m2 (uwzględnia +1 w pozycjonowaniu)
-            matching_mutations = mutation_df[mutation_df["Position"] + 1 == corrected_position]
-            if not matching_mutations.empty:
-                selection_coef = matching_mutations.iloc[0]["selection_coef"]
-                genotypes = variant.genotypes
-
-                for i, genotype in enumerate(genotypes):
-                    sample_id = vcf.samples[i]
-                    gt = genotype[0] + genotype[1]  # suma alleli
-
-                    # Homozygota szkodliwa
-                    if gt == 2:
-                        all_results.append({
-                            "ID": sample_id,
-                            "Folder": folder_id,
-                            "selection_homo": 2 * selection_coef,
-                            "selection_hetero": 0,
-                            "mutation_count": 2
-                        })
-                    # Heterozygota
-                    elif gt == 1:
-                        all_results.append({
-                            "ID": sample_id,
-                            "Folder": folder_id,
-                            "selection_homo": 0,
-                            "selection_hetero": selection_coef,
-                            "mutation_count": 1
-                        })
 
-    finally:
-        # Usuń tymczasowy plik
-        if os.path.exists(temp_vcf_path):
-            os.remove(temp_vcf_path)
-
-# ── Agregacja wyników ───────────────────────────────────────────────────
-if not all_results:
-    print("Brak pasujących mutacji.")
-    sum_df = pd.DataFrame(columns=[
-        "ID", "Folder", "selection_homo", "selection_hetero", 
-        "mutation_count", "selection_total", "Year"
-    ])
-else:
-    results_df = pd.DataFrame(all_results)
-    sum_df = results_df.groupby(["ID", "Folder"]).agg({
-        "selection_homo": "sum",
-        "selection_hetero": "sum",
-        "mutation_count": "sum"
-    }).reset_index()
-    sum_df["selection_total"] = sum_df["selection_homo"] + sum_df["selection_hetero"]
+def replicate_source(folder_id):
+    """
+    Magazyn .gts repliki, jeśli jest aktualny (lub brak już VCF),
+    w przeciwnym razie plik VCF; None, gdy brak obu.
+    """
+    vcf_file = VCF_DIR / f"finalout_{folder_id}_genomes.vcf.gz"
+    gts = store_path(vcf_file)
+    if is_store(gts) and (not vcf_file.exists() or is_up_to_date(vcf_file, gts)):
+        return gts
+    return replicate_vcf(folder_id)
+
+
+def _replicate_blocks(folder_ids, mutation_index):
+    """Bloki m2 kolejnych replik; .vcf.gz czytany bezpośrednio, bez pliku tymczasowego"""
+    for folder_id in folder_ids:
+        source = replicate_source(folder_id)
+        if source is None:
+            continue
+        if is_store(source):
+            store = open_store(source)
+            samples, blocks = store.samples, decode_m2_blocks_store(store, mutation_index)
+        else:
+            vcf = cyvcf2.VCF(str(source))
+            samples, blocks = vcf.samples, decode_m2_blocks(vcf, mutation_index)
+        for coefs, allele_sums, positions in blocks:
+            yield folder_id, samples, coefs, allele_sums, positions
+
+
+def genetic_load_for_folders(folder_ids, mutation_index, prefetch_depth=PREFETCH_DEPTH,
+                             regions=None, dominance=None):
+    """Zwraca ramki obciążenia kolejnych replik, dekodując następne w tle"""
+    stream = prefetch(_replicate_blocks(folder_ids, mutation_index), prefetch_depth)
+    for folder_id, items in groupby(stream, key=itemgetter(0)):
+        first = next(items)
+        blocks = chain([first[2:]], (item[2:] for item in items))
+        yield score_blocks(first[1], folder_id, blocks, regions, dominance)
+
+
+# ── Pula procesów: jedna replika na zadanie ─────────────────────────────
+
+_MUTATION_INDEX = None
+_REGIONS = None
+_DOMINANCE = None
+
+
+def _init_worker(mutation_index, regions=None, dominance=None):
+    """Inicjalizacja procesu roboczego: indeks m2 (i regionów) przekazywany raz na proces"""
+    global _MUTATION_INDEX, _REGIONS, _DOMINANCE
+    _MUTATION_INDEX = mutation_index
+    _REGIONS = regions
+    _DOMINANCE = dominance
+
+
+def genetic_load_for_folder(folder_id):
+    """Obciążenie jednej repliki w procesie roboczym"""
+    source = replicate_source(folder_id)
+    if source is None:
+        return None
+    return genetic_load_from_source(source, folder_id, _MUTATION_INDEX, _REGIONS, _DOMINANCE)
+
+
+def genetic_load_parallel(folder_ids, mutation_index, workers, regions=None, dominance=None):
+    """Rozdziela repliki na pulę procesów, zwraca ramki w kolejności ukończenia"""
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(mutation_index, regions, dominance)) as pool:
+        futs = {pool.submit(genetic_load_for_folder, f): f for f in folder_ids}
+        for fut in tqdm(as_completed(futs),
+                        total=len(futs),
+                        desc="Obciążenie m2", unit="rep",
+                        file=sys.stdout):
+            yield fut.result()
+
+
+def finalize_results(frames, year_data):
+    """Łączy ramki replik i dołącza rok urodzenia"""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        print("Brak pasujących mutacji.")
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    keys = ["ID", "Folder", "h"] if "h" in frames[0].columns else ["ID", "Folder"]
+    sum_df = (pd.concat(frames, ignore_index=True)
+                .sort_values(keys, ignore_index=True))
 
     # Dołączenie informacji o roku urodzenia
-    sum_df = sum_df.merge(year_data, on="ID", how="left")
+    return sum_df.merge(year_data, on="ID", how="left")
+
+# ── Główna funkcja ──────────────────────────────────────────────────────
+
+def main():
+    # ── Argumenty wejściowe ─────────────────────────────────────────────
+    parser = argparse.ArgumentParser(description="Batch VCF processing for selection coefficients.")
+    parser.add_argument("--start", type=int, help="Start folder ID (default: all discovered).")
+    parser.add_argument("--end", type=int, help="End folder ID (inclusive).")
+    parser.add_argument("--out", type=str, default="genetic_load_combined.parquet",
+                        help="Output Parquet file name.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (1 = sequential with prefetch).")
+    parser.add_argument("--dataset", action="store_true",
+                        help="Append each replicate to results/genetic_load_dataset "
+                             "instead of writing --out.")
+    parser.add_argument("--regions", type=str,
+                        help="SLiM element table (feature start end, e.g. bed_to_slim.txt): "
+                             "adds load columns per EXON/INTRON/NC region class.")
+    parser.add_argument("--regions-one-based", action="store_true",
+                        help="Region table uses GFF3 (1-based) positions, as written by gff_to_slim.py.")
+    parser.add_argument("--collisions", choices=COLLISION_RULES, default="first",
+                        help="Selection coefficient for positions with several m2 mutations "
+                             "written as one VCF record (several records: one coefficient each).")
+    parser.add_argument("--contigs", type=str,
+                        help="Contig offsets on the SLiM position axis (<file>.contigs.tsv from "
+                             "gff_to_slim.py, .fai, GFF3 or VCF); without it only the first contig is matched.")
+    parser.add_argument("--dominance", type=float, nargs="*",
+                        help="Dominance coefficients h for realized/masked load and fitness "
+                             f"(no values: {' '.join(map(str, DOMINANCE_H))}); one row per h.")
+    args = parser.parse_args()
+
+    out_parquet = BASE_DIR / "results" / args.out
+
+    mutation_index = load_mutation_index(collisions=args.collisions, contigs=args.contigs)
+    year_data = load_year_data()
+    regions = load_regions(args.regions, args.regions_one_based) if args.regions else None
+    dominance = None if args.dominance is None else (args.dominance or list(DOMINANCE_H))
+
+    # ── Wybór replik: zakres albo wszystkie znalezione pliki ────────────
+    if args.start is not None and args.end is not None:
+        folder_ids = list(range(args.start, args.end + 1))
+    else:
+        folder_ids = [f for f in discover_replicates()
+                      if (args.start is None or f >= args.start)
+                      and (args.end is None or f <= args.end)]
+    print(f"Replik do przetworzenia: {len(folder_ids)}")
+
+    # ── Główna pętla przetwarzania folderów ─────────────────────────────
+    if args.workers > 1:
+        frames = genetic_load_parallel(folder_ids, mutation_index, args.workers, regions, dominance)
+    else:
+        frames = genetic_load_for_folders(folder_ids, mutation_index, regions=regions,
+                                          dominance=dominance)
+
+    # ── Tryb zbioru: każda replika dopisywana jako partycja Folder=<id> ─
+    if args.dataset:
+        dataset = DOMINANCE_DATASET if dominance is not None else LOAD_DATASET
+        written = 0
+        for frame in frames:
+            if frame is None or frame.empty:
+                continue
+            replicate = frame.merge(year_data, on="ID", how="left")
+            append_partition(replicate, dataset, replicate["Folder"].iloc[0])
+            written += 1
+        print(f"[✓] Dopisano {written} replik do: {dataset}")
+        return
+
+    sum_df = finalize_results(list(frames), year_data)
+
+    # ── Zapis do pliku .parquet ─────────────────────────────────────────
+    sum_df.to_parquet(out_parquet)
+    print(f"[✓] Zapisano {len(folder_ids)} replik do: {out_parquet}")
 
-# ── Zapis do pliku .parquet ─────────────────────────────────────────────
-sum_df.to_parquet(OUT_PARQUET)
-print(f"[✓] Zapisano zakres {args.start}-{args.end} do: {OUT_PARQUET}")
+if __name__ == "__main__":
+    main()
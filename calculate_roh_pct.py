@@ -7,27 +7,55 @@ Cel:
 • Oblicza odsetek genomu objętego ROH (Runs of Homozygosity)
   dla każdego osobnika na podstawie 100 replik/folderów (out_0–out_99).
 • Dla każdego osobnika liczy średni ROH% (średni udział genomu w ROH)
+  na bieżąco, po każdej replice (online_stats.py: Welford + rezerwuar),
+  z przedziałem ufności średniej i kwantylami replik; pamięć nie rośnie
+  z liczbą replik, a --partial-every zapisuje wynik częściowy w trakcie
 • Dołącza rok urodzenia z wcześniej scalonego pliku ROH
 • Zapisuje wynik do: results/roh_pct_100rep.parquet
+• Opcjonalnie (--segments) wyznacza segmenty ROH (start, end, length)
+  i FROH w klasach długości (1–2, 2–4, 4–8, >8 Mb) dla wszystkich replik
+• Opcjonalnie (--sweep-thresholds) liczy ROH% dla wielu progów
+  (i szerokości okien, --sweep-windows) w jednym przebiegu po danych
+• Wiele kontigów: mianownik to suma długości kontigów (window_layout
+  w plikach kolumnowych, --fai dla plików .txt); segmenty ROH i szersze
+  okna wyznaczane są osobno w każdym kontigu
+• Pliki bez window_layout (.txt, starsze pliki kolumnowe): układ okien
+  odtwarzany z Window_center (krok z różnic środków albo --step-size,
+  szerokość okna z --window-size), więc ROH%, segmenty i przegląd okien
+  liczone są tak samo jak dla plików z window_layout; bez znanego kroku
+  skrypt kończy się błędem zamiast przyjmować stały krok
 
 Dane wejściowe:
 • Pliki out_X/output_*.txt (z homozygotycznością w oknach)
+  lub (--format columnar) pliki out_X.parquet / out_X.arrow, jeden na replikę
 • Plik results/homozyg_100rep.parquet (z ID i rokiem urodzenia)
 
 Dane wyjściowe:
-• Plik Parquet z kolumnami: ID, ROH_pct, Year
+• Plik Parquet z kolumnami: ID, ROH_pct, ROH_pct_sd, ROH_pct_se,
+  ROH_pct_ci_low, ROH_pct_ci_high, ROH_pct_q_low, ROH_pct_q_high, n, Year
+• (--segments) results/roh_segments_100rep.parquet: ID, Folder, contig, start, end, length
+• (--segments) results/froh_classes_100rep.parquet: ID, Folder, ROH_pct_seg,
+  ROH_pct_1_2Mb, ROH_pct_2_4Mb, ROH_pct_4_8Mb, ROH_pct_gt8Mb, Year
+• (--sweep-thresholds) results/roh_sweep_100rep.parquet:
+  ID, window_size, threshold, ROH_pct (średnia z replik) z CI, n, Year
 """
 
 # ── Importy ─────────────────────────────────────────────────────────────
 import pandas as pd
 import numpy as np
-import glob
 import os
 import argparse
 from pathlib import Path
+from homozygosity_io import (
+    contig_slices, layout_from_centers, read_homozygosity_matrix, read_txt_folder,
+    read_window_layout, step_from_centers, window_edges, COLUMNAR_SUFFIXES
+)
+from genome import genome_length, load_contigs
+import roh
+from online_stats import OnlineStats
+from results_dataset import HOM_DATASET, read_results
 
 # ── Parametry genomu i progu ROH ────────────────────────────────────────
-STEP_SIZE = 100_000          # długość jednego okna w bp
 GENOME_LENGTH = 106_932_631  # całkowita długość analizowanego genomu
 ROH_THRESHOLD = 0.9          # próg dla homozygotyczności, aby zaliczyć do ROH
 
@@ -36,60 +64,210 @@ BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
 DATA_DIR = BASE / "output_files"
 FULL_PARQUET = BASE / "results" / "homozyg_100rep.parquet"
 OUT_PARQUET = BASE / "results" / "roh_pct_100rep.parquet"
+SEG_PARQUET = BASE / "results" / "roh_segments_100rep.parquet"
+FROH_PARQUET = BASE / "results" / "froh_classes_100rep.parquet"
+SWEEP_PARQUET = BASE / "results" / "roh_sweep_100rep.parquet"
 
-# ── Lista folderów out_0, ..., out_99 ───────────────────────────────────
-folders = [os.path.join(DATA_DIR, f"out_{i}") for i in range(100)]
+# ── Argumenty wejściowe ─────────────────────────────────────────────────
+parser = argparse.ArgumentParser(description="ROH% per osobnik ze 100 replik.")
+parser.add_argument("--format", choices=["txt", "columnar"], default="txt",
+                    help="txt: out_X/output_*.txt, columnar: out_X.parquet/.arrow")
+parser.add_argument("--segments", action="store_true",
+                    help="wyznacz segmenty ROH i FROH w klasach długości")
+parser.add_argument("--sweep-thresholds", type=float, nargs="+",
+                    help="lista progów ROH, np. 0.8 0.85 0.9 0.95")
+parser.add_argument("--sweep-windows", type=int, nargs="+",
+                    help="szerokości okien (bp) = okno bazowe + k × krok")
+parser.add_argument("--window-size", type=int, default=200_000,
+                    help="szerokość okna bazowego, gdy plik jej nie zapisuje (txt)")
+parser.add_argument("--step-size", type=int,
+                    help="krok okien, gdy plik go nie zapisuje (txt); domyślnie z różnic Window_center")
+parser.add_argument("--genome-length", type=int, default=GENOME_LENGTH,
+                    help="długość genomu, gdy plik jej nie zapisuje (txt)")
+parser.add_argument("--fai", help="długość genomu jako suma kontigów z .fai, GFF3 lub VCF")
+parser.add_argument("--n-replicates", type=int, default=100,
+                    help="liczba replik out_0 ... out_<n-1>")
+parser.add_argument("--partial-every", type=int, default=0,
+                    help="zapisuj wynik częściowy (średnie i CI) co tyle replik")
+args = parser.parse_args()
 
-# ── Lista do przechowywania wyników ─────────────────────────────────────
-results = []
+# Mianownik dla plików bez window_layout (txt)
+GENOME_LENGTH = genome_length(load_contigs(args.fai)) if args.fai else args.genome_length
 
-# ── Przetwarzanie plików output_*.txt ──────────────────────────────────
-for folder in folders:
-    folder_name = os.path.basename(folder)
-    files = glob.glob(os.path.join(folder, "output_*.txt"))
-    
-    for file in files:
-        fname = os.path.basename(file)
-        sample_id = fname.replace("output_", "").replace(".txt", "")
-        
-        # Wczytanie danych: kolumna "Homozygosity" dla każdego okna
-        dat = pd.read_csv(file, sep="\t", skiprows=1, names=["Window_center", "Homozygosity"])
-        
-        # Zlicz liczbę okien spełniających próg ROH
-        num_windows_roh = (dat["Homozygosity"] >= ROH_THRESHOLD).sum()
-        
-        # Przelicz długość ROH i odsetek genomu
-        roh_length = num_windows_roh * STEP_SIZE
-        roh_pct = (roh_length / GENOME_LENGTH) * 100
-        
-        # Zapisz wynik
-        results.append({
-            "ID": sample_id,
-            "Folder": folder_name,
-            "ROH_pct": roh_pct
-        })
-
-# ── Konwersja do ramki danych ───────────────────────────────────────────
-results_df = pd.DataFrame(results)
+# ── Lista folderów out_0, ..., out_<n-1> ────────────────────────────────
+folders = [os.path.join(DATA_DIR, f"out_{i}") for i in range(args.n_replicates)]
 
-# ── Wczytanie pliku z ROH i rokiem urodzenia ────────────────────────────
-data = pd.read_parquet(FULL_PARQUET)
-
-# ── Uśrednienie ROH% dla każdego osobnika (100 folderów) ────────────────
-results_avg = results_df.groupby("ID").agg({"ROH_pct": "mean"}).reset_index()
+# ── Wczytanie pliku z ROH i rokiem urodzenia (tylko potrzebne kolumny) ─
+if HOM_DATASET.exists():
+    data = read_results(HOM_DATASET, columns=["ID", "Year"])
+else:
+    data = pd.read_parquet(FULL_PARQUET, columns=["ID", "Year"])
 
 # ── Pobranie informacji o roku urodzenia ────────────────────────────────
 year_data = data[["ID", "Year"]].drop_duplicates()
 
 # ── Konwersja ID na string (na wypadek niespójności typów) ──────────────
-results_avg["ID"] = results_avg["ID"].astype(str)
 year_data["ID"] = year_data["ID"].astype(str)
 
-# ── Połączenie ROH% z rokiem urodzenia ──────────────────────────────────
-final_data = results_avg.merge(year_data, on="ID", how="left")
+# ── Statystyki ROH% aktualizowane po każdej replice ────────────────────
+roh_stats = OnlineStats(("ID",), ("ROH_pct",))
+
+def add_replicate(rows):
+    """Dołącza wiersze (ID, Folder, ROH_pct) jednej repliki do statystyk"""
+    if not rows:
+        return 0
+    frame = pd.DataFrame(rows)
+    roh_stats.update_frame(frame.assign(ID=frame["ID"].astype(str)))
+    return 1
+
+def write_summary():
+    """Średni ROH% z CI dla każdego osobnika + rok urodzenia → OUT_PARQUET"""
+    final_data = roh_stats.summary().merge(year_data, on="ID", how="left")
+    OUT_PARQUET.parent.mkdir(exist_ok=True)
+    final_data.to_parquet(OUT_PARQUET, index=False)
+
+# ── Wczytanie całej repliki jako macierzy osobniki × okna ──────────────
+def centers_layout(folder, centers, window_contigs=None):
+    """window_layout plików bez niego: krok z --step-size lub ze środków okien"""
+    step = args.step_size or step_from_centers(centers, window_contigs)
+    if step is None:
+        raise SystemExit(f"[!] {folder}: nie można ustalić kroku okien ze środków – "
+                         "podaj --step-size")
+    return layout_from_centers(centers, args.window_size, step, GENOME_LENGTH, window_contigs)
+
+def load_replicate(folder):
+    """Zwraca (sample_names, centers, matrix, layout) dla wybranego formatu"""
+    if args.format == "txt":
+        sample_names, centers, matrix, window_contigs = read_txt_folder(folder)
+        if not sample_names:
+            return [], None, None, None
+        return sample_names, centers, matrix, centers_layout(folder, centers, window_contigs)
+    folder_name = os.path.basename(folder)
+    paths = [p for p in Path(DATA_DIR).glob(f"{folder_name}.*")
+             if p.suffix.lower() in COLUMNAR_SUFFIXES]
+    if not paths:
+        return [], None, None, None
+    sample_names, centers, matrix = read_homozygosity_matrix(paths[0])
+    layout = read_window_layout(paths[0]) or centers_layout(folder, centers)
+    return sample_names, centers, matrix, layout
+
+# ── ROH% jednej repliki (jeden odczyt, pliki .txt i kolumnowe) ─────────
+def roh_rows(folder):
+    folder_name = os.path.basename(folder)
+    sample_names, _, matrix, layout = load_replicate(folder)
+    if not sample_names:
+        return []
+
+    # Krok okien i długość genomu z window_layout (jak w analyze_replicates.py)
+    pct = roh.roh_pct_from_layout(matrix, layout, ROH_THRESHOLD)
+    return [{"ID": sample_id, "Folder": folder_name, "ROH_pct": p}
+            for sample_id, p in zip(sample_names, pct)]
+
+# ── Uśrednienie ROH% dla każdego osobnika – replika po replice ──────────
+n_done = 0
+for folder in folders:
+    rows = roh_rows(folder)
+    added = add_replicate(rows)
+    n_done += added
+    if added and args.partial_every and n_done % args.partial_every == 0:
+        write_summary()
+        print(f"Wynik częściowy ({n_done} replik) zapisano do pliku: {OUT_PARQUET}")
 
-# ── Zapis do pliku Parquet ──────────────────────────────────────────────
-OUT_PARQUET.parent.mkdir(exist_ok=True)
-final_data.to_parquet(OUT_PARQUET, index=False)
+# ── Połączenie ROH% z rokiem urodzenia i zapis do pliku Parquet ─────────
+write_summary()
 
 print(f"Wyniki zapisano do pliku: {OUT_PARQUET}")
+
+# ── Segmenty ROH i FROH w klasach długości (tryb --segments) ───────────
+if args.segments:
+    seg_rows, seg_contig, seg_start, seg_end, seg_length = [], [], [], [], []
+    row_ids, row_folders, row_genome = [], [], []
+
+    for folder in folders:
+        folder_name = os.path.basename(folder)
+        sample_names, centers, matrix, layout = load_replicate(folder)
+        if not sample_names:
+            continue
+
+        # Ciągi okien ROH → segmenty (wektorowo dla całej repliki),
+        # osobno w każdym kontigu – segment nie przechodzi między kontigami
+        starts, ends = window_edges(centers, layout)
+        mask = roh.roh_window_mask(matrix, ROH_THRESHOLD)
+        for contig, cols in contig_slices(layout):
+            rows, s_start, s_end, length = roh.roh_segments(mask[:, cols], starts[cols], ends[cols])
+            seg_rows.append(rows + len(row_ids))
+            seg_contig.append(np.full(len(rows), contig, dtype=object))
+            seg_start.append(s_start)
+            seg_end.append(s_end)
+            seg_length.append(length)
+        row_ids.extend(str(sid) for sid in sample_names)
+        row_folders.extend([folder_name] * len(sample_names))
+        row_genome.extend([layout["chrom_length"]] * len(sample_names))
+
+    if row_ids:
+        seg_rows = np.concatenate(seg_rows)
+        seg_length = np.concatenate(seg_length)
+        row_ids = np.asarray(row_ids, dtype=object)
+        row_folders = np.asarray(row_folders, dtype=object)
+
+        segments = pd.DataFrame({
+            "ID": row_ids[seg_rows],
+            "Folder": row_folders[seg_rows],
+            "contig": np.concatenate(seg_contig),
+            "start": np.concatenate(seg_start),
+            "end": np.concatenate(seg_end),
+            "length": seg_length,
+        })
+
+        # FROH w klasach długości – jedno zliczenie dla wszystkich replik
+        froh = roh.froh_by_class(seg_rows, seg_length, len(row_ids), np.asarray(row_genome))
+        froh_df = pd.DataFrame(froh, columns=roh.class_labels())
+        froh_df.insert(0, "ID", row_ids)
+        froh_df.insert(1, "Folder", row_folders)
+        froh_df.insert(2, "ROH_pct_seg", froh.sum(axis=1))
+        froh_df = froh_df.merge(year_data, on="ID", how="left")
+
+        segments.to_parquet(SEG_PARQUET, index=False)
+        froh_df.to_parquet(FROH_PARQUET, index=False)
+        print(f"Segmenty ROH zapisano do pliku: {SEG_PARQUET}")
+        print(f"FROH w klasach długości zapisano do pliku: {FROH_PARQUET}")
+
+# ── Przegląd progów i szerokości okien (tryb --sweep-thresholds) ──────
+if args.sweep_thresholds:
+    thresholds = np.asarray(args.sweep_thresholds, dtype=np.float64)
+    sweep_stats, skipped = OnlineStats(("ID", "window_size", "threshold"), ("ROH_pct",)), set()
+
+    for folder in folders:
+        folder_name = os.path.basename(folder)
+        sample_names, centers, matrix, layout = load_replicate(folder)
+        if not sample_names:
+            continue
+        # Krok i okno bazowe z window_layout (pliki .txt: odtworzony ze środków okien)
+        step = layout["step_size"]
+        base_window = layout["window_size"]
+        chrom_length = layout["chrom_length"]
+
+        for window_size in args.sweep_windows or [base_window]:
+            # Szersze okna składane w obrębie kontigu
+            wide = [roh.widen_windows(matrix[:, cols], base_window, step, window_size)
+                    for _, cols in contig_slices(layout)]
+            if any(w is None for w in wide):
+                skipped.add(window_size)
+                continue
+            wide = np.hstack(wide)
+            # Wszystkie progi z jednego histogramu okien
+            pct = roh.roh_pct_sweep(wide, thresholds, step, chrom_length)
+            sweep_stats.update_frame(pd.DataFrame({
+                "ID": np.repeat(np.asarray(sample_names, dtype=str), len(thresholds)),
+                "window_size": window_size,
+                "threshold": np.tile(thresholds, len(sample_names)),
+                "ROH_pct": pct.ravel(),
+            }))
+
+    for window_size in sorted(skipped):
+        print(f"[!] Pominięto okno {window_size} bp (nie wynika z okna bazowego i kroku)")
+
+    if len(sweep_stats):
+        sweep = sweep_stats.summary().merge(year_data, on="ID", how="left")
+        sweep.to_parquet(SWEEP_PARQUET, index=False)
+        print(f"Przegląd progów ROH zapisano do pliku: {SWEEP_PARQUET}")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gene_drop.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Symulacja gene-drop po rodowodzie bez zapisu VCF dla każdej repliki
+  (zamiast wielokrotnego run_ped_sim.py w run_py_ped_sim_1.sh)
+• Wszystkie repliki naraz: allele jako tablica NumPy
+  osobniki × 2 haplotypy × repliki, przejście po pokoleniach
+  (porządek topologiczny z pedigree.py) – jedno losowanie na pokolenie
+• Tryb etykiet: każdy allel bazowy ma własną etykietę; wynik to
+  prawdopodobieństwo IBD (homozygotyczność przez pochodzenie, ≈ F_ped)
+  i przeżywalność alleli założycieli w kohorcie
+• Tryb genotypów: allele założycieli z wisentinfo_slim_fil.vcf
+  (przypisanie jak w exact_founder_input_<i>.txt: "i7 15") przenoszone
+  przez rodowód; w pamięci liczona jest homozygotyczność i obciążenie m2
+  każdego osobnika w każdej replice
+
+Uwaga: w trybie genotypów każde miejsce losowane jest niezależnie
+(loci niesprzężone) – wartości oczekiwane jak przy sprzężeniu,
+wariancja między replikami mniejsza. Odcinki z rekombinacją: ibd_segments.py.
+
+Uruchamianie:
+python gene_drop.py --ped mydata/pyped_rodowod --format plink --reps 10000
+python gene_drop.py --ped mydata/pyped_rodowod --format plink --reps 1000 \
+    --founders mydata/exact_founder_input_1.txt --vcf mydata/wisentinfo_slim_fil.vcf \
+    --mutations mutations_output_final_m2.txt
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from calculate_genetic_load import LoadAccumulator, load_mutation_index, m2_rows
+from pedigree import FOUNDERS, Pedigree, read_ped, read_plink_ped
+
+# ── Parametry ───────────────────────────────────────────────────────────
+BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
+OUT_PARQUET = BASE / "results" / "gene_drop_summary.parquet"
+SURVIVAL_PARQUET = BASE / "results" / "gene_drop_founder_survival.parquet"
+
+CELL_BUDGET = 50_000_000  # maks. liczba komórek osobniki × 2 × (miejsca × repliki) w bloku
+
+# ── Wczytywanie danych założycieli ─────────────────────────────────────
+
+def read_founder_assignment(path):
+    """Plik exact_founder_input: wiersze "i7 15" → {15: "i7"} (ID w rodowodzie → próbka VCF)"""
+    pairs = pd.read_csv(path, sep=r"\s+", names=["sample", "ID"])
+    return dict(zip(pairs["ID"], pairs["sample"]))
+
+
+def founder_haplotypes(vcf_file, samples):
+    """
+    Haplotypy wybranych próbek z VCF założycieli.
+    Zwraca (positions, haps): haps ma kształt próbki × 2 × warianty (int8, -1 = brak).
+    """
+    from cyvcf2 import VCF
+
+    vcf = VCF(str(vcf_file), samples=list(samples))
+    order = [vcf.samples.index(s) for s in samples]
+    positions, blocks = [], []
+    for variant in vcf:
+        positions.append(variant.POS)
+        blocks.append(variant.genotype.array()[order, :2])
+    haps = np.stack(blocks, axis=-1).astype(np.int8) if blocks else np.empty((len(samples), 2, 0), np.int8)
+    return np.asarray(positions, dtype=np.int64), haps
+
+# ── Gene-drop etykiet alleli ────────────────────────────────────────────
+
+def label_dtype(ped):
+    return np.uint16 if 2 * len(ped) <= np.iinfo(np.uint16).max else np.int32
+
+
+def drop_labels(ped, n_reps, rng=None):
+    """
+    Etykiety alleli osobniki × 2 × repliki.
+    Allel bazowy h osobnika i (rodzic nieznany) ma etykietę 2·i + h;
+    potomek dostaje od każdego znanego rodzica losowo jeden z jego dwóch alleli,
+    niezależnie w każdej replice – jedna operacja NumPy na pokolenie.
+    """
+    rng = np.random.default_rng(rng)
+    n = len(ped)
+    labels = np.empty((n, 2, n_reps), dtype=label_dtype(ped))
+
+    for level in ped.levels:
+        for h, parent in enumerate((ped.sire[level], ped.dam[level])):
+            known = parent >= 0
+            kids, par = level[known], parent[known]
+            if len(kids):
+                pick = rng.integers(0, 2, size=(len(kids), n_reps), dtype=bool)
+                labels[kids, h] = np.where(pick, labels[par, 1], labels[par, 0])
+            unknown = level[~known]
+            labels[unknown, h] = (2 * unknown + h)[:, None]
+    return labels
+
+
+def ibd_homozygosity(labels):
+    """Czy oba allele osobnika pochodzą od tego samego allelu bazowego (osobniki × repliki)"""
+    return labels[:, 0] == labels[:, 1]
+
+
+def founder_allele_survival(ped, labels, founders=FOUNDERS, cohort=None):
+    """
+    Przeżywalność alleli założycieli w kohorcie (domyślnie osobniki bez potomstwa).
+    Dla każdego allelu (założyciel, haplotyp): odsetek replik, w których allel
+    występuje w kohorcie, średnia liczba kopii i udział w puli genowej kohorty.
+    """
+    if cohort is None:
+        parents = np.concatenate([ped.sire, ped.dam])
+        cohort = np.ones(len(ped), dtype=bool)
+        cohort[parents[parents >= 0]] = False
+    cohort_idx = np.flatnonzero(cohort)
+    founder_idx = ped.indices(founders)
+    n_reps = labels.shape[2]
+
+    # etykieta → numer allelu założyciela (lub -1)
+    allele_of = np.full(2 * len(ped), -1, dtype=np.int64)
+    allele_of[2 * founder_idx] = 2 * np.arange(len(founder_idx))
+    allele_of[2 * founder_idx + 1] = 2 * np.arange(len(founder_idx)) + 1
+
+    fa = allele_of[labels[cohort_idx].astype(np.int64)]              # kohorta × 2 × repliki
+    rep = np.broadcast_to(np.arange(n_reps), fa.shape)
+    keep = fa >= 0
+    n_alleles = 2 * len(founder_idx)
+    copies = np.bincount(fa[keep] * n_reps + rep[keep],
+                         minlength=n_alleles * n_reps).reshape(n_alleles, n_reps)
+
+    return pd.DataFrame({
+        "founder": np.repeat(ped.ids[founder_idx].astype(str), 2),
+        "haplotype": np.tile([0, 1], len(founder_idx)),
+        "survival": (copies > 0).mean(axis=1),
+        "mean_copies": copies.mean(axis=1),
+        "contribution": copies.mean(axis=1) / (2 * len(cohort_idx)),
+    })
+
+# ── Gene-drop genotypów założycieli ─────────────────────────────────────
+
+def drop_genotypes(ped, founder_rows, haps, n_reps, coefs=None, targets=None,
+                   rng=None, cell_budget=CELL_BUDGET):
+    """
+    Przenosi allele z VCF założycieli przez rodowód (każde miejsce niezależnie).
+    founder_rows: dla każdego osobnika rodowodu wiersz w haps (-1 = brak genotypu).
+    coefs: współczynniki selekcji dla miejsc (NaN = miejsce bez mutacji m2).
+    targets: indeksy osobników, dla których liczone są wyniki (domyślnie wszyscy).
+
+    Zwraca (homozygosity, load):
+    • homozygosity – osobniki × repliki, odsetek homozygotycznych miejsc
+    • load – LoadAccumulator dla osobników × replik (kolumny spłaszczone)
+    """
+    rng = np.random.default_rng(rng)
+    targets = np.arange(len(ped)) if targets is None else np.asarray(targets)
+    n_sites = haps.shape[2]
+    n_t = len(targets)
+
+    # etykieta 2·i + h → wiersz w spłaszczonych haplotypach (2·wiersz + h) lub -1
+    base = np.repeat(np.asarray(founder_rows), 2)
+    hap_row = np.where(base >= 0, 2 * base + np.tile([0, 1], len(ped)), -1)
+    flat = np.concatenate([haps.reshape(-1, n_sites), np.full((1, n_sites), -1, np.int8)])
+    hap_row[hap_row < 0] = flat.shape[0] - 1
+
+    hom = np.zeros((n_t, n_reps), dtype=np.int64)
+    called = np.zeros((n_t, n_reps), dtype=np.int64)
+    load = LoadAccumulator(n_t * n_reps)
+    coefs = np.full(n_sites, np.nan) if coefs is None else np.asarray(coefs, dtype=np.float64)
+
+    chunk = max(1, cell_budget // max(1, 2 * len(ped) * n_reps))
+    for start in range(0, n_sites, chunk):
+        sites = np.arange(start, min(start + chunk, n_sites))
+        # jedna replika gene-drop na (miejsce, replika)
+        labels = drop_labels(ped, len(sites) * n_reps, rng)[targets]
+        labels = labels.reshape(n_t, 2, len(sites), n_reps)
+        alleles = flat[hap_row[labels.astype(np.int64)], sites[None, None, :, None]]
+
+        a0, a1 = alleles[:, 0], alleles[:, 1]                        # cele × miejsca × repliki
+        ok = (a0 >= 0) & (a1 >= 0)
+        hom += ((a0 == a1) & ok).sum(axis=1)
+        called += ok.sum(axis=1)
+
+        m2 = ~np.isnan(coefs[sites])
+        if m2.any():
+            dosage = np.where(ok, a0 + a1, -1)[:, m2]                # cele × m2 × repliki
+            load.update(coefs[sites][m2], dosage.transpose(1, 0, 2).reshape(m2.sum(), -1))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        homozygosity = hom / called
+    return homozygosity, load
+
+
+def genotype_summary(ped, targets, homozygosity, load, f_drop=None):
+    """Średnie z replik dla każdego osobnika (ID jako tekst)"""
+    n_t, n_reps = homozygosity.shape
+    per_rep = lambda x: np.asarray(x).reshape(n_t, n_reps).mean(axis=1)
+    summary = pd.DataFrame({
+        "ID": ped.ids[targets].astype(str),
+        "avg_hom": np.nanmean(homozygosity, axis=1),
+        "selection_homo": per_rep(load.sel_homo),
+        "selection_hetero": per_rep(load.sel_hetero),
+        "mutation_count": per_rep(load.mutation_count),
+    })
+    summary["selection_total"] = summary["selection_homo"] + summary["selection_hetero"]
+    if f_drop is not None:
+        summary.insert(1, "F_drop", f_drop[targets])
+    return summary
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Vectorised gene-drop over the pedigree, all replicates at once.")
+    ap.add_argument("--ped", required=True, help="plik rodowodu")
+    ap.add_argument("--format", choices=["ped", "plink"], default="ped")
+    ap.add_argument("--reps", type=int, default=10_000, help="liczba replik")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--founders", help="plik exact_founder_input (próbka VCF → ID założyciela)")
+    ap.add_argument("--vcf", help="VCF założycieli (np. wisentinfo_slim_fil.vcf)")
+    ap.add_argument("--mutations", help="plik mutacji m2 (obciążenie genetyczne)")
+    ap.add_argument("--targets", nargs="+", help="ID osobników do wyników genotypowych")
+    ap.add_argument("--out", type=Path, default=OUT_PARQUET)
+    ap.add_argument("--survival-out", type=Path, default=SURVIVAL_PARQUET)
+    args = ap.parse_args()
+
+    frame = read_plink_ped(args.ped) if args.format == "plink" else read_ped(args.ped)
+    ped = Pedigree.from_frame(frame)
+    rng = np.random.default_rng(args.seed)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+
+    # Tryb etykiet: IBD i przeżywalność alleli założycieli
+    assignment = read_founder_assignment(args.founders) if args.founders else {}
+    founders = list(assignment) or list(FOUNDERS)
+    labels = drop_labels(ped, args.reps, rng)
+    f_drop = ibd_homozygosity(labels).mean(axis=1)
+    founder_allele_survival(ped, labels, founders).to_parquet(args.survival_out, index=False)
+    del labels
+    print(f"Przeżywalność alleli założycieli zapisano do pliku: {args.survival_out}")
+
+    if not args.vcf:
+        pd.DataFrame({"ID": ped.ids.astype(str), "F_drop": f_drop}).to_parquet(args.out, index=False)
+        print(f"F_drop ({args.reps} replik) zapisano do pliku: {args.out}")
+        return
+
+    # Tryb genotypów: allele z VCF założycieli
+    by_text = {str(i): i for i in ped.ids}
+    founder_ids = [i for i in assignment if i in ped.index]
+    positions, haps = founder_haplotypes(args.vcf, [assignment[i] for i in founder_ids])
+    founder_rows = np.full(len(ped), -1, dtype=np.int64)
+    founder_rows[ped.indices(founder_ids)] = np.arange(len(founder_ids))
+
+    coefs = None
+    if args.mutations:
+        rows, s = m2_rows(positions, load_mutation_index(args.mutations))
+        coefs = np.full(len(positions), np.nan)
+        coefs[rows] = s
+
+    targets = (ped.indices([by_text[t] for t in args.targets]) if args.targets
+               else np.arange(len(ped)))
+    homozygosity, load = drop_genotypes(ped, founder_rows, haps, args.reps, coefs, targets, rng)
+    genotype_summary(ped, targets, homozygosity, load, f_drop).to_parquet(args.out, index=False)
+    print(f"Wyniki gene-drop ({args.reps} replik) zapisano do pliku: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+genome.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Lista kontigów genomu (nazwa, długość) zamiast jednego chromosomu
+  i stałej GENOME_LENGTH
+• Źródła długości: nagłówek VCF (##contig), magazyn .gts, indeks FASTA
+  (.fai) lub pragmy ##sequence-region w GFF3
+• Mianownik genomowy (suma długości kontigów) dla ROH% i FROH
+• Przesunięcia kontigów na jednej osi pozycji SLiM (kontigi kolejno, jak
+  w gff_to_slim.py) – dopasowanie (CHROM, POS) do katalogu mutacji m2
+"""
+
+import gzip
+from pathlib import Path
+
+GENOME_LENGTH = 106_932_631  # domyślna długość (jeden chromosom z symulacji SLiM)
+
+
+def read_fai(path):
+    """Indeks FASTA (samtools faidx): kolumny nazwa, długość, ..."""
+    contigs = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 2:
+                contigs.append((fields[0], int(fields[1])))
+    return contigs
+
+
+def read_gff_regions(path):
+    """Pragmy ##sequence-region <seqid> <start> <end> z nagłówka GFF3"""
+    contigs = []
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.startswith("#"):
+                break
+            if line.startswith("##sequence-region"):
+                _, seqid, _start, end = line.split()[:4]
+                contigs.append((seqid, int(end)))
+    return contigs
+
+
+def contig_lengths(source, default_length=GENOME_LENGTH):
+    """
+    Kontigi z otwartego cyvcf2.VCF lub magazynu .gts.
+    Brak długości w nagłówku (lub -1) → default_length; brak kontigów → [].
+    """
+    try:
+        names = list(source.seqnames)
+    except (AttributeError, ValueError):
+        return []
+    try:
+        lengths = [int(x) for x in source.seqlens]
+    except (AttributeError, ValueError):
+        lengths = []
+    lengths += [-1] * (len(names) - len(lengths))
+    return [(name, length if length > 0 else default_length)
+            for name, length in zip(names, lengths)]
+
+
+def load_contigs(path, default_length=GENOME_LENGTH):
+    """Kontigi z pliku .fai, GFF3, magazynu .gts lub VCF (wg rozszerzenia)"""
+    path = Path(path)
+    name = path.name.lower()
+    if name.endswith(".fai"):
+        return read_fai(path)
+    if name.endswith((".gff", ".gff3", ".gff.gz", ".gff3.gz")):
+        return read_gff_regions(path)
+
+    from genotype_store import is_store, open_store
+    if is_store(path):
+        return contig_lengths(open_store(path), default_length)
+    from cyvcf2 import VCF
+    return contig_lengths(VCF(str(path)), default_length)
+
+
+def select_contigs(contigs, names=None):
+    """Wybrane kontigi (w kolejności genomu); names=None → wszystkie"""
+    if not names:
+        return list(contigs)
+    wanted = set(names)
+    return [(c, n) for c, n in contigs if c in wanted]
+
+
+def genome_length(contigs):
+    """Suma długości kontigów – mianownik genomowy"""
+    return sum(length for _, length in contigs)
+
+
+def contig_offsets(contigs):
+    """Nazwa kontigu → przesunięcie na wspólnej osi (kontigi kolejno, od 0)"""
+    offsets, shift = {}, 0
+    for name, length in contigs:
+        offsets[name] = shift
+        shift += length
+    return offsets
+
+
+def load_offsets(path):
+    """
+    Przesunięcia kontigów z <plik>.contigs.tsv (gff_to_slim.py: contig, offset,
+    length) albo z kolejnych długości kontigów (.fai, GFF3, VCF, magazyn .gts).
+    Pozycja rekordu (CHROM, POS) na osi SLiM: offset[CHROM] + POS − 1.
+    """
+    path = Path(path)
+    if path.name.endswith(".contigs.tsv"):
+        offsets = {}
+        with open(path, encoding="utf-8") as fh:
+            header = fh.readline().rstrip("\n").split("\t")
+            name_col, offset_col = header.index("contig"), header.index("offset")
+            for line in fh:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > offset_col:
+                    offsets[fields[name_col]] = int(fields[offset_col])
+        return offsets
+    return contig_offsets(load_contigs(path))
+
+
+def has_index(vcf_file):
+    """Czy VCF ma indeks .tbi/.csi (zapytania o region, np. bgzf_index.py)"""
+    return any(Path(str(vcf_file) + ext).exists() for ext in (".tbi", ".csi"))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+genotype_store.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Jednorazowa konwersja finalout_<id>_genomes.vcf.gz do binarnego
+  magazynu genotypów finalout_<id>_genomes.gts/
+• Kolejne analizy otwierają magazyn przez np.memmap (bez kopiowania
+  i bez parsowania tekstu VCF)
+
+Zawartość katalogu .gts:
+• genotypes.bin  – macierz warianty × osobniki:
+                     int8: liczba alleli alternatywnych 0/1/2, -1 = brak danych
+                     lub (--packed) uint8: 4 genotypy na bajt, kod = dawka + 1
+• positions.npy  – pozycje POS (int64), rosnąco
+• chrom_idx.npy  – indeks kontigu każdego wariantu (int16)
+• meta.json      – osobniki, kontigi i ich długości, liczba wariantów,
+                   tryb pakowania oraz rozmiar/mtime pliku źródłowego
+
+Uwaga: dawka (suma alleli) wystarcza dla wariantów dwualleliczych, jakie
+zapisuje SLiM / py_ped_sim (jedna mutacja na wiersz VCF).
+
+Uruchamianie:
+python genotype_store.py finalout_*_genomes.vcf.gz --workers 24
+python genotype_store.py finalout_17_genomes.vcf.gz --packed
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+STORE_SUFFIX = ".gts"
+CHUNK_SIZE = 4096
+
+# ── Kodowanie genotypów ─────────────────────────────────────────────────
+
+def dosage_from_alleles(gt):
+    """Dawka alleli alternatywnych z macierzy alleli cyvcf2; -1 gdy brak danych"""
+    a0, a1 = gt[:, 0], gt[:, 1]
+    called = (a0 >= 0) & (a1 >= 0)
+    return np.where(called, a0 + a1, -1).astype(np.int8)
+
+
+def pack_2bit(dosage):
+    """Pakuje blok dawek (warianty × osobniki) po 4 genotypy na bajt"""
+    rows, n = dosage.shape
+    codes = (np.clip(dosage, -1, 2) + 1).astype(np.uint8)
+    padded = np.zeros((rows, -(-n // 4) * 4), dtype=np.uint8)
+    padded[:, :n] = codes
+    quads = padded.reshape(rows, -1, 4)
+    return (quads[:, :, 0] | quads[:, :, 1] << 2 | quads[:, :, 2] << 4 | quads[:, :, 3] << 6)
+
+
+def unpack_2bit(packed, n_samples):
+    """Odwrotność pack_2bit – zwraca dawki int8"""
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+    codes = (packed[:, :, None] >> shifts) & 3
+    return codes.reshape(packed.shape[0], -1)[:, :n_samples].astype(np.int8) - 1
+
+
+def store_path(vcf_file):
+    """finalout_17_genomes.vcf.gz → finalout_17_genomes.gts"""
+    vcf_file = Path(vcf_file)
+    name = vcf_file.name
+    for ext in (".vcf.gz", ".vcf.bgz", ".vcf"):
+        if name.endswith(ext):
+            name = name[: -len(ext)]
+            break
+    return vcf_file.with_name(name + STORE_SUFFIX)
+
+
+def is_store(path):
+    """Czy ścieżka to katalog magazynu genotypów"""
+    return (Path(path) / "meta.json").is_file()
+
+# ── Magazyn: odczyt ─────────────────────────────────────────────────────
+
+class GenotypeStore:
+    """Magazyn genotypów jednej repliki otwarty bez kopiowania (memmap)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        self.samples = self.meta["samples"]
+        self.seqnames = self.meta["contigs"]
+        self.seqlens = self.meta["seqlens"]
+        self.packed = self.meta["packed"]
+        self.n_variants = self.meta["n_variants"]
+
+        self.positions = np.load(self.path / "positions.npy", mmap_mode="r")
+        self.chrom_idx = np.load(self.path / "chrom_idx.npy", mmap_mode="r")
+        if self.n_variants:
+            width = -(-len(self.samples) // 4) if self.packed else len(self.samples)
+            dtype = np.uint8 if self.packed else np.int8
+            self.genotypes = np.memmap(self.path / "genotypes.bin", dtype=dtype, mode="r",
+                                       shape=(self.n_variants, width))
+        else:
+            self.genotypes = np.empty((0, len(self.samples)), dtype=np.int8)
+
+    def dosages(self, rows=slice(None)):
+        """Dawki int8 dla wybranych wierszy (slice lub tablica indeksów)"""
+        block = self.genotypes[rows]
+        if self.packed:
+            return unpack_2bit(np.asarray(block), len(self.samples))
+        return block
+
+    def contig_rows(self, chrom):
+        """
+        Zakres wierszy [lo, hi) kontigu. Warianty kontigu leżą obok siebie
+        (posortowany VCF), ale kolejność kontigów nie musi być jak w nagłówku.
+        """
+        if chrom not in self.seqnames:
+            return 0, 0
+        rows = np.flatnonzero(self.chrom_idx == self.seqnames.index(chrom))
+        return (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+
+    def iter_blocks(self, chunk_size=CHUNK_SIZE, chrom=None):
+        """
+        Bloki (positions, dosages) kolejnych wariantów.
+        chrom: nazwa kontigu (domyślnie wszystkie).
+        """
+        lo, hi = 0, self.n_variants
+        if chrom is not None:
+            lo, hi = self.contig_rows(chrom)
+        for start in range(lo, hi, chunk_size):
+            stop = min(start + chunk_size, hi)
+            yield self.positions[start:stop], self.dosages(slice(start, stop))
+
+
+def open_store(path):
+    """Otwiera magazyn (katalog .gts lub ścieżka do VCF z gotowym magazynem)"""
+    path = Path(path)
+    return GenotypeStore(path if is_store(path) else store_path(path))
+
+# ── Magazyn: konwersja ──────────────────────────────────────────────────
+
+def _source_stamp(vcf_file):
+    st = os.stat(vcf_file)
+    return {"source": Path(vcf_file).name, "source_size": st.st_size,
+            "source_mtime": st.st_mtime}
+
+
+def is_up_to_date(vcf_file, out_dir=None):
+    """Czy magazyn istnieje i odpowiada bieżącemu plikowi VCF (rozmiar + mtime)"""
+    out_dir = Path(out_dir) if out_dir else store_path(vcf_file)
+    if not is_store(out_dir):
+        return False
+    with open(out_dir / "meta.json", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    stamp = _source_stamp(vcf_file)
+    return all(meta.get(k) == v for k, v in stamp.items())
+
+
+def convert_vcf(vcf_file, out_dir=None, packed=False, chunk_size=CHUNK_SIZE, force=False):
+    """
+    Konwertuje VCF do magazynu .gts w jednym przebiegu.
+    Zapis do katalogu tymczasowego i zamiana na końcu, więc przerwana
+    konwersja nie zostawia niekompletnego magazynu.
+    """
+    from cyvcf2 import VCF
+
+    out_dir = Path(out_dir) if out_dir else store_path(vcf_file)
+    if not force and is_up_to_date(vcf_file, out_dir):
+        return out_dir
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    vcf = VCF(str(vcf_file))
+    contigs = list(vcf.seqnames)
+    try:
+        seqlens = [int(x) for x in vcf.seqlens]
+    except AttributeError:
+        seqlens = []
+    contig_idx = {c: i for i, c in enumerate(contigs)}
+
+    n_samples = len(vcf.samples)
+    block = np.empty((chunk_size, n_samples), dtype=np.int8)
+    positions, chroms = [], []
+    n = 0
+
+    with open(tmp_dir / "genotypes.bin", "wb") as out:
+        def flush(rows):
+            data = pack_2bit(rows) if packed else rows
+            out.write(np.ascontiguousarray(data).tobytes())
+
+        for variant in vcf:
+            if variant.CHROM not in contig_idx:
+                contig_idx[variant.CHROM] = len(contigs)
+                contigs.append(variant.CHROM)
+            block[n] = dosage_from_alleles(variant.genotype.array())
+            positions.append(variant.POS)
+            chroms.append(contig_idx[variant.CHROM])
+            n += 1
+            if n == chunk_size:
+                flush(block)
+                n = 0
+        if n:
+            flush(block[:n])
+
+    np.save(tmp_dir / "positions.npy", np.asarray(positions, dtype=np.int64))
+    np.save(tmp_dir / "chrom_idx.npy", np.asarray(chroms, dtype=np.int16))
+    meta = {"samples": list(vcf.samples), "contigs": contigs, "seqlens": seqlens,
+            "n_variants": len(positions), "packed": bool(packed),
+            **_source_stamp(vcf_file)}
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert replicate VCFs to memory-mapped genotype stores.")
+    ap.add_argument("vcf", nargs="+", help="pliki finalout_*_genomes.vcf.gz")
+    ap.add_argument("--packed", action="store_true", help="2 bity na genotyp zamiast int8")
+    ap.add_argument("--workers", type=int, default=1, help="liczba procesów równoległych")
+    ap.add_argument("--force", action="store_true", help="konwertuj także aktualne magazyny")
+    args = ap.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futs = {pool.submit(convert_vcf, v, None, args.packed, CHUNK_SIZE, args.force): v
+                for v in args.vcf}
+        for fut in as_completed(futs):
+            print(f"[✓] {futs[fut]} → {fut.result()}", file=sys.stdout)
+
+if __name__ == "__main__":
+    main()
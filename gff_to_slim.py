@@ -14,105 +14,112 @@ Cel:
 
 • Wypisuje też podsumowanie liczby i długości każdego typu
 
+Wiele chromosomów:
+• Pierwszy przebieg zapisuje tylko położenie (offset, długość) bloków
+  wierszy każdego seqid; potem każdy chromosom parsowany jest osobno,
+  więc w pamięci są przedziały jednego chromosomu naraz
+• Chromosomy mogą być przetwarzane równolegle (--workers, plik
+  nieskompresowany)
+• Długości: liczba (każdy seqid ma tę długość – jak dotąd dla jednego
+  chromosomu), plik .fai / VCF, albo "-" = pragmy ##sequence-region z GFF3
+• Wynik: jeden plik z przesunięciami kontigów (kontigi kolejno, jak jeden
+  genom w SLiM) + <output>.contigs.tsv (contig, offset, length),
+  albo (--per-contig) osobny plik dla każdego kontigu
+
+Wejście dla SLiM (jedno wywołanie na typ zamiast pętli po wierszach):
+• --eidos: fragment Eidos z initializeGenomicElement(g1/g2/g3, c(starty), c(końce))
+  dla EXON/INTRON/NC (pozycje 0-based), wczytywany w founders_sim_slim
+  przez source(); --vectors: te same wektory jako tekst
+• W tym samym przebiegu sprawdzane jest, czy elementy są posortowane
+  i rozłączne; nakładania (np. geny na przeciwnych niciach) usuwa --flatten
+  (priorytet EXON > INTRON > NC)
+• --elements: wektory z istniejącej tabeli elementów (np. ncgff_bed1.txt)
+
 Uruchamianie:
 python gfftoslim4.py input.gff3 <długość chromosomu> output.txt
+python gff_to_slim.py Bos_taurus.gff3 - slim_elements.txt --workers 8
+python gff_to_slim.py Bos_taurus.gff3 genome.fa.fai slim_{seqid}.txt --per-contig --seqids 1 2 X
+python gff_to_slim.py Bos_taurus.gff3 - slim_elements.txt --flatten --eidos ncgff_elements.eidos
+python gff_to_slim.py --elements ncgff_bed1.txt --eidos ncgff_elements.eidos
 """
 
+import argparse
+import gzip
 import sys
 import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from genome import load_contigs, read_gff_regions
+from intervals import as_arrays, complement, merge_grouped
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+FEATURES = ("EXON", "INTRON", "NC")
+CHUNK_SIZE = 1 << 23  # bajty tekstu GFF3 parsowane jednym wywołaniem wyrażenia regularnego
+
 # ── Funkcje pomocnicze ──────────────────────────────────────────────────
 
-def merge_intervals(intervals):
-    """Scala przedziały, które się nachodzą lub stykają"""
-    if not intervals:
-        return []
-    intervals = sorted(intervals, key=lambda x: x[0])
-    merged = [intervals[0]]
-    for current in intervals[1:]:
-        last = merged[-1]
-        if current[0] <= last[1] + 1:
-            merged[-1] = (last[0], max(last[1], current[1]))
-        else:
-            merged.append(current)
-    return merged
-
-def compute_intergenic_intervals(gene_regions, chrom_length):
-    """Zwraca regiony międzygenowe (luk między genami)"""
-    intergenic = []
-    if not gene_regions:
-        return [(1, chrom_length)]
-    gene_regions = sorted(gene_regions, key=lambda x: x[0])
-    if gene_regions[0][0] > 1:
-        intergenic.append((1, gene_regions[0][0] - 1))
-    for i in range(len(gene_regions) - 1):
-        current_end = gene_regions[i][1]
-        next_start = gene_regions[i+1][0]
-        if next_start > current_end + 1:
-            intergenic.append((current_end + 1, next_start - 1))
-    if gene_regions[-1][1] < chrom_length:
-        intergenic.append((gene_regions[-1][1] + 1, chrom_length))
-    return intergenic
+# Wiersze transkryptów i eksonów: typ, start, end, atrybuty (kolumna 9)
+FEATURE_RE = re.compile(
+    r"^(?!#)[^\t\n]*\t[^\t\n]*\t(exon|mrna|lnc_rna)\t(\d+)\t(\d+)"
+    r"\t[^\t\n]*\t[^\t\n]*\t[^\t\n]*\t([^\t\n\r]*)[^\n]*$",
+    re.M | re.I,
+)
+def _attr_id(attributes, key):
+    """
+    Wartość ostatniego atrybutu key= (do następnego '=' lub ';', ostatni
+    człon po ':'), jak attr.split("=")[1].split(":")[-1] w pierwotnym parserze.
+    """
+    i = attributes.rfind(key)
+    while i > 0 and attributes[i - 1] != ";":
+        i = attributes.rfind(key, 0, i)
+    if i < 0:
+        return None
+    value = attributes[i + len(key):].split(";", 1)[0].split("=", 1)[0]
+    return value.split(":")[-1]
 
-def parse_gff3_transcripts(gff_file):
+def parse_transcript_text(chunks):
     """
-    Parsuje plik GFF3 i zwraca słowniki:
+    Parsuje tekst GFF3 (kawałki kończące się na granicy wiersza – jeden
+    chromosom lub cały plik) i zwraca słowniki:
     - transcripts[transcript_id] = {'start':, 'end':, 'exons': []}
     - transcript_to_gene[transcript_id] = gene_id
     """
     transcripts = {}
     transcript_to_gene = {}
-    with open(gff_file) as f:
-        for line in f:
-            if line.startswith("#"): continue
-            fields = line.strip().split("\t")
-            if len(fields) < 9: continue
-            feature = fields[2].lower()
-            try:
-                start = int(fields[3])
-                end = int(fields[4])
-            except ValueError:
-                continue
-            attributes = fields[8]
+    for text in chunks:
+        for feature, start, end, attributes in FEATURE_RE.findall(text):
+            start, end = int(start), int(end)
 
             # Transkrypty
-            if feature in {"mrna", "lnc_rna"}:
-                tid = gene_id = None
-                for attr in attributes.split(";"):
-                    if attr.startswith("ID="):
-                        tid = attr.split("=")[1].split(":")[-1]
-                    if attr.startswith("Parent="):
-                        gene_id = attr.split("=")[1].split(":")[-1]
+            if feature.lower() != "exon":
+                tid = _attr_id(attributes, "ID=")
                 if tid:
                     transcripts[tid] = {"start": start, "end": end, "exons": []}
-                    transcript_to_gene[tid] = gene_id
+                    transcript_to_gene[tid] = _attr_id(attributes, "Parent=")
 
             # Eksony
-            elif feature == "exon":
-                parent = None
-                for attr in attributes.split(";"):
-                    if attr.startswith("Parent="):
-                        parent = attr.split("=")[1].split(":")[-1]
+            else:
+                parent = _attr_id(attributes, "Parent=")
                 if parent:
                     if parent not in transcripts:
                         transcripts[parent] = {"start": start, "end": end, "exons": []}
                     transcripts[parent]["exons"].append((start, end))
     return transcripts, transcript_to_gene
 
-# ── Główna funkcja ───────────────────────────────────────────────────────
-
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python gfftoslim4.py <input.gff3> <chrom_length> <output.txt>")
-        sys.exit(1)
-
-    gff_file = sys.argv[1]
-    chrom_length = int(sys.argv[2])
-    output_file = sys.argv[3]
-
-    transcripts, transcript_to_gene = parse_gff3_transcripts(gff_file)
+def parse_gff3_transcripts(gff_file):
+    """Jak parse_transcript_text dla całego pliku (bez podziału na seqid)"""
+    return parse_transcript_text(iter_block_text(gff_file, [(0, -1)]))
 
+def slim_intervals(transcripts, transcript_to_gene, chrom_length):
+    """
+    Przedziały (feature, start, end) jednego chromosomu posortowane po start:
+    scalone eksony genów, introny między nimi i regiony NC między genami.
+    """
     # Grupowanie transkryptów wg genu
     gene_dict = {}
     for tid, data in transcripts.items():
@@ -123,61 +130,365 @@ def main():
         gene["gene_start"] = min(gene["gene_start"] or data["start"], data["start"])
         gene["gene_end"] = max(gene["gene_end"] or data["end"], data["end"])
 
-    # Przetwarzanie genów: scala eksony, oblicza introny
-    gene_intervals = {}
-    for gid, info in gene_dict.items():
-        exons = info["exons"]
-        if exons:
-            merged_exons = merge_intervals(exons)
-            introns = []
-            for i in range(len(merged_exons) - 1):
-                s, e = merged_exons[i][1] + 1, merged_exons[i+1][0] - 1
-                if s <= e:
-                    introns.append((s, e))
-            gene_intervals[gid] = {
-                "adj_start": merged_exons[0][0],
-                "adj_end": merged_exons[-1][1],
-                "merged_exons": merged_exons,
-                "introns": introns
-            }
-        else:
-            gene_intervals[gid] = {
-                "adj_start": info["gene_start"],
-                "adj_end": info["gene_end"],
-                "merged_exons": [(info["gene_start"], info["gene_end"])],
-                "introns": []
-            }
-
-    # Zbieranie przedziałów do zapisu
+    # Eksony wszystkich genów naraz (gen bez eksonów = jeden przedział na cały gen)
+    gene_idx, exons = [], []
+    for g, info in enumerate(gene_dict.values()):
+        gene_exons = info["exons"] or [(info["gene_start"], info["gene_end"])]
+        gene_idx.extend([g] * len(gene_exons))
+        exons.extend(gene_exons)
+    genes, exon_starts, exon_ends = merge_grouped(gene_idx, *as_arrays(exons))
+
+    # Introny: luki między scalonymi eksonami tego samego genu
+    same = genes[1:] == genes[:-1]
+    intron_starts, intron_ends = exon_ends[:-1][same] + 1, exon_starts[1:][same] - 1
+
+    # Regiony NC (międzygenowe): dopełnienie zakresów genów
+    head, tail = np.ones(len(genes), dtype=bool), np.ones(len(genes), dtype=bool)
+    head[1:], tail[:-1] = ~same, ~same
+    first, last = np.flatnonzero(head), np.flatnonzero(tail)
+    nc_starts, nc_ends = complement(exon_starts[first], exon_ends[last], 1, chrom_length)
+
+    # Kolejność jak po stabilnym sortowaniu po start listy: geny kolejno
+    # (eksony, potem introny), na końcu NC
+    starts = np.concatenate([exon_starts, intron_starts, nc_starts])
+    ends = np.concatenate([exon_ends, intron_ends, nc_ends])
+    kind = np.repeat([0, 1, 2], [len(exon_starts), len(intron_starts), len(nc_starts)])
+    owner = np.concatenate([genes, genes[1:][same], np.full(len(nc_starts), len(gene_dict))])
+    order = np.lexsort((kind, owner, starts))
+    return [(FEATURES[k], s, e) for k, s, e in
+            zip(kind[order].tolist(), starts[order].tolist(), ends[order].tolist())]
+
+# ── Strumieniowy odczyt wg seqid ────────────────────────────────────────
+
+def _open_gff(path):
+    """Plik GFF3 w trybie binarnym (zwykły lub .gz)"""
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+def index_seqids(gff_file):
+    """
+    Jeden przebieg bez parsowania atrybutów: bloki (offset, długość)
+    kolejnych wierszy każdego seqid, w kolejności pierwszego wystąpienia.
+    Plik nie musi być posortowany – seqid może mieć kilka bloków.
+    """
+    blocks = {}
+    current, prefix, start, offset = None, None, 0, 0
+    with _open_gff(gff_file) as fh:
+        for line in fh:
+            if line.startswith(b"##FASTA"):
+                break  # dalej tylko sekwencje
+            if not (line.startswith(b"#") or (prefix and line.startswith(prefix))):
+                tab = line.find(b"\t")
+                if tab > 0:
+                    seqid = line[:tab]
+                    if current is not None:
+                        blocks[current].append((start, offset - start))
+                    current, prefix, start = seqid, seqid + b"\t", offset
+                    blocks.setdefault(current, [])
+            offset += len(line)
+    if current is not None:
+        blocks[current].append((start, offset - start))
+    return {seqid.decode(): spans for seqid, spans in blocks.items()}
+
+def iter_block_text(gff_file, spans, chunk_size=CHUNK_SIZE):
+    """
+    Tekst bloków jednego seqid kawałkami po ~chunk_size bajtów, zawsze
+    do końca wiersza – w pamięci nigdy cały chromosom (length = -1: do końca pliku).
+    """
+    with _open_gff(gff_file) as fh:
+        for start, length in spans:
+            fh.seek(start)
+            remaining = length if length >= 0 else float("inf")
+            while remaining > 0:
+                data = fh.read(int(min(chunk_size, remaining)))
+                if not data:
+                    break
+                remaining -= len(data)
+                if remaining > 0 and not data.endswith(b"\n"):
+                    tail = fh.readline()
+                    remaining -= len(tail)
+                    data += tail
+                yield data.decode()
+
+def convert_contig(gff_file, spans, chrom_length):
+    """Przedziały SLiM jednego chromosomu (zadanie dla puli procesów)"""
+    transcripts, transcript_to_gene = parse_transcript_text(iter_block_text(gff_file, spans))
+    return slim_intervals(transcripts, transcript_to_gene, chrom_length)
+
+def resolve_lengths(gff_file, lengths, seqids_in_file):
+    """
+    Kontigi (seqid, długość) w kolejności wyjścia:
+    liczba → każdy seqid z pliku, "-" → ##sequence-region, ścieżka → .fai/GFF3/VCF.
+    """
+    if str(lengths).isdigit():
+        return [(seqid, int(lengths)) for seqid in seqids_in_file]
+    if lengths == "-":
+        return read_gff_regions(gff_file)
+    return load_contigs(lengths)
+
+def convert_gff(gff_file, lengths, seqids=None, workers=1):
+    """
+    Generator (seqid, długość, przedziały) dla kolejnych chromosomów.
+    Kontigi bez adnotacji to w całości NC; seqid bez długości są pomijane.
+    """
+    blocks = index_seqids(gff_file)
+    contigs = resolve_lengths(gff_file, lengths, list(blocks))
+    if seqids:
+        wanted = set(seqids)
+        contigs = [(c, n) for c, n in contigs if c in wanted]
+    missing = [s for s in blocks if s not in dict(contigs) and (not seqids or s in seqids)]
+    if missing:
+        print(f"[!] Pominięto seqid bez długości: {', '.join(missing[:10])}"
+              + (" …" if len(missing) > 10 else ""))
+
+    tasks = [(gff_file, blocks.get(seqid, []), length) for seqid, length in contigs]
+    # Odczyt .gz wymaga dekompresji od początku, więc równolegle tylko zwykłe pliki
+    if workers > 1 and len(tasks) > 1 and not str(gff_file).endswith(".gz"):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(convert_contig, *zip(*tasks))
+            for (seqid, length), intervals in zip(contigs, results):
+                yield seqid, length, intervals
+    else:
+        for (seqid, length), task in zip(contigs, tasks):
+            yield seqid, length, convert_contig(*task)
+
+# ── Zapis ────────────────────────────────────────────────────────────────
+
+def write_intervals(out, intervals, offset=0):
+    for feat, s, e in intervals:
+        out.write(f"{feat}\t{s + offset}\t{e + offset}\n")
+
+def contig_output_path(output_file, seqid):
+    """slim_{seqid}.txt → slim_1.txt; bez {seqid}: slim.txt → slim.1.txt"""
+    if "{seqid}" in output_file:
+        return Path(output_file.format(seqid=seqid))
+    path = Path(output_file)
+    return path.with_name(f"{path.stem}.{seqid}{path.suffix}")
+
+def contigs_table_path(output_file):
+    return Path(str(output_file) + ".contigs.tsv")
+
+# ── Elementy SLiM (jedno wywołanie na typ) ─────────────────────────────
+
+SLIM_TYPES = {"EXON": "g1", "INTRON": "g2", "NC": "g3"}  # jak w founders_sim_slim
+
+def element_arrays(intervals):
+    """(feature, start, end) → tablice NumPy: kody typów (indeks w FEATURES), start, end"""
+    codes = {f: k for k, f in enumerate(FEATURES)}
+    n = len(intervals)
+    kind = np.fromiter((codes[f.upper()] for f, _, _ in intervals), dtype=np.int8, count=n)
+    starts = np.fromiter((s for _, s, _ in intervals), dtype=np.int64, count=n)
+    ends = np.fromiter((e for _, _, e in intervals), dtype=np.int64, count=n)
+    return kind, starts, ends
+
+def check_elements(starts, ends):
+    """
+    Wymogi SLiM: elementy posortowane po start i rozłączne.
+    Zwraca (indeksy nieposortowanych, indeksy nakładających się) – indeks
+    wskazuje element, który zaczyna się przed poprzednim / przed końcem poprzednich.
+    """
+    if len(starts) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    unsorted = np.flatnonzero(starts[1:] < starts[:-1]) + 1
+    overlap = np.flatnonzero(starts[1:] <= np.maximum.accumulate(ends)[:-1]) + 1
+    return unsorted, np.setdiff1d(overlap, unsorted)
+
+def flatten_elements(intervals, priority=FEATURES):
+    """
+    Usuwa nakładanie się elementów (np. geny na przeciwnych niciach):
+    każdy odcinek dostaje typ o najwyższym priorytecie (EXON > INTRON > NC),
+    sąsiednie odcinki tego samego typu są scalane.
+    """
+    if not intervals:
+        return []
+    kind, starts, ends = element_arrays(intervals)
+    bounds = np.unique(np.concatenate([starts, ends + 1]))
+    label = np.full(len(bounds) - 1, -1, dtype=np.int8)
+    # Od najniższego priorytetu – wyższy nadpisuje
+    for code in [FEATURES.index(f) for f in priority][::-1]:
+        sel = kind == code
+        diff = np.zeros(len(bounds), dtype=np.int64)
+        np.add.at(diff, np.searchsorted(bounds, starts[sel]), 1)
+        np.add.at(diff, np.searchsorted(bounds, ends[sel] + 1), -1)
+        label[np.cumsum(diff)[:-1] > 0] = code
+
+    seg_start, seg_end = bounds[:-1], bounds[1:] - 1
+    keep = label >= 0
+    seg_start, seg_end, label = seg_start[keep], seg_end[keep], label[keep]
+    head = np.ones(len(label), dtype=bool)
+    head[1:] = (label[1:] != label[:-1]) | (seg_start[1:] != seg_end[:-1] + 1)
+    first = np.flatnonzero(head)
+    last = np.append(first[1:], len(label)) - 1
+    return [(FEATURES[k], int(s), int(e))
+            for k, s, e in zip(label[first], seg_start[first], seg_end[last])]
+
+class ElementVectors:
+    """Wektory start/end elementów każdego typu, zbierane kontig po kontigu"""
+
+    def __init__(self):
+        self.parts = {f: ([], []) for f in FEATURES}
+
+    def add(self, intervals, shift=0):
+        """Dodaje elementy kontigu przesunięte o shift (offset kontigu − 1 dla GFF)"""
+        kind, starts, ends = element_arrays(intervals)
+        for code, feat in enumerate(FEATURES):
+            sel = kind == code
+            self.parts[feat][0].append(starts[sel] + shift)
+            self.parts[feat][1].append(ends[sel] + shift)
+
+    def vectors(self):
+        """feature → (starts, ends) posortowane po start"""
+        out = {}
+        for feat, (starts, ends) in self.parts.items():
+            starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+            ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+            order = np.argsort(starts, kind="stable")
+            out[feat] = (starts[order], ends[order])
+        return out
+
+def _eidos_vector(values):
+    return "c(" + ",".join(map(str, values.tolist())) + ")"
+
+def write_eidos(path, vectors, types=SLIM_TYPES, source=""):
+    """
+    Fragment Eidos do initialize(): jedno initializeGenomicElement na typ
+    (SLiM przyjmuje wektory start/end), np. source("elements.eidos").
+    """
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(f"// Genomic elements generated by gff_to_slim.py {source}\n".rstrip() + "\n")
+        out.write("// One initializeGenomicElement() call per element type; 0-based positions\n")
+        for feat, (starts, ends) in vectors.items():
+            if len(starts) and feat in types:
+                out.write(f"initializeGenomicElement({types[feat]}, {_eidos_vector(starts)}, "
+                          f"{_eidos_vector(ends)}); // {feat}: {len(starts)}\n")
+
+def write_vectors(path, vectors):
+    """Wektory jako tekst: feature, starts, ends (liczby rozdzielone przecinkami)"""
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("feature\tstarts\tends\n")
+        for feat, (starts, ends) in vectors.items():
+            out.write(f"{feat.lower()}\t{','.join(map(str, starts.tolist()))}\t"
+                      f"{','.join(map(str, ends.tolist()))}\n")
+
+def read_element_table(path):
+    """Istniejąca tabela elementów (feature start end, np. ncgff_bed1.txt) – pozycje bez zmian"""
     intervals = []
-    for info in gene_intervals.values():
-        intervals.extend([("EXON", s, e) for s, e in info["merged_exons"]])
-        intervals.extend([("INTRON", s, e) for s, e in info["introns"]])
-
-    # Regiony NC (międzygenowe)
-    gene_regions = [(info["adj_start"], info["adj_end"]) for info in gene_intervals.values()]
-    intergenic = compute_intergenic_intervals(merge_intervals(gene_regions), chrom_length)
-    intervals.extend([("NC", s, e) for s, e in intergenic])
-
-    # Sortowanie i zapis
-    intervals.sort(key=lambda x: x[1])
-    with open(output_file, "w") as out:
-        out.write("feature\tstart\tend\n")
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3 or parts[0].lower() == "feature":
+                continue
+            intervals.append((parts[0].upper(), int(parts[1]), int(parts[2])))
+    return intervals
+
+def report_problems(name, intervals, unsorted, overlap):
+    """Wypisuje liczbę problemów kontigu i pierwszy przykład"""
+    for label, idx in (("nieposortowanych", unsorted), ("nakładających się", overlap)):
+        if len(idx):
+            i = idx[0]
+            print(f"[!] {name}: {len(idx)} elementów {label}, np. {intervals[i - 1]} → {intervals[i]}")
+
+# ── Główna funkcja ───────────────────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert GFF3 to SLiM EXON/INTRON/NC elements.")
+    ap.add_argument("gff_file", nargs="?", help="plik GFF3 (.gff3 lub .gff3.gz)")
+    ap.add_argument("lengths", nargs="?", help="długość chromosomu, '-' (##sequence-region) lub .fai/VCF")
+    ap.add_argument("output_file", nargs="?", help="plik wynikowy (z --per-contig: szablon z {seqid})")
+    ap.add_argument("--seqids", nargs="+", help="wybrane chromosomy (domyślnie wszystkie)")
+    ap.add_argument("--per-contig", action="store_true", help="osobny plik dla każdego kontigu")
+    ap.add_argument("--workers", type=int, default=1, help="chromosomy przetwarzane równolegle")
+    ap.add_argument("--eidos", help="fragment Eidos: jedno initializeGenomicElement na typ")
+    ap.add_argument("--vectors", help="wektory start/end każdego typu (tekst)")
+    ap.add_argument("--flatten", action="store_true",
+                    help="usuń nakładanie się elementów (EXON > INTRON > NC)")
+    ap.add_argument("--elements", help="zamiast GFF3: istniejąca tabela elementów SLiM "
+                                       "(feature start end, np. ncgff_bed1.txt)")
+    args = ap.parse_args()
+    if not args.elements and not (args.gff_file and args.lengths and args.output_file):
+        ap.error("wymagane: <input.gff3> <długość> <output.txt> albo --elements")
+
+    slim = ElementVectors() if (args.eidos or args.vectors) else None
+    n_problems = 0
+
+    # Tabela elementów (pozycje SLiM) → tylko wyjścia wektorowe
+    if args.elements:
+        intervals = read_element_table(args.elements)
+        if args.flatten:
+            intervals = flatten_elements(intervals)
+        _, starts, ends = element_arrays(intervals)
+        unsorted, overlap = check_elements(starts, ends)
+        report_problems(args.elements, intervals, unsorted, overlap)
+        n_problems = len(unsorted) + len(overlap)
+        if slim is not None:
+            slim.add(intervals)
+        print("Liczba elementów:", len(intervals))
+        write_slim_outputs(args, slim, n_problems, args.elements)
+        return
+
+    totals = {f: 0 for f in FEATURES}
+    counts = {f: 0 for f in FEATURES}
+    table, offset = [], 0
+    combined = None if args.per_contig else open(args.output_file, "w")
+    if combined:
+        combined.write("feature\tstart\tend\n")
+
+    for seqid, length, intervals in convert_gff(args.gff_file, args.lengths, args.seqids, args.workers):
+        if args.flatten:
+            intervals = flatten_elements(intervals)
+        # Kontrola w tym samym przebiegu: kolejność i rozłączność elementów
+        _, starts, ends = element_arrays(intervals)
+        unsorted, overlap = check_elements(starts, ends)
+        report_problems(seqid, intervals, unsorted, overlap)
+        n_problems += len(unsorted) + len(overlap)
+        if slim is not None:
+            slim.add(intervals, offset - 1)  # GFF 1-based → pozycje SLiM 0-based
+
+        if combined:
+            write_intervals(combined, intervals, offset)
+        else:
+            with open(contig_output_path(args.output_file, seqid), "w") as out:
+                out.write("feature\tstart\tend\n")
+                write_intervals(out, intervals)
+        table.append((seqid, offset, length))
+        offset += length
         for feat, s, e in intervals:
-            out.write(f"{feat}\t{s}\t{e}\n")
+            counts[feat] += 1
+            totals[feat] += e - s + 1
+
+    if combined:
+        combined.close()
+        if len(table) > 1:
+            with open(contigs_table_path(args.output_file), "w") as out:
+                out.write("contig\toffset\tlength\n")
+                out.writelines(f"{c}\t{o}\t{n}\n" for c, o, n in table)
 
     # Statystyki
-    exon_total = sum(e - s + 1 for feat, s, e in intervals if feat == "EXON")
-    intron_total = sum(e - s + 1 for feat, s, e in intervals if feat == "INTRON")
-    nc_total = sum(e - s + 1 for feat, s, e in intervals if feat == "NC")
-    total_covered = exon_total + intron_total + nc_total
-    print("Liczba exonów:", sum(1 for i in intervals if i[0] == "EXON"))
-    print("Liczba intronów:", sum(1 for i in intervals if i[0] == "INTRON"))
-    print("Liczba regionów NC:", sum(1 for i in intervals if i[0] == "NC"))
-    print("Średnia długość exonu:", exon_total / max(1, sum(1 for i in intervals if i[0] == "EXON")))
-    print("Średnia długość intronu:", intron_total / max(1, sum(1 for i in intervals if i[0] == "INTRON")))
-    print("Procentowy udział exonów w genomie:", (exon_total / total_covered * 100), "%")
-    print("Wynik zapisano do:", output_file)
+    total_covered = sum(totals.values())
+    print("Liczba kontigów:", len(table))
+    print("Liczba exonów:", counts["EXON"])
+    print("Liczba intronów:", counts["INTRON"])
+    print("Liczba regionów NC:", counts["NC"])
+    print("Średnia długość exonu:", totals["EXON"] / max(1, counts["EXON"]))
+    print("Średnia długość intronu:", totals["INTRON"] / max(1, counts["INTRON"]))
+    print("Procentowy udział exonów w genomie:", (totals["EXON"] / max(1, total_covered) * 100), "%")
+    print("Wynik zapisano do:", args.output_file)
+    write_slim_outputs(args, slim, n_problems, Path(args.gff_file).name)
+
+def write_slim_outputs(args, slim, n_problems, source):
+    """Zapis wyjść wektorowych – SLiM odrzuca nakładające się elementy, więc wtedy błąd"""
+    if slim is None:
+        return
+    if n_problems:
+        print(f"[!] {n_problems} elementów nieposortowanych lub nakładających się – "
+              "nie zapisano wyjść dla SLiM (użyj --flatten)")
+        sys.exit(1)
+    vectors = slim.vectors()
+    if args.eidos:
+        write_eidos(args.eidos, vectors, source=f"from {source}")
+        print("Fragment Eidos zapisano do:", args.eidos)
+    if args.vectors:
+        write_vectors(args.vectors, vectors)
+        print("Wektory elementów zapisano do:", args.vectors)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+homozygosity_io.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Kolumnowy zapis/odczyt homozygotyczności w oknach dla jednej repliki
+  (zamiast jednego pliku output_<ID>.txt na osobnika)
+• Jeden plik na replikę: Parquet (.parquet) lub Arrow IPC (.arrow/.feather)
+
+Układ pliku:
+• Kolumna ID             – identyfikator osobnika (tekst, jak w VCF)
+• Kolumna Homozygosity   – wektor float32 o długości liczby okien
+                           (macierz osobniki × okna, jeden wiersz na osobnika)
+• Metadane window_center – środki okien (lista liczb całkowitych, JSON)
+• Metadane window_layout – (opcjonalnie) window_size, step_size, chrom_length,
+                           z których odtwarzane są dokładne granice okien;
+                           przy wielu kontigach także contigs = [[nazwa, długość], …]
+                           (okna kontigów kolejno, chrom_length = suma długości)
+
+Wartości zaokrąglane są do 4 miejsc po przecinku, jak w plikach tekstowych.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+IPC_SUFFIXES = {".arrow", ".feather", ".ipc"}
+COLUMNAR_SUFFIXES = IPC_SUFFIXES | {".parquet"}
+CENTERS_KEY = b"window_center"
+LAYOUT_KEY = b"window_layout"
+
+
+def window_bounds(chrom_length, window_size=200000, step_size=10000):
+    """
+    Zwraca tablice (starts, ends, centers) wszystkich okien.
+    Okno obejmuje warianty o POS z przedziału [start, end] (obustronnie
+    domkniętym), tak jak zapytanie regionu `chrom:start-end` w cyvcf2.
+    """
+    starts = np.arange(0, chrom_length, step_size, dtype=np.int64)
+    ends = np.minimum(starts + window_size, chrom_length)
+    centers = (starts + ends) // 2
+    return starts, ends, centers
+
+
+def window_edges(centers, layout=None):
+    """
+    Granice okien (starts, ends).
+    Z window_layout – dokładne granice; bez niego okna przyjmowane są jako
+    kafelki stykające się w połowie odległości między środkami.
+    """
+    if layout:
+        bounds = [window_bounds(length, layout["window_size"], layout["step_size"])
+                  for _, length in layout_contigs(layout)]
+        return (np.concatenate([b[0] for b in bounds]),
+                np.concatenate([b[1] for b in bounds]))
+    centers = np.asarray(centers, dtype=np.int64)
+    if len(centers) < 2:
+        return np.zeros_like(centers), 2 * centers
+    mids = (centers[:-1] + centers[1:]) // 2
+    first = max(0, 2 * centers[0] - mids[0])
+    last = 2 * centers[-1] - mids[-1]
+    return np.concatenate([[first], mids]), np.concatenate([mids, [last]])
+
+
+def contig_layout(contigs, window_size=200000, step_size=10000):
+    """
+    window_layout dla listy kontigów (nazwa, długość).
+    Jeden kontig – układ jak dotąd (bez klucza contigs).
+    """
+    contigs = [[str(name), int(length)] for name, length in contigs]
+    layout = {"window_size": int(window_size), "step_size": int(step_size),
+              "chrom_length": sum(length for _, length in contigs)}
+    if len(contigs) > 1:
+        layout["contigs"] = contigs
+    return layout
+
+
+def step_from_centers(centers, window_contigs=None):
+    """
+    Krok okien z różnic środków sąsiednich okien tego samego kontigu
+    (pełne okna są odległe o krok, przycięte na końcu kontigu – mniej);
+    None, gdy żaden kontig nie ma dwóch pełnych okien.
+    """
+    diffs = np.diff(np.asarray(centers, dtype=np.int64))
+    if window_contigs is not None:
+        window_contigs = np.asarray(window_contigs)
+        diffs = diffs[window_contigs[1:] == window_contigs[:-1]]
+    diffs = diffs[diffs > 0]
+    return int(diffs.max()) if len(diffs) else None
+
+
+def layout_from_centers(centers, window_size, step_size, chrom_length, window_contigs=None):
+    """
+    window_layout dla plików bez niego (output_*.txt): okna co step_size
+    od początku każdego kontigu, długość kontigu z ostatniego (przyciętego)
+    okna, chrom_length – mianownik ROH% (długość genomu). Klucz contigs jest
+    zawsze obecny, więc liczba okien nie zależy od chrom_length.
+    """
+    centers = np.asarray(centers, dtype=np.int64)
+    if window_contigs is None:
+        names, counts = [None], [len(centers)]
+    else:
+        window_contigs = np.asarray(window_contigs)
+        starts = np.flatnonzero(np.r_[True, window_contigs[1:] != window_contigs[:-1]])
+        names = [str(name) for name in window_contigs[starts]]
+        counts = np.diff(np.r_[starts, len(window_contigs)])
+    contigs, first = [], 0
+    for name, n in zip(names, counts):
+        last_start = (int(n) - 1) * step_size
+        last_center = int(centers[first + int(n) - 1])
+        # środek = (start + koniec) // 2 → koniec z dokładnością do 1 bp
+        contigs.append([name, max(2 * last_center - last_start, last_start + 1)])
+        first += int(n)
+    return {"window_size": int(window_size), "step_size": int(step_size),
+            "chrom_length": int(chrom_length), "contigs": contigs}
+
+
+def layout_contigs(layout):
+    """Kontigi (nazwa, długość) z window_layout; stary układ = jeden kontig bez nazwy"""
+    if "contigs" in layout:
+        return [(name, length) for name, length in layout["contigs"]]
+    return [(None, layout["chrom_length"])]
+
+
+def contig_slices(layout):
+    """Zakresy kolumn macierzy należące do kolejnych kontigów: [(nazwa, slice), …]"""
+    out, first = [], 0
+    for name, length in layout_contigs(layout):
+        n = len(window_bounds(length, layout["window_size"], layout["step_size"])[0])
+        out.append((name, slice(first, first + n)))
+        first += n
+    return out
+
+
+def is_columnar_path(path) -> bool:
+    """Czy ścieżka wskazuje na plik kolumnowy (Parquet / Arrow IPC)"""
+    return Path(path).suffix.lower() in COLUMNAR_SUFFIXES
+
+
+def quantize(matrix):
+    """Zaokrągla do 4 miejsc (jak w plikach .txt) i rzutuje na float32"""
+    return np.round(np.asarray(matrix, dtype=np.float64), 4).astype(np.float32)
+
+
+def write_homozygosity_matrix(path, sample_names, centers, matrix, layout=None):
+    """
+    Zapisuje macierz osobniki × okna wraz z wektorem środków okien.
+    layout: opcjonalny słownik window_size / step_size / chrom_length
+    (i contigs, patrz contig_layout).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    values = quantize(matrix)
+    n_windows = values.shape[1]
+    hom = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), n_windows)
+
+    table = pa.table({"ID": pa.array([str(s) for s in sample_names]), "Homozygosity": hom})
+    centers_json = json.dumps([int(c) for c in centers]).encode()
+    metadata = {CENTERS_KEY: centers_json}
+    if layout:
+        metadata[LAYOUT_KEY] = json.dumps(layout, default=int).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    if path.suffix.lower() in IPC_SUFFIXES:
+        feather.write_feather(table, path, compression="zstd")
+    else:
+        pq.write_table(table, path, compression="zstd")
+
+
+def read_homozygosity_matrix(path):
+    """
+    Odczytuje plik repliki.
+    Zwraca (sample_names, centers, matrix) – matrix to float32 (osobniki × okna).
+    """
+    path = Path(path)
+    if path.suffix.lower() in IPC_SUFFIXES:
+        table = feather.read_table(path)
+    else:
+        table = pq.read_table(path)
+
+    centers = np.array(json.loads(table.schema.metadata[CENTERS_KEY]), dtype=np.int64)
+    sample_names = table.column("ID").to_pylist()
+    hom = table.column("Homozygosity").combine_chunks()
+    matrix = hom.flatten().to_numpy().reshape(len(sample_names), len(centers))
+    return sample_names, centers, matrix
+
+
+def read_window_layout(path):
+    """Słownik window_layout z metadanych pliku (lub None, jeśli brak)"""
+    path = Path(path)
+    if path.suffix.lower() in IPC_SUFFIXES:
+        with pa.memory_map(str(path)) as source:
+            schema = pa.ipc.open_file(source).schema
+    else:
+        schema = pq.read_schema(path)
+    raw = (schema.metadata or {}).get(LAYOUT_KEY)
+    return json.loads(raw) if raw else None
+
+
+def txt_window_contigs(file):
+    """Kontig każdego okna z kolumny Contig pliku output_<ID>.txt (None – jeden kontig)"""
+    with open(file) as fh:
+        header = fh.readline().split()
+    if "Contig" not in header:
+        return None
+    return np.loadtxt(file, skiprows=1, usecols=header.index("Contig"), dtype=str, ndmin=1)
+
+
+def read_txt_folder(folder):
+    """
+    Składa pliki output_<ID>.txt jednej repliki w macierz osobniki × okna.
+    Zwraca (sample_names, centers, matrix, window_contigs) – jak
+    read_homozygosity_matrix, plus kontig każdego okna (kolumna Contig
+    plików z wieloma kontigami; None – jeden kontig).
+    """
+    files = sorted(Path(folder).glob("output_*.txt"))
+    sample_names, rows, centers = [], [], None
+    for file in files:
+        dat = np.loadtxt(file, skiprows=1, usecols=(0, 1), ndmin=2)
+        if centers is None:
+            centers = dat[:, 0].astype(np.int64)
+        sample_names.append(file.stem.replace("output_", ""))
+        rows.append(dat[:, 1])
+    if not rows:
+        return [], np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), None
+    return sample_names, centers, np.vstack(rows).astype(np.float32), txt_window_contigs(files[0])
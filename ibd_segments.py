@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ibd_segments.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Pochodzenie odcinków homozygotycznych od założycieli (15, 16, 35, …, 147)
+• Każdy haplotyp to lista przedziałów (początek, etykieta haplotypu
+  założyciela) – pamięć rośnie z liczbą rekombinacji, nie markerów
+• Przekazywanie przez rodowód z rekombinacją (liczba crossing-over
+  ~ Poisson(długość × R), pozycje jednostajne), w porządku topologicznym;
+  paczka replik to jedna długa oś, więc każda mejoza to kilka operacji
+  NumPy dla wszystkich replik naraz
+• Odcinki autozygotyczne osobnika: przedziały, w których oba haplotypy
+  niosą tę samą etykietę – z przypisaniem do założyciela
+• Wiele kontigów (--fai): kontigi leżą kolejno na osi repliki; na początku
+  każdego kontigu haplotyp rodzica losowany jest niezależnie (niezależna
+  segregacja chromosomów), a odcinki nie przechodzą między kontigami
+
+Dane wyjściowe:
+• results/ibd_segments.parquet: ID, replicate, start, end, length, founder, haplotype
+  (przy wielu kontigach także contig; start/end względem początku kontigu)
+• results/froh_by_founder.parquet: ID, founder, FROH_pct (średnia z replik)
+
+Uruchamianie:
+python ibd_segments.py --ped mydata/pyped_rodowod --format plink --reps 100
+python ibd_segments.py --ped mydata/pyped_rodowod --format plink --fai bison.fa.fai
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from genome import load_contigs
+from pedigree import FOUNDERS, Pedigree, read_ped, read_plink_ped
+
+# ── Parametry ───────────────────────────────────────────────────────────
+BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
+SEG_PARQUET = BASE / "results" / "ibd_segments.parquet"
+SUMMARY_PARQUET = BASE / "results" / "froh_by_founder.parquet"
+
+GENOME_LENGTH = 106_932_631  # jak w calculate_roh_pct.py
+RECOMBINATION_RATE = 3e-8    # R z modelu SLiM (founders_sim_slim)
+REP_BATCH = 100              # liczba replik symulowanych jednym przejściem
+
+# ── Haplotypy jako przedziały ───────────────────────────────────────────
+# Repliki leżą jedna za drugą na wspólnej osi: replika r zajmuje
+# [r·G, (r+1)·G), G = długość genomu. Losowy haplotyp początkowy każdej
+# repliki to "crossing-over" na jej początku z prawdopodobieństwem 1/2,
+# więc jedna mejoza obsługuje wszystkie repliki naraz. Tak samo na początku
+# każdego kontigu (breaks = początki kontigów w obrębie repliki).
+
+def _simplify(starts, labels, *keys):
+    """Scala sąsiednie przedziały o tej samej etykiecie (i tych samych kluczach)"""
+    keep = np.ones(len(labels), dtype=bool)
+    change = labels[1:] != labels[:-1]
+    for key in keys:
+        change |= key[1:] != key[:-1]
+    keep[1:] = change
+    return (starts[keep], labels[keep], *(key[keep] for key in keys))
+
+
+def _merge_starts(*arrays):
+    """
+    Posortowane połączenie punktów podziału. Powtórzenia nie są usuwane –
+    mają te same etykiety, więc _simplify i tak je scala (szybciej niż union1d).
+    """
+    return np.sort(np.concatenate(arrays))
+
+
+def _labels_at(hap, positions):
+    """Etykiety haplotypu (starts, labels) w podanych pozycjach"""
+    return hap[1][np.searchsorted(hap[0], positions, side="right") - 1]
+
+
+def _assortment_points(genome_length, n_reps, breaks=None):
+    """Początki kontigów wszystkich replik na osi replik (kolejno: replika, kontig)"""
+    breaks = np.zeros(1, dtype=np.int64) if breaks is None else np.asarray(breaks, dtype=np.int64)
+    return (genome_length * np.arange(n_reps, dtype=np.int64)[:, None] + breaks).ravel()
+
+
+def meiosis(hap0, hap1, genome_length, n_reps, rate, rng, breaks=None):
+    """
+    Gameta z dwóch haplotypów rodzica (każdy: (starts, labels) na osi replik).
+    Crossing-over ~ Poisson(G·R) na replikę, w pozycjach jednostajnych;
+    na początku każdego kontigu (breaks) haplotyp losowany niezależnie.
+    """
+    total = genome_length * n_reps
+    cross = rng.integers(1, total, size=rng.poisson(total * rate))
+    points = _assortment_points(genome_length, n_reps, breaks)
+    flips = points[rng.integers(0, 2, size=len(points), dtype=bool)]
+    cross = np.sort(np.concatenate([cross, flips]))
+    if not len(cross):
+        return hap0
+
+    starts = _merge_starts(hap0[0], hap1[0], cross)
+    # Który haplotyp rodzica obowiązuje od danej pozycji
+    use_1 = np.searchsorted(cross, starts, side="right") % 2 == 1
+    labels = np.where(use_1, _labels_at(hap1, starts), _labels_at(hap0, starts))
+    return _simplify(starts, labels)
+
+
+def simulate_haplotypes(ped, n_reps=1, genome_length=GENOME_LENGTH,
+                        rate=RECOMBINATION_RATE, keep=None, rng=None, breaks=None):
+    """
+    Pary haplotypów osobników dla n_reps replik (oś replik jak wyżej).
+    Allel bazowy h osobnika i (rodzic nieznany) ma etykietę 2·i + h (jak w gene_drop.py).
+    keep: indeksy osobników do zwrócenia (domyślnie wszyscy); haplotypy
+    pozostałych zwalniane są po ostatnim potomku, więc pamięć zależy od
+    liczby rekombinacji w "żywej" części rodowodu.
+    breaks: początki kontigów w obrębie repliki (domyślnie jeden kontig).
+    Zwraca słownik indeks → (hap0, hap1).
+    """
+    rng = np.random.default_rng(rng)
+    keep = set(range(len(ped)) if keep is None else np.asarray(keep).tolist())
+
+    # Pozycja ostatniego potomka w porządku topologicznym
+    pos = np.empty(len(ped), dtype=np.int64)
+    pos[ped.order] = np.arange(len(ped))
+    last_use = np.full(len(ped), -1, dtype=np.int64)
+    for parent in (ped.sire, ped.dam):
+        known = parent >= 0
+        np.maximum.at(last_use, parent[known], pos[known])
+    release = {}
+    for i in np.flatnonzero(last_use >= 0):
+        release.setdefault(last_use[i], []).append(i)
+
+    zero = np.zeros(1, dtype=np.int64)
+    haps = {}
+    for step, i in enumerate(ped.order):
+        pair = []
+        for h, parent in enumerate((ped.sire[i], ped.dam[i])):
+            if parent >= 0:
+                pair.append(meiosis(*haps[parent], genome_length, n_reps, rate, rng, breaks))
+            else:
+                pair.append((zero, np.array([2 * i + h], dtype=np.int64)))
+        haps[i] = tuple(pair)
+        for j in release.get(step, ()):
+            if j not in keep:
+                del haps[j]
+    return {i: haps[i] for i in keep}
+
+
+def autozygous_segments(hap0, hap1, genome_length, n_reps=1, breaks=None):
+    """
+    Przedziały, w których oba haplotypy mają tę samą etykietę
+    (dzielone na granicach kontigów, breaks).
+    Zwraca (replicate, start, end, label) – pozycje względem początku repliki.
+    """
+    bounds = _assortment_points(genome_length, n_reps, breaks)
+    starts = _merge_starts(hap0[0], hap1[0], bounds)
+    lab0, lab1 = _labels_at(hap0, starts), _labels_at(hap1, starts)
+    labels = np.where(lab0 == lab1, lab0, -1)
+    part = np.searchsorted(bounds, starts, side="right") - 1
+    starts, labels, part = _simplify(starts, labels, part)
+    part_end = np.append(bounds[1:], genome_length * n_reps)
+    ends = np.minimum(np.append(starts[1:], genome_length * n_reps), part_end[part])
+    ibd = labels >= 0
+    rep = starts[ibd] // genome_length
+    offset = rep * genome_length
+    return rep, starts[ibd] - offset, ends[ibd] - offset, labels[ibd]
+
+# ── Odcinki IBD według założyciela ──────────────────────────────────────
+
+def ibd_by_founder(ped, n_reps, genome_length=GENOME_LENGTH, rate=RECOMBINATION_RATE,
+                   targets=None, min_length=0, batch_size=REP_BATCH, rng=None, contigs=None):
+    """
+    Odcinki autozygotyczne wybranych osobników we wszystkich replikach
+    (repliki symulowane paczkami po batch_size).
+    contigs: lista (nazwa, długość) – genom z wielu kontigów zamiast genome_length.
+    Zwraca ramkę: ID, replicate, start, end, length, founder, haplotype
+    (+ contig, gdy podano contigs; start/end względem początku kontigu).
+    """
+    rng = np.random.default_rng(rng)
+    breaks = None
+    if contigs:
+        lengths = np.array([length for _, length in contigs], dtype=np.int64)
+        breaks = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        genome_length = int(lengths.sum())
+    targets = np.arange(len(ped)) if targets is None else np.asarray(targets)
+    ids, reps, starts, ends, labels = [], [], [], [], []
+
+    for first in range(0, n_reps, batch_size):
+        batch = min(batch_size, n_reps - first)
+        haps = simulate_haplotypes(ped, batch, genome_length, rate, targets, rng, breaks)
+        for i in targets:
+            rep, start, end, label = autozygous_segments(*haps[i], genome_length, batch, breaks)
+            keep = end - start >= min_length
+            ids.append(np.full(keep.sum(), i))
+            reps.append(rep[keep] + first)
+            starts.append(start[keep])
+            ends.append(end[keep])
+            labels.append(label[keep])
+
+    cat = lambda parts, dtype=np.int64: np.concatenate(parts) if parts else np.empty(0, dtype)
+    start, end, label = cat(starts), cat(ends), cat(labels)
+    frame = pd.DataFrame({
+        "ID": ped.ids[cat(ids)].astype(str),
+        "replicate": cat(reps),
+        "start": start,
+        "end": end,
+        "length": end - start,
+        "founder": ped.ids[label // 2].astype(str),
+        "haplotype": label % 2,
+    })
+    if breaks is not None:
+        # Pozycje na osi repliki → kontig i pozycja w kontigu
+        part = np.searchsorted(breaks, start, side="right") - 1
+        frame.insert(2, "contig", np.asarray([name for name, _ in contigs], dtype=object)[part])
+        frame["start"] -= breaks[part]
+        frame["end"] -= breaks[part]
+    return frame
+
+
+def froh_by_founder(segments, n_reps, genome_length=GENOME_LENGTH):
+    """Średni (po replikach) odsetek genomu w odcinkach IBD od każdego założyciela"""
+    total = segments.groupby(["ID", "founder"], as_index=False)["length"].sum()
+    total["FROH_pct"] = total["length"] / (n_reps * genome_length) * 100
+    return total.drop(columns="length")
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Founder-origin IBD segments with recombination.")
+    ap.add_argument("--ped", required=True, help="plik rodowodu")
+    ap.add_argument("--format", choices=["ped", "plink"], default="ped")
+    ap.add_argument("--reps", type=int, default=100, help="liczba replik")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--genome-length", type=int, default=GENOME_LENGTH)
+    ap.add_argument("--fai", help="kontigi (nazwa, długość) z .fai, GFF3 lub VCF zamiast --genome-length")
+    ap.add_argument("--rate", type=float, default=RECOMBINATION_RATE,
+                    help="częstość rekombinacji na pz na pokolenie")
+    ap.add_argument("--min-length", type=int, default=0, help="minimalna długość odcinka (pz)")
+    ap.add_argument("--batch-size", type=int, default=REP_BATCH, help="repliki w jednym przejściu")
+    ap.add_argument("--founders-only", action="store_true",
+                    help=f"tylko odcinki od założycieli {FOUNDERS}")
+    ap.add_argument("--targets", nargs="+", help="ID osobników (domyślnie wszyscy)")
+    ap.add_argument("--out", type=Path, default=SEG_PARQUET)
+    ap.add_argument("--summary-out", type=Path, default=SUMMARY_PARQUET)
+    args = ap.parse_args()
+
+    frame = read_plink_ped(args.ped) if args.format == "plink" else read_ped(args.ped)
+    ped = Pedigree.from_frame(frame)
+    by_text = {str(i): i for i in ped.ids}
+    targets = ped.indices([by_text[t] for t in args.targets]) if args.targets else None
+
+    contigs = load_contigs(args.fai) if args.fai else None
+    genome_length = sum(length for _, length in contigs) if contigs else args.genome_length
+
+    segments = ibd_by_founder(ped, args.reps, args.genome_length, args.rate,
+                              targets, args.min_length, args.batch_size, args.seed, contigs)
+    if args.founders_only:
+        segments = segments[segments["founder"].isin([str(f) for f in FOUNDERS])]
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    segments.to_parquet(args.out, index=False)
+    froh_by_founder(segments, args.reps, genome_length).to_parquet(args.summary_out, index=False)
+    print(f"Odcinki IBD ({len(segments)}) zapisano do pliku: {args.out}")
+    print(f"FROH według założycieli zapisano do pliku: {args.summary_out}")
+
+if __name__ == "__main__":
+    main()
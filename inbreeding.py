@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+inbreeding.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Rodowodowy współczynnik inbredu F_ped dla całego rodowodu bez gęstej
+  macierzy spokrewnień N × N (kinship2): kolumny A = T·D·Tᵀ liczone
+  metodą pośrednią Colleau (2002), pokolenie po pokoleniu, paczkami
+  kolumn – pamięć liniowa względem liczby osobników
+• Spokrewnienie (kinship) par wybranych osobników na żądanie tą samą
+  metodą – dwa przejścia po pokoleniach, bez budowy A
+• Wynik: Parquet z kolumnami ID, F_ped, generation, do złączenia
+  po ID z wynikami homozygotyczności / FROH
+
+Uruchamianie:
+python inbreeding.py --ped pyped_rodowod --format plink
+python inbreeding.py --ped S1.ped --kinship 15 16 147 --kinship-out kin.parquet
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pedigree import Pedigree, read_ped, read_plink_ped
+
+# ── Ścieżki ─────────────────────────────────────────────────────────────
+BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
+OUT_PARQUET = BASE / "results" / "pedigree_inbreeding.parquet"
+
+# ── Rachunek w porządku topologicznym ─────────────────────────────────
+COLUMN_CHUNK = 256  # liczba kolumn A liczonych naraz (pamięć: n × COLUMN_CHUNK)
+
+
+def _ranked(ped):
+    """
+    Rodowód w numeracji topologicznej: osobnik r = ped.order[r].
+    Pokolenie g zajmuje wiersze bounds[g]:bounds[g+1].
+    """
+    rank = np.empty(len(ped), dtype=np.int64)
+    rank[ped.order] = np.arange(len(ped))
+    sire = ped.sire[ped.order]
+    dam = ped.dam[ped.order]
+    sire = np.where(sire >= 0, rank[np.maximum(sire, 0)], -1)
+    dam = np.where(dam >= 0, rank[np.maximum(dam, 0)], -1)
+    bounds = np.cumsum([0] + [len(level) for level in ped.levels])
+    return sire, dam, bounds
+
+
+def _scatter_add(X, rows, values):
+    """X[rows] += values z sumowaniem powtórzeń (szybciej niż np.add.at)"""
+    if not len(rows):
+        return
+    order = np.argsort(rows, kind="stable")
+    uniq, starts = np.unique(rows[order], return_index=True)
+    X[uniq] += np.add.reduceat(values[order], starts, axis=0)
+
+
+def _colleau(sire, dam, bounds, D, cols, top):
+    """
+    Kolumny A[:, cols] metodą pośrednią Colleau, A·X = T·(D·(Tᵀ·X)),
+    ograniczone do pokoleń < top (wiersze 0:bounds[top]):
+    • Tᵀ·X – od najmłodszych: rodzic dostaje 1/2 wartości potomka
+    • T·U  – od najstarszych: potomek = U + 1/2 (ojciec + matka)
+    Każde pokolenie to jedna operacja NumPy dla wszystkich kolumn.
+    """
+    n_rows = bounds[top]
+    X = np.zeros((n_rows, len(cols)))
+    X[cols, np.arange(len(cols))] = 1.0
+
+    for g in range(top - 1, 0, -1):
+        lo, hi = bounds[g], bounds[g + 1]
+        for parent in (sire[lo:hi], dam[lo:hi]):
+            known = np.flatnonzero(parent >= 0)
+            _scatter_add(X, parent[known], 0.5 * X[lo + known])
+
+    X *= D[:n_rows, None]
+
+    for g in range(1, top):
+        lo, hi = bounds[g], bounds[g + 1]
+        for parent in (sire[lo:hi], dam[lo:hi]):
+            known = np.flatnonzero(parent >= 0)
+            X[lo + known] += 0.5 * X[parent[known]]
+    return X
+
+
+def _mendelian_variance(F, sire, dam):
+    """Wariancja segregacji D = 1/2 - 1/4 (F_s + F_d), F nieznanego rodzica = -1"""
+    Fs = np.where(sire >= 0, F[np.maximum(sire, 0)], -1.0)
+    Fd = np.where(dam >= 0, F[np.maximum(dam, 0)], -1.0)
+    return 0.5 - 0.25 * (Fs + Fd)
+
+# ── Inbred ──────────────────────────────────────────────────────────────
+
+def inbreeding_coefficients(ped, chunk=COLUMN_CHUNK):
+    """
+    F_ped każdego osobnika rodowodu (tablica w kolejności ped.ids).
+    Pokolenie po pokoleniu: F_i = A[ojciec, matka] / 2, gdzie kolumny A
+    dla ojców z danego pokolenia liczone są metodą Colleau tylko na
+    wcześniejszych pokoleniach (ich F i D są już znane).
+    Pamięć: najwyżej n × chunk liczb, bez macierzy N × N.
+    """
+    sire, dam, bounds = _ranked(ped)
+    n = len(ped)
+    F = np.zeros(n)
+    D = np.ones(n)  # pokolenie 0: oboje rodzice nieznani → D = 1
+
+    for g in range(1, len(bounds) - 1):
+        lo, hi = bounds[g], bounds[g + 1]
+        s, d = sire[lo:hi], dam[lo:hi]
+        both = np.flatnonzero((s >= 0) & (d >= 0))
+        sires, col = np.unique(s[both], return_inverse=True)
+
+        for c0 in range(0, len(sires), chunk):
+            X = _colleau(sire, dam, bounds, D, sires[c0:c0 + chunk], g)
+            sel = (col >= c0) & (col < c0 + chunk)
+            F[lo + both[sel]] = 0.5 * X[d[both[sel]], col[sel] - c0]
+
+        D[lo:hi] = _mendelian_variance(F, s, d)
+
+    out = np.empty(n)
+    out[ped.order] = F
+    return out
+
+# ── Spokrewnienie na żądanie ────────────────────────────────────────────
+
+def relationship_columns(ped, ids, F=None):
+    """
+    Kolumny macierzy spokrewnienia addytywnego A dla podanych osobników
+    (macierz n × len(ids), wiersze w kolejności ped.ids).
+    """
+    if F is None:
+        F = inbreeding_coefficients(ped)
+    sire, dam, bounds = _ranked(ped)
+    rank = np.empty(len(ped), dtype=np.int64)
+    rank[ped.order] = np.arange(len(ped))
+
+    D = _mendelian_variance(F[ped.order], sire, dam)
+    X = _colleau(sire, dam, bounds, D, rank[ped.indices(ids, strict=True)], len(bounds) - 1)
+    return X[rank]
+
+
+def kinship(ped, ids, F=None):
+    """Macierz kinship (A / 2) wybranych osobników jako ramka ID × ID"""
+    ids = list(ids)
+    A = relationship_columns(ped, ids, F)[ped.indices(ids, strict=True)]
+    return pd.DataFrame(A / 2, index=ids, columns=ids)
+
+
+def inbreeding_table(ped, F=None):
+    """Ramka ID, F_ped, generation (ID jako tekst – jak w wynikach ROH)"""
+    if F is None:
+        F = inbreeding_coefficients(ped)
+    return pd.DataFrame({"ID": ped.ids.astype(str), "F_ped": F, "generation": ped.depth})
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Pedigree inbreeding and kinship (Colleau indirect method).")
+    ap.add_argument("--ped", required=True, help="plik rodowodu")
+    ap.add_argument("--format", choices=["ped", "plink"], default="ped",
+                    help="ped: ID SIRE DAM SEX PHENOTYPE, plink: FID IID FATHER MOTHER SEX PHENO")
+    ap.add_argument("--out", type=Path, default=OUT_PARQUET, help="plik wynikowy F_ped")
+    ap.add_argument("--kinship", nargs="+", help="ID osobników do macierzy kinship")
+    ap.add_argument("--kinship-out", type=Path, help="plik Parquet dla --kinship (ID1, ID2, kinship)")
+    args = ap.parse_args()
+
+    frame = read_plink_ped(args.ped) if args.format == "plink" else read_ped(args.ped)
+    ped = Pedigree.from_frame(frame)
+    F = inbreeding_coefficients(ped)
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    inbreeding_table(ped, F).to_parquet(args.out, index=False)
+    print(f"F_ped dla {len(ped)} osobników zapisano do pliku: {args.out}")
+
+    if args.kinship:
+        # ID z linii poleceń to tekst – dopasowanie do typu ID w rodowodzie
+        by_text = {str(i): i for i in ped.ids}
+        ids = [by_text[i] for i in args.kinship]
+        kin = kinship(ped, ids, F)
+        long = kin.rename_axis("ID1").reset_index().melt(id_vars="ID1", var_name="ID2",
+                                                          value_name="kinship")
+        long[["ID1", "ID2"]] = long[["ID1", "ID2"]].astype(str)
+        if args.kinship_out:
+            long.to_parquet(args.kinship_out, index=False)
+            print(f"Kinship zapisano do pliku: {args.kinship_out}")
+        else:
+            print(kin.to_string())
+
+if __name__ == "__main__":
+    main()
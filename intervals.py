@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+intervals.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Algebra przedziałów domkniętych [start, end] na tablicach NumPy:
+  scalanie, dopełnienie, część wspólna, pokrycie okien (wspólna dla
+  gff_to_slim.py i analiza_gffslim.py)
+• Indeks klas regionów (EXON / INTRON / NC) z tabeli elementów SLiM
+  (bed_to_slim.txt, ncgff_bed1.txt lub wynik gff_to_slim.py)
+• Etykietowanie całej tablicy pozycji naraz: posortowane tablice
+  start/end + np.searchsorted, bez pętli po mutacjach w Pythonie
+
+Współrzędne:
+• Indeks trzyma pozycje SLiM (0-based, końce włącznie), jak w tabelach
+  wczytywanych przez founders_sim_slim
+• Plik z gff_to_slim.py (GFF3, 1-based) → load_regions(..., one_based=True)
+• Pozycje VCF z SLiM to pozycja SLiM + 1 (patrz load_mutation_index)
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REGION_CLASSES = ("EXON", "INTRON", "NC")
+OUTSIDE = -1  # pozycja poza wszystkimi regionami
+
+# ── Algebra przedziałów ─────────────────────────────────────────────────
+
+def as_arrays(intervals):
+    """Lista par (start, end) → tablice int64 (starts, ends)"""
+    arr = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0].copy(), arr[:, 1].copy()
+
+
+def merge(starts, ends):
+    """Scala przedziały, które się nachodzą lub stykają; wynik posortowany po start"""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, reach = starts[order], np.maximum.accumulate(ends[order])
+    head = np.ones(len(starts), dtype=bool)
+    head[1:] = starts[1:] > reach[:-1] + 1
+    first = np.flatnonzero(head)
+    last = np.append(first[1:], len(starts)) - 1
+    return starts[first], reach[last]
+
+
+def merge_grouped(groups, starts, ends):
+    """
+    merge osobno w każdej grupie (np. eksony kolejnych genów) jednym
+    wywołaniem: grupy (liczby ≥ 0) rozsunięte o więcej niż zakres współrzędnych.
+    Zwraca (groups, starts, ends) posortowane po grupie i start.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(starts):
+        return groups, starts, ends
+    lo = min(starts.min(), ends.min())
+    span = int(max(starts.max(), ends.max()) - lo) + 2
+    merged_starts, merged_ends = merge(starts - lo + groups * span, ends - lo + groups * span)
+    out_groups = merged_starts // span
+    return (out_groups, merged_starts - out_groups * span + lo,
+            merged_ends - out_groups * span + lo)
+
+
+def complement(starts, ends, lo, hi):
+    """
+    Luki: przed pierwszym przedziałem (od lo), między scalonymi przedziałami
+    i za ostatnim (do hi). Brak przedziałów → [lo, hi].
+    """
+    starts, ends = merge(starts, ends)
+    if not len(starts):
+        return np.array([lo], dtype=np.int64), np.array([hi], dtype=np.int64)
+    gap_starts = np.concatenate([[lo], ends + 1])
+    gap_ends = np.concatenate([starts - 1, [hi]])
+    keep = gap_starts <= gap_ends
+    return gap_starts[keep], gap_ends[keep]
+
+
+def depth_steps(starts, ends):
+    """
+    Tablica różnicowa na granicach przedziałów (+1 na start, −1 za end):
+    (bounds, depth) – głębokość pokrycia na [bounds[k], bounds[k + 1]).
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    bounds = np.concatenate([starts, ends + 1])
+    delta = np.concatenate([np.ones(len(starts), dtype=np.int64),
+                            np.full(len(ends), -1, dtype=np.int64)])
+    bounds, first = np.unique(bounds, return_inverse=True)
+    diff = np.zeros(len(bounds), dtype=np.int64)
+    np.add.at(diff, first, delta)
+    return bounds, np.cumsum(diff)
+
+
+def _runs(bounds, mask):
+    """Przedziały [start, end] z kolejnych odcinków funkcji schodkowej, gdzie mask"""
+    k = np.flatnonzero(mask[:-1])
+    return merge(bounds[k], bounds[k + 1] - 1)
+
+
+def intersect(a_starts, a_ends, b_starts, b_ends):
+    """Część wspólna dwóch zbiorów przedziałów (wynik scalony)"""
+    a_starts, a_ends = merge(a_starts, a_ends)
+    b_starts, b_ends = merge(b_starts, b_ends)
+    bounds, depth = depth_steps(np.concatenate([a_starts, b_starts]),
+                                np.concatenate([a_ends, b_ends]))
+    if not len(bounds):
+        return bounds, bounds
+    return _runs(bounds, depth == 2)
+
+
+def coverage(starts, ends, win_starts, win_ends):
+    """
+    Liczba pozycji każdego okna [win_start, win_end] pokrytych co najmniej
+    jednym przedziałem. Z tablicy różnicowej liczona jest funkcja
+    "pokryte pozycje przed x", więc koszt zależy od liczby przedziałów
+    i okien, a nie od długości genomu.
+    """
+    win_starts = np.asarray(win_starts, dtype=np.int64)
+    win_ends = np.asarray(win_ends, dtype=np.int64)
+    bounds, depth = depth_steps(starts, ends)
+    if not len(bounds):
+        return np.zeros(len(win_starts), dtype=np.int64)
+    covered = (depth > 0).astype(np.int64)
+    before = np.concatenate([[0], np.cumsum(covered[:-1] * np.diff(bounds))])
+
+    def covered_before(x):
+        k = np.searchsorted(bounds, x, side="right") - 1
+        kk = np.maximum(k, 0)
+        return np.where(k >= 0, before[kk] + covered[kk] * (x - bounds[kk]), 0)
+
+    return covered_before(win_ends + 1) - covered_before(win_starts)
+
+
+def merge_intervals(intervals):
+    """Jak merge, dla listy par (start, end) – zwraca listę krotek"""
+    if not len(intervals):
+        return []
+    starts, ends = merge(*as_arrays(intervals))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def complement_intervals(intervals, lo, hi):
+    """Jak complement, dla listy par (start, end) – zwraca listę krotek"""
+    starts, ends = complement(*as_arrays(intervals), lo, hi)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+# ── Indeks klas regionów ────────────────────────────────────────────────
+
+class RegionIndex:
+    """Rozłączne przedziały [start, end] z kodem klasy (indeks w classes)"""
+
+    def __init__(self, starts, ends, codes, classes=REGION_CLASSES):
+        order = np.argsort(starts, kind="stable")
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.codes = np.asarray(codes, dtype=np.int8)[order]
+        self.classes = tuple(classes)
+        overlap = np.flatnonzero(self.starts[1:] <= self.ends[:-1])
+        if len(overlap):
+            i = overlap[0]
+            raise ValueError(
+                f"{len(overlap)} nakładających się regionów, np. "
+                f"[{self.starts[i]}, {self.ends[i]}] i [{self.starts[i + 1]}, {self.ends[i + 1]}] "
+                "(usuń nakładania: gff_to_slim.py --flatten)")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def label(self, positions):
+        """Kod klasy dla każdej pozycji (OUTSIDE poza regionami)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(self.starts):
+            return np.full(positions.shape, OUTSIDE, dtype=np.int8)
+        # Ostatni region zaczynający się nie dalej niż pozycja
+        i = np.maximum(np.searchsorted(self.starts, positions, side="right") - 1, 0)
+        inside = (self.starts[i] <= positions) & (positions <= self.ends[i])
+        return np.where(inside, self.codes[i], OUTSIDE).astype(np.int8)
+
+    def one_hot(self, positions):
+        """Macierz pozycje × klasy (bool) – do sum ważonych przez mnożenie macierzy"""
+        return self.label(positions)[:, None] == np.arange(len(self.classes))
+
+
+def load_regions(path, one_based=False, classes=REGION_CLASSES):
+    """
+    Wczytuje tabelę feature/start/end (z nagłówkiem lub bez) jako RegionIndex.
+    one_based=True: plik z gff_to_slim.py (pozycje GFF3) → pozycje SLiM.
+    Nieznane typy elementów są pomijane.
+    """
+    table = pd.read_csv(Path(path), sep=r"\s+", header=None, usecols=[0, 1, 2],
+                        names=["feature", "start", "end"], dtype=str)
+    table = table[table["feature"].str.lower() != "feature"]
+    codes = pd.Categorical(table["feature"].str.upper(), categories=classes).codes
+    keep = codes >= 0
+    shift = 1 if one_based else 0
+    starts = table["start"].to_numpy()[keep].astype(np.int64) - shift
+    ends = table["end"].to_numpy()[keep].astype(np.int64) - shift
+    return RegionIndex(starts, ends, codes[keep], classes)
@@ -9,7 +9,10 @@ Ten skrypt:
 • Wyszukuje pliki results_out_*/homozyg_single.parquet
   — Każdy z nich jest generowany wcześniej przez df_to_R.py
     uruchamiany z argumentem: --only out_X
-• Scala je w jeden zbiorczy plik:
+• Dopisuje każdą nową replikę jako partycję zbioru:
+    ➜ results/homozyg_dataset/Folder=out_X/
+  (repliki już obecne w zbiorze są pomijane – bez przepisywania całości)
+• Z --compact scala zbiór strumieniowo w jeden plik:
     ➜ results/homozyg_100rep.parquet
 
 Wykorzystywany jako krok końcowy do agregacji wyników ROH
@@ -18,8 +21,11 @@ przed dalszą analizą (np. w R).
 
 import pandas as pd
 from pathlib import Path
+import argparse
 import glob
 
+from results_dataset import HOM_DATASET, append_frame, compact, existing_partitions
+
 # ── Ścieżki ─────────────────────────────────────────────────────────────
 BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
 
@@ -29,18 +35,27 @@ PAT  = BASE / "results_out_*" / "homozyg_single.parquet"
 # Plik wyjściowy (scalony)
 OUT  = BASE / "results" / "homozyg_100rep.parquet"
 
-# ── Znalezienie plików do scalenia ──────────────────────────────────────
+# ── Argumenty ───────────────────────────────────────────────────────────
+ap = argparse.ArgumentParser()
+ap.add_argument("--compact", action="store_true",
+                help=f"scal zbiór strumieniowo do {OUT.name}")
+args = ap.parse_args()
+
+# ── Znalezienie plików do dopisania ─────────────────────────────────────
 paths = glob.glob(str(PAT))
-print(f"Found {len(paths)} parquet parts")  # np. 100 części
+present = existing_partitions(HOM_DATASET)
+print(f"Found {len(paths)} parquet parts, {len(present)} already in dataset")
 
-# ── Wczytanie i łączenie ────────────────────────────────────────────────
+# ── Dopisanie nowych replik (po jednym pliku w pamięci) ────────────────
 # Każdy plik to dane z jednej symulacji (np. out_17)
-df = pd.concat((pd.read_parquet(p) for p in paths),
-               ignore_index=True)
-
-# ── Utworzenie katalogu wyjściowego, jeśli nie istnieje ────────────────
-OUT.parent.mkdir(exist_ok=True)
-
-# ── Zapis połączonych danych ───────────────────────────────────────────
-df.to_parquet(OUT, index=False)
-print(f"Written merged file to {OUT} ({OUT.stat().st_size/2**20:.1f} MB)")
+added = 0
+for p in paths:
+    if Path(p).parent.name.removeprefix("results_") in present:
+        continue
+    added += append_frame(pd.read_parquet(p), HOM_DATASET, skip_existing=True)
+print(f"Appended {added} new replicate partitions to {HOM_DATASET}")
+
+# ── Opcjonalne scalenie strumieniowe ───────────────────────────────────
+if args.compact:
+    rows = compact(HOM_DATASET, OUT)
+    print(f"Written merged file to {OUT} ({rows} rows, {OUT.stat().st_size/2**20:.1f} MB)")
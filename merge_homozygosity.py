@@ -4,7 +4,8 @@
 merge_homozygosity.py
 -------------------------------------------------------
 Cel:
-• Przetwarza wyniki homozygotyczności (ROH) z plików .txt.
+• Przetwarza wyniki homozygotyczności (ROH) z plików .txt
+  lub z kolumnowych plików replik out_*.parquet / out_*.arrow.
 • Dla każdego osobnika oblicza średni poziom homozygotyczności.
 • Łączy te dane z rodowodem (plik Excel z datami urodzenia).
 • Zapisuje finalną tabelę do pliku .parquet do dalszej analizy.
@@ -12,6 +13,7 @@ Cel:
 Uruchamianie:
 • Bez argumentów     ➜ zapis do katalogu results/
 • Z  --only out_17   ➜ zapis do katalogu results_out_17/
+• Z  --format columnar ➜ odczyt plików out_*.parquet (jeden na replikę)
 """
 
 # ── importy ──────────────────────────────────────────────────────────────
@@ -20,6 +22,7 @@ import pandas as pd, re, logging, sys, argparse
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from typing import Optional
+from homozygosity_io import read_homozygosity_matrix, COLUMNAR_SUFFIXES
 
 # ── ścieżki do danych ─────────────────────────────────────────────────────
 BASE_DIR = Path("/media/raid/home/kpatan/slim/homozygosity")  # katalog główny projektu
@@ -29,12 +32,13 @@ PED_FILE = BASE_DIR / "s1_rodowod.xlsx"                        # plik z rodowode
 # ─────────────────────────────────────────────────────────────────────────
 # Funkcja: mean_homozygosity
 # • Wczytuje jeden plik .txt z ROH
-# • Oblicza średnią homozygotyczność dla osobnika
+# • Oblicza średnią homozygotyczność dla osobnika (wszystkie okna pliku –
+#   przy wielu kontigach średnia z całego genomu, kolumna Contig pomijana)
 # • Wyciąga ID osobnika z nazwy pliku
 # ─────────────────────────────────────────────────────────────────────────
 def mean_homozygosity(txt: Path) -> dict:
     df = pd.read_csv(
-        txt, sep="\t", skiprows=1,
+        txt, sep="\t", skiprows=1, usecols=[0, 1],
         names=["Window_center", "Homozygosity"],
         dtype={"Window_center": "int32", "Homozygosity": "float32"},
         engine="c"
@@ -45,27 +49,64 @@ def mean_homozygosity(txt: Path) -> dict:
         "Folder": txt.parent.name,                                # folder, np. out_17
     }
 
+# ─────────────────────────────────────────────────────────────────────────
+# Funkcja: mean_homozygosity_columnar
+# • Wczytuje jeden kolumnowy plik repliki (osobniki × okna)
+# • Zwraca średnią homozygotyczność każdego osobnika
+# • Folder = nazwa repliki (np. out_17 z out_17.parquet)
+# ─────────────────────────────────────────────────────────────────────────
+def mean_homozygosity_columnar(path: Path) -> list:
+    sample_names, _, matrix = read_homozygosity_matrix(path)
+    avg = matrix.mean(axis=1)
+    return [{"ID": int(sid), "avg_hom": float(a), "Folder": path.stem}
+            for sid, a in zip(sample_names, avg)]
+
 # ─────────────────────────────────────────────────────────────────────────
 # Funkcja: collect
-# • Przeszukuje foldery out_*/ z plikami TXT
+# • Przeszukuje foldery out_*/ z plikami TXT (lub pliki kolumnowe out_*)
 # • Przetwarza pliki równolegle (parallel processing)
 # • Zwraca tabelę z ID, avg_hom, Folder
 # ─────────────────────────────────────────────────────────────────────────
-def collect(workers: int, only: Optional[str]) -> pd.DataFrame:
-    pattern = f"{only}/*.txt" if only else "out_*/*.txt"
-    files   = list(DATA_DIR.glob(pattern))
-    logging.info("Znaleziono %d plików TXT (wzorzec: %s)", len(files), pattern)
+def collect(workers: int, only: Optional[str], fmt: str = "txt") -> pd.DataFrame:
+    if fmt == "columnar":
+        stem  = only or "out_*"
+        files = [p for p in DATA_DIR.glob(f"{stem}.*")
+                 if p.suffix.lower() in COLUMNAR_SUFFIXES]
+        worker, desc = mean_homozygosity_columnar, "Czytam repliki"
+        logging.info("Znaleziono %d plików kolumnowych (wzorzec: %s.*)", len(files), stem)
+    else:
+        pattern = f"{only}/*.txt" if only else "out_*/*.txt"
+        files   = list(DATA_DIR.glob(pattern))
+        worker, desc = mean_homozygosity, "Parsuję TXT"
+        logging.info("Znaleziono %d plików TXT (wzorzec: %s)", len(files), pattern)
 
     rows = []
     with ProcessPoolExecutor(max_workers=workers) as pool:
-        futs = {pool.submit(mean_homozygosity, p): p for p in files}
+        futs = {pool.submit(worker, p): p for p in files}
         for fut in tqdm(as_completed(futs),
                         total=len(futs),
-                        desc="Parsuję TXT", unit="plk",
+                        desc=desc, unit="plk",
                         file=sys.stdout):
-            rows.append(fut.result())
+            res = fut.result()
+            rows.extend(res if isinstance(res, list) else [res])
     return pd.DataFrame(rows)
 
+# ─────────────────────────────────────────────────────────────────────────
+# Funkcja: load_cohorts
+# • Wczytuje rodowód (Excel z datami urodzenia)
+# • Wyznacza kohorty urodzenia: Year, Decade, FiveYr
+# • Opcjonalnie zawęża do podanych ID
+# ─────────────────────────────────────────────────────────────────────────
+def load_cohorts(ids=None, ped_file: Path = PED_FILE) -> pd.DataFrame:
+    ped = (pd.read_excel(ped_file, usecols=["No.", "Date of birth"])
+             .rename(columns={"No.": "ID"}))
+    if ids is not None:
+        ped = ped[ped.ID.isin(ids)].copy()
+    ped["Year"]   = pd.to_datetime(ped["Date of birth"]).dt.year
+    ped["Decade"] = (ped.Year // 10) * 10
+    ped["FiveYr"] = (ped.Year // 5)  * 5
+    return ped[["ID", "Year", "Decade", "FiveYr"]]
+
 # ─────────────────────────────────────────────────────────────────────────
 # Funkcja główna
 # • Obsługa argumentów
@@ -77,6 +118,8 @@ def main():
     ap.add_argument("--workers", type=int, default=24,
                     help="liczba procesów równoległych")
     ap.add_argument("--only", help="np. out_17  ➜ zapis do results_out_17/")
+    ap.add_argument("--format", choices=["txt", "columnar"], default="txt",
+                    help="txt: out_*/output_*.txt, columnar: out_*.parquet/.arrow")
     args = ap.parse_args()
 
     # Ustalenie katalogu wynikowego
@@ -95,16 +138,11 @@ def main():
     logging.info("START  — katalog wynikowy: %s", out_dir)
     
     # Agregacja wyników homozygotyczności
-    df_hom = collect(args.workers, args.only)
+    df_hom = collect(args.workers, args.only, args.format)
     logging.info("df_hom  %s×%s", *df_hom.shape)
 
     # Wczytanie i przygotowanie rodowodu
-    ped = (pd.read_excel(PED_FILE, usecols=["No.", "Date of birth"])
-             .rename(columns={"No.": "ID"}))
-    ped = ped[ped.ID.isin(df_hom.ID)]
-    ped["Year"]   = pd.to_datetime(ped["Date of birth"]).dt.year
-    ped["Decade"] = (ped.Year // 10) * 10
-    ped["FiveYr"] = (ped.Year // 5)  * 5
+    ped = load_cohorts(df_hom.ID)
 
     # Połączenie ROH z rodowodem
     df_final = (df_hom
@@ -4,40 +4,62 @@
 merge_mut_part.py
 ───────────────────────────────────────────────────────────────
 Cel:
-• Scala częściowe pliki .parquet zawierające dane o mutacjach m2 
+• Dopisuje częściowe pliki .parquet zawierające dane o mutacjach m2 
   i obciążeniu genetycznym (genetic load), wygenerowane przez:
     ➜ vcf_to_genetic_load.py (dawniej nowamutacjatest.py)
 
 • Każdy plik np. part1.parquet, part2.parquet, ... zawiera dane
   dla określonego zakresu folderów symulacyjnych (np. 1–50)
+• Pliki part*.parquet wyszukiwane są automatycznie (bez stałej listy)
+• Uwaga: calculate_genetic_load.py --dataset zapisuje repliki od razu
+  do zbioru, więc ręczny podział na części nie jest już potrzebny
 
-• Skrypt scala je w jeden zbiorczy plik:
+• Każda replika (Folder) trafia do osobnej partycji zbioru:
+    ➜ results/genetic_load_dataset/Folder=<id>/
+  (repliki już obecne w zbiorze są pomijane – bez przepisywania całości)
+
+• Z --compact zbiór scalany jest strumieniowo w jeden plik:
     ➜ genetic_load_combined.parquet
 
 Używany przed analizą obciążenia genetycznego w czasie i między osobnikami.
 """
 
 # ── Importy ─────────────────────────────────────────────────────────────
-import pandas as pd
+import argparse
+import pyarrow.parquet as pq
+import re
 from pathlib import Path
 
+from results_dataset import LOAD_DATASET, append_partition, compact, existing_partitions
+
 # ── Ścieżka do folderu z częściowymi plikami wynikowymi ─────────────────
 folder = Path("/media/raid/home/kpatan/slim/homozygosity/results")
 
-# ── Lista plików do scalenia ────────────────────────────────────────────
-file_names = [
-    "part1.parquet",
-    "part2.parquet",
-    "part3.parquet",
-    "part4.parquet",
-    "part5.parquet",
-    "part6.parquet",
-    "part7.parquet"
-]
-
-# ── Wczytaj każdy plik do osobnego DataFrame i połącz w jeden ──────────
-dfs = [pd.read_parquet(folder / name) for name in file_names]
-merged = pd.concat(dfs, ignore_index=True)
-
-# ── Zapisz scalony zbiór danych do jednego pliku .parquet ──────────────
-merged.to_parquet(folder / "genetic_load_combined.parquet")
+# ── Argumenty ───────────────────────────────────────────────────────────
+ap = argparse.ArgumentParser()
+ap.add_argument("--compact", action="store_true",
+                help="scal zbiór strumieniowo do genetic_load_combined.parquet")
+args = ap.parse_args()
+
+# ── Lista plików do dopisania ───────────────────────────────────────────
+paths = sorted(folder.glob("part*.parquet"),
+               key=lambda p: int(re.sub(r"\D", "", p.stem) or 0))
+print(f"Found {len(paths)} parquet parts")
+
+# ── Dopisz repliki z każdego pliku (w pamięci najwyżej jedna replika) ──
+added = 0
+for p in paths:
+    present = existing_partitions(LOAD_DATASET)
+    folders = pq.read_table(p, columns=["Folder"]).column("Folder").unique().to_pylist()
+    for f in folders:
+        if str(f) in present:
+            continue
+        replicate = pq.read_table(p, filters=[("Folder", "=", f)]).to_pandas()
+        append_partition(replicate, LOAD_DATASET, f)
+        added += 1
+print(f"Appended {added} new replicate partitions to {LOAD_DATASET}")
+
+# ── Opcjonalne scalenie strumieniowe do jednego pliku .parquet ─────────
+if args.compact:
+    rows = compact(LOAD_DATASET, folder / "genetic_load_combined.parquet")
+    print(f"Written {rows} rows to {folder / 'genetic_load_combined.parquet'}")
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+mutation_catalog.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Jednorazowe wczytanie zrzutu mutacji SLiM (mutations_output_final.txt,
+  m2_mutations.txt, mutations_output_final_m2.txt) do binarnego katalogu
+  <plik>.m2cat/; kolejne zadania otwierają go przez np.memmap
+• Nagłówek (ID Position Type SelectionCoeff, jak pisze founders_sim_slim)
+  rozpoznawany automatycznie; przy kolumnie Type brane są tylko mutacje m2
+• Kilka mutacji w tej samej pozycji nie jest gubionych: tabela multi-hit
+  (pozycja, pierwszy wiersz, liczba) i jawna reguła wyboru współczynnika
+
+Zawartość katalogu .m2cat:
+• positions.npy  – pozycje SLiM (int64, 0-based), rosnąco
+• coefs.npy      – współczynniki selekcji (float32)
+• ids.npy        – identyfikatory mutacji SLiM (int64)
+• multi_hits.npy – pozycje z więcej niż jedną mutacją: (pozycja, pierwszy
+                   wiersz, liczba) – wiersze leżą obok siebie
+• meta.json      – liczba mutacji, rozmiar/mtime/sha256 pliku źródłowego
+
+Unieważnianie: zmiana rozmiaru lub mtime → porównanie sha256; inna treść
+→ katalog budowany od nowa (ta sama treść – aktualizowany tylko znacznik).
+
+Dopasowanie do VCF (M2Index):
+• Mutacje leżą na jednej osi pozycji SLiM; rekord (CHROM, POS) to pozycja
+  osi offset[CHROM] + POS − 1 (przesunięcia z <plik>.contigs.tsv
+  gff_to_slim.py albo z długości kontigów, genome.load_offsets)
+• Bez przesunięć dopasowywany jest tylko pierwszy kontig nagłówka;
+  rekordy pozostałych są pomijane z ostrzeżeniem
+• Kilka rekordów VCF w pozycji multi-hit: jeden współczynnik na rekord
+  (k-ty rekord – k-ta mutacja pozycji), więc reguła kolizji nie jest
+  stosowana wielokrotnie; reguła dotyczy tylko pozycji z jednym rekordem
+
+Uruchamianie:
+python mutation_catalog.py mutations_output_final_m2.txt
+python mutation_catalog.py mutations_output_final.txt --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from genome import contig_lengths
+
+CATALOG_SUFFIX = ".m2cat"
+COLUMNS = ["Mutation_ID", "Position", "Type", "selection_coef"]
+COLLISION_RULES = ("first", "min", "mean", "sum")
+
+# ── Ścieżki i znacznik źródła ───────────────────────────────────────────
+
+def catalog_path(dump_file):
+    """mutations_output_final_m2.txt → mutations_output_final_m2.m2cat"""
+    dump_file = Path(dump_file)
+    return dump_file.with_name(dump_file.stem + CATALOG_SUFFIX)
+
+
+def is_catalog(path):
+    """Czy ścieżka to katalog mutacji"""
+    return (Path(path) / "meta.json").is_file()
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stamp(dump_file):
+    st = os.stat(dump_file)
+    return {"source": Path(dump_file).name, "source_size": st.st_size,
+            "source_mtime": st.st_mtime}
+
+
+def _write_meta(out_dir, meta):
+    tmp = Path(out_dir) / "meta.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, Path(out_dir) / "meta.json")
+
+
+def is_up_to_date(dump_file, out_dir=None):
+    """
+    Czy katalog odpowiada plikowi źródłowemu. Zgodny rozmiar i mtime
+    wystarczają; inaczej rozstrzyga sha256 (np. plik skopiowany na nowo
+    z tą samą treścią) – wtedy znacznik w meta.json jest odświeżany.
+    """
+    out_dir = Path(out_dir) if out_dir else catalog_path(dump_file)
+    if not is_catalog(out_dir):
+        return False
+    with open(out_dir / "meta.json", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    stamp = _source_stamp(dump_file)
+    if all(meta.get(k) == v for k, v in stamp.items()):
+        return True
+    if meta.get("source_sha256") != file_sha256(dump_file):
+        return False
+    _write_meta(out_dir, {**meta, **stamp})
+    return True
+
+# ── Wczytanie zrzutu SLiM ───────────────────────────────────────────────
+
+def _has_header(dump_file):
+    with open(dump_file, encoding="utf-8") as fh:
+        first = fh.readline().split()
+    return bool(first) and not first[0].lstrip("-").isdigit()
+
+
+def read_dump(dump_file):
+    """
+    Zrzut mutacji jako ramka COLUMNS (z nagłówkiem lub bez).
+    Przy kolumnie Type z innymi typami niż m2 zostają tylko mutacje m2.
+    """
+    if _has_header(dump_file):
+        df = pd.read_csv(dump_file, sep="\t", header=0)
+        df.columns = COLUMNS[:len(df.columns)]
+    else:
+        df = pd.read_csv(dump_file, sep="\t", names=COLUMNS)
+    if "Type" in df.columns:
+        df = df[df["Type"].astype(str) == "m2"]
+    return df
+
+# ── Budowa katalogu ─────────────────────────────────────────────────────
+
+def build_catalog(dump_file, out_dir=None, force=False):
+    """
+    Buduje katalog .m2cat (chyba że jest aktualny). Zapis do katalogu
+    tymczasowego i zamiana na końcu, jak w genotype_store.convert_vcf.
+    """
+    out_dir = Path(out_dir) if out_dir else catalog_path(dump_file)
+    if not force and is_up_to_date(dump_file, out_dir):
+        return out_dir
+
+    df = read_dump(dump_file)
+    positions = df["Position"].to_numpy(dtype=np.int64)
+    ids = df["Mutation_ID"].to_numpy(dtype=np.int64)
+    # Sortowanie po pozycji; w obrębie pozycji kolejność jak w pliku źródłowym
+    order = np.argsort(positions, kind="stable")
+    positions, ids = positions[order], ids[order]
+    coefs = df["selection_coef"].to_numpy(dtype=np.float32)[order]
+
+    unique_pos, first, counts = np.unique(positions, return_index=True, return_counts=True)
+    multi = counts > 1
+    multi_hits = np.column_stack([unique_pos[multi], first[multi], counts[multi]]).astype(np.int64)
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "positions.npy", positions)
+    np.save(tmp_dir / "coefs.npy", coefs)
+    np.save(tmp_dir / "ids.npy", ids)
+    np.save(tmp_dir / "multi_hits.npy", multi_hits.reshape(-1, 3))
+    _write_meta(tmp_dir, {"n_mutations": int(len(positions)),
+                          "n_positions": int(len(unique_pos)),
+                          "n_multi_hit": int(multi.sum()),
+                          "source_sha256": file_sha256(dump_file),
+                          **_source_stamp(dump_file)})
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+# ── Odczyt ──────────────────────────────────────────────────────────────
+
+class MutationCatalog:
+    """Katalog mutacji m2 otwarty bez kopiowania (memmap)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        self.positions = np.load(self.path / "positions.npy", mmap_mode="r")
+        self.coefs = np.load(self.path / "coefs.npy", mmap_mode="r")
+        self.ids = np.load(self.path / "ids.npy", mmap_mode="r")
+        self.multi_hits = np.load(self.path / "multi_hits.npy")
+
+    def __len__(self):
+        return len(self.positions)
+
+    def site_coefs(self, rule="first"):
+        """
+        Jeden współczynnik na pozycję (pozycje SLiM, rosnąco).
+        Pozycje multi-hit wg reguły: first – pierwsza mutacja z pliku
+        źródłowego (dotychczasowe iloc[0]), min – najbardziej szkodliwa,
+        mean – średnia, sum – suma (mutacje dziedziczone razem).
+        Przy dopasowaniu do VCF reguła dotyczy tylko pozycji z jednym
+        rekordem (patrz M2Index).
+        """
+        if rule not in COLLISION_RULES:
+            raise ValueError(f"Nieznana reguła: {rule} (dostępne: {', '.join(COLLISION_RULES)})")
+        positions = np.asarray(self.positions)
+        coefs = np.asarray(self.coefs, dtype=np.float64)
+        if not len(positions):
+            return positions, coefs
+        starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+        if rule == "first":
+            values = coefs[starts]
+        elif rule == "min":
+            values = np.minimum.reduceat(coefs, starts)
+        else:
+            values = np.add.reduceat(coefs, starts)
+            if rule == "mean":
+                values /= np.diff(np.r_[starts, len(coefs)])
+        return positions[starts], values
+
+    def mutation_index(self, rule="first"):
+        """Słownik pozycja w VCF (pozycja SLiM + 1) → współczynnik selekcji"""
+        positions, values = self.site_coefs(rule)
+        return dict(zip((positions + 1).tolist(), values.tolist()))
+
+    def index(self, rule="first", offsets=None):
+        """M2Index do dopasowania rekordów VCF (offsets: kontig → przesunięcie na osi)"""
+        positions, values = self.site_coefs(rule)
+        # Wiersze mutacji każdej pozycji: jeden wiersz albo wpis tabeli multi-hit
+        first = np.searchsorted(np.asarray(self.positions), positions)
+        count = np.ones(len(positions), dtype=np.int64)
+        if len(self.multi_hits):
+            sites = np.searchsorted(positions, self.multi_hits[:, 0])
+            first[sites] = self.multi_hits[:, 1]
+            count[sites] = self.multi_hits[:, 2]
+        return M2Index(positions, values, offsets, first, count,
+                       np.asarray(self.coefs, dtype=np.float64), np.asarray(self.ids))
+
+# ── Dopasowanie rekordów VCF ────────────────────────────────────────────
+
+class M2Index:
+    """
+    Pozycje m2 na osi SLiM i współczynnik każdej pozycji. Kluczem jest
+    pozycja VCF na osi (pozycja SLiM + 1), dla rekordu (CHROM, POS):
+    offset[CHROM] + POS. offsets=None – znany tylko pierwszy kontig (offset 0).
+
+    Pozycje z kilkoma mutacjami (multi_hits katalogu, wiersze first … first +
+    count − 1): gdy w VCF jest kilka rekordów tej pozycji, k-ty rekord
+    dostaje współczynnik k-tej mutacji (kolejność z pliku SLiM), a rekordy
+    ponad liczbę mutacji są pomijane (extra). Jeden rekord – współczynnik
+    pozycji wg reguły kolizji (np. sum: mutacje zapisane w jednym rekordzie);
+    mutation = −1 oznacza rekord wspólny dla kilku mutacji.
+    """
+
+    def __init__(self, positions, coefs, offsets=None, first=None, count=None,
+                 mutation_coefs=None, ids=None):
+        self.keys = np.asarray(positions, dtype=np.int64) + 1
+        self.coefs = np.asarray(coefs, dtype=np.float64)
+        self.offsets = offsets
+        n = len(self.keys)
+        self.first = np.arange(n) if first is None else np.asarray(first, dtype=np.int64)
+        self.count = np.ones(n, dtype=np.int64) if count is None else np.asarray(count, dtype=np.int64)
+        self.mutation_coefs = self.coefs if mutation_coefs is None else mutation_coefs
+        self.ids = ids
+        self._sites = None
+        self._warned = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getstate__(self):
+        # Słownik pozycji budowany leniwie w każdym procesie, nie przesyłany
+        return {**self.__dict__, "_sites": None}
+
+    def site_of(self, key):
+        """Numer pozycji m2 dla klucza na osi albo None"""
+        if self._sites is None:
+            self._sites = dict(zip(self.keys.tolist(), range(len(self.keys))))
+        return self._sites.get(key)
+
+    def offset_of(self, chrom, first_contig=None):
+        """
+        Przesunięcie kontigu na osi albo None (ostrzeżenie raz na kontig) –
+        rekordy takiego kontigu nie są dopasowywane.
+        """
+        if self.offsets is not None:
+            offset = self.offsets.get(chrom)
+        else:
+            offset = 0 if first_contig is None or chrom == first_contig else None
+        if offset is None and chrom not in self._warned:
+            self._warned.add(chrom)
+            print(f"[!] Kontig {chrom}: brak przesunięcia na osi SLiM (--contigs) "
+                  "– mutacje m2 tego kontigu pominięte")
+        return offset
+
+    def match(self, positions, offset=0):
+        """Wektorowo dla pozycji POS jednego kontigu: (rows, sites) rekordów z m2"""
+        keys = np.asarray(positions, dtype=np.int64) + offset
+        if not len(self.keys):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        rows = np.flatnonzero(self.keys[idx] == keys)
+        return rows, idx[rows]
+
+    def records(self, positions, offset=0):
+        """
+        Jak match, z jednym współczynnikiem na rekord (pozycje posortowane,
+        rekordy jednej pozycji obok siebie): (rows, coefs, mutations, n_extra).
+        """
+        rows, sites = self.match(positions, offset)
+        if not len(rows):
+            return rows, np.zeros(0), rows, 0
+        # k – numer rekordu w serii rekordów tej samej pozycji
+        head = np.r_[True, sites[1:] != sites[:-1]]
+        run = np.cumsum(head) - 1
+        starts = np.flatnonzero(head)
+        k = np.arange(len(rows)) - starts[run]
+        run_length = np.diff(np.r_[starts, len(rows)])[run]
+
+        first, count = self.first[sites], self.count[sites]
+        single = run_length == 1
+        keep = single | (k < count)
+        mutation = np.where(single, np.where(count == 1, first, -1), first + k)
+        coefs = np.where(single, self.coefs[sites],
+                         self.mutation_coefs[np.minimum(first + k, len(self.mutation_coefs) - 1)])
+        return rows[keep], coefs[keep], mutation[keep], int((~keep).sum())
+
+    def matcher(self, source=None):
+        """Dopasowanie strumieniowe rekordów otwartego VCF (pierwszy kontig z nagłówka)"""
+        names = [name for name, _ in contig_lengths(source)] if source is not None else []
+        return RecordMatcher(self, names[0] if names else None)
+
+
+class RecordMatcher:
+    """
+    Kolejne rekordy VCF → (współczynnik, klucz na osi, mutacja, poprzedni)
+    albo None. poprzedni – (współczynnik, mutacja) do wpisania w poprzedni
+    dopasowany rekord, gdy okazuje się, że pozycja ma kilka rekordów
+    (dotąd dostał współczynnik pozycji wg reguły); wołający trzyma więc
+    ostatni rekord w bloku, dopóki nie zobaczy następnego.
+    """
+
+    def __init__(self, index, first_contig=None):
+        self.index = index
+        self.first_contig = first_contig
+        self.extra = 0  # rekordy ponad liczbę mutacji pozycji (pominięte)
+        self._chrom, self._offset = None, None
+        self._key, self._k = None, 0
+
+    def __call__(self, chrom, pos):
+        if chrom != self._chrom:
+            if self.first_contig is None:
+                self.first_contig = chrom  # VCF bez ##contig
+            self._chrom, self._offset = chrom, self.index.offset_of(chrom, self.first_contig)
+        if self._offset is None:
+            return None
+        key = self._offset + pos
+        site = self.index.site_of(key)
+        if site is None:
+            return None
+        k = self._k + 1 if key == self._key else 0
+        self._key, self._k = key, k
+
+        index = self.index
+        first, count = index.first[site], index.count[site]
+        if k == 0:
+            if count == 1:
+                return index.mutation_coefs[first], key, first, None
+            return index.coefs[site], key, -1, None
+        if k >= count:
+            self.extra += 1
+            return None
+        previous = (index.mutation_coefs[first], first) if k == 1 else None
+        return index.mutation_coefs[first + k], key, first + k, previous
+
+
+def open_catalog(dump_file, build=True):
+    """
+    Katalog dla pliku zrzutu (budowany lub odświeżany w razie potrzeby)
+    albo bezpośrednio ścieżka do katalogu .m2cat.
+    """
+    path = Path(dump_file)
+    if is_catalog(path):
+        return MutationCatalog(path)
+    out_dir = build_catalog(path) if build else catalog_path(path)
+    return MutationCatalog(out_dir)
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Build binary m2 mutation catalogs from SLiM mutation dumps.")
+    ap.add_argument("dump", nargs="+", help="pliki mutacji SLiM (np. mutations_output_final_m2.txt)")
+    ap.add_argument("--force", action="store_true", help="buduj także aktualne katalogi")
+    args = ap.parse_args()
+
+    for dump in args.dump:
+        out_dir = build_catalog(dump, force=args.force)
+        meta = MutationCatalog(out_dir).meta
+        print(f"[✓] {dump} → {out_dir}: {meta['n_mutations']} mutacji m2, "
+              f"{meta['n_multi_hit']} pozycji z kilkoma mutacjami")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+online_stats.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Statystyki replik aktualizowane na bieżąco, po zakończeniu każdej
+  repliki – bez listy wszystkich wierszy (ID, Folder) i końcowego groupby
+• Pamięć stała względem liczby replik: na klucz (osobnik lub kohorta)
+  i metrykę liczba obserwacji, średnia i M2 (Welford) oraz rezerwuar
+  o stałej liczbie próbek (algorytm R) do kwantyli rozkładu replik
+• Stan zapisywany jako .npz (zapis przez plik tymczasowy + os.replace),
+  więc podsumowania i przedziały ufności są dostępne w trakcie kampanii,
+  a przerwany przebieg można wznowić (lista dołączonych replik w stanie)
+
+Podsumowanie (wiersz na klucz, dla każdej metryki <m>):
+• <m>           – średnia z replik
+• <m>_sd, <m>_se – odchylenie standardowe replik i błąd standardowy średniej
+• <m>_ci_low, <m>_ci_high – przedział ufności średniej (przybliżenie
+  normalne: średnia ± z·se)
+• <m>_q_low, <m>_q_high   – kwantyle wartości replik z rezerwuaru
+• n – liczba replik, w których wystąpił klucz
+
+Kohorty (ReplicateStats): w każdej replice średnia metryk osobników danej
+kohorty (Year, Decade, FiveYr) to jedna obserwacja kohorty, więc przedział
+ufności opisuje zmienność między replikami.
+
+Uruchamianie (podsumowanie stanu w trakcie lub po kampanii):
+python online_stats.py results/replicate_stats.npz
+python online_stats.py stats_1_500.npz stats_501_1000.npz --merge-out replicate_stats.npz
+"""
+
+import argparse
+import json
+import os
+import warnings
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+RESERVOIR_SIZE = 256
+LEVEL = 0.95
+COHORT_LEVELS = ("Year", "Decade", "FiveYr")
+
+# ── Statystyki jednego zbioru kluczy ────────────────────────────────────
+
+class OnlineStats:
+    """
+    Średnia / wariancja (Welford) i rezerwuar wartości replik dla każdego
+    klucza. Klucz to krotka wartości kolumn key_names; nowe klucze dopisywane
+    są w locie. Brakujące wartości (NaN) nie zmieniają średniej i wariancji.
+    """
+
+    def __init__(self, key_names, metrics, reservoir_size=RESERVOIR_SIZE, seed=None):
+        self.key_names = tuple(key_names)
+        self.metrics = tuple(metrics)
+        self.reservoir_size = reservoir_size
+        self.rng = np.random.default_rng(seed)
+        self._index = {}
+        self._keys = []
+        m = len(self.metrics)
+        self.seen = np.zeros(0, dtype=np.int64)          # replik z kluczem
+        self.count = np.zeros((0, m), dtype=np.int64)    # wartości nie-NaN
+        self.mean = np.zeros((0, m))
+        self.m2 = np.zeros((0, m))
+        self.reservoir = np.zeros((0, reservoir_size, m), dtype=np.float32)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _rows(self, keys):
+        """Wiersze stanu dla kluczy (nowe klucze dostają nowe wiersze)"""
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self._index.get(key)
+            if row is None:
+                row = self._index[key] = len(self._keys)
+                self._keys.append(key)
+            rows[i] = row
+        self._grow(len(self._keys))
+        return rows
+
+    def _grow(self, n):
+        """Powiększa tablice stanu (podwajanie pojemności)"""
+        if n <= len(self.seen):
+            return
+        cap = max(n, 2 * len(self.seen), 16)
+        extra = cap - len(self.seen)
+        m = len(self.metrics)
+        self.seen = np.concatenate([self.seen, np.zeros(extra, dtype=np.int64)])
+        self.count = np.vstack([self.count, np.zeros((extra, m), dtype=np.int64)])
+        self.mean = np.vstack([self.mean, np.zeros((extra, m))])
+        self.m2 = np.vstack([self.m2, np.zeros((extra, m))])
+        self.reservoir = np.concatenate(
+            [self.reservoir, np.full((extra, self.reservoir_size, m), np.nan, dtype=np.float32)])
+
+    def update(self, keys, values):
+        """
+        Dołącza jedną replikę: keys – lista krotek (każdy klucz najwyżej raz),
+        values – macierz klucze × metryki.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(len(keys), len(self.metrics))
+        if not len(keys):
+            return
+        rows = self._rows(keys)
+
+        # Welford, osobno dla każdej metryki (NaN pomijane)
+        valid = ~np.isnan(values)
+        self.count[rows] += valid
+        delta = np.where(valid, values - self.mean[rows], 0.0)
+        self.mean[rows] += delta / np.maximum(self.count[rows], 1)
+        self.m2[rows] += np.where(valid, delta * (values - self.mean[rows]), 0.0)
+
+        # Rezerwuar (algorytm R): n-ta replika klucza trafia do losowego
+        # miejsca z prawdopodobieństwem R / n
+        self.seen[rows] += 1
+        n = self.seen[rows]
+        slot = np.where(n <= self.reservoir_size, n - 1, self.rng.integers(0, n))
+        keep = slot < self.reservoir_size
+        self.reservoir[rows[keep], slot[keep]] = values[keep]
+
+    def update_frame(self, frame):
+        """update z ramki zawierającej kolumny kluczy i metryk"""
+        keys = list(zip(*(frame[k].tolist() for k in self.key_names)))
+        self.update(keys, frame[list(self.metrics)].to_numpy(dtype=np.float64))
+
+    def merge(self, other):
+        """
+        Dołącza stan z innego przebiegu (np. repliki 501–1000): wzór Chana
+        dla średniej i M2; rezerwuary łączone losowaniem proporcjonalnym
+        do liczby replik obu stron.
+        """
+        if other.metrics != self.metrics or other.key_names != self.key_names:
+            raise ValueError("Niezgodne klucze lub metryki łączonych statystyk")
+        n_other = len(other)
+        rows = self._rows(other._keys)
+        src = np.arange(n_other)
+
+        n_a, n_b = self.count[rows], other.count[src]
+        n = n_a + n_b
+        delta = other.mean[src] - self.mean[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(n > 0, n_b / np.maximum(n, 1), 0.0)
+        self.mean[rows] += delta * share
+        self.m2[rows] += other.m2[src] + delta ** 2 * n_a * share
+        self.count[rows] = n
+
+        size = self.reservoir_size
+        for row, j in zip(rows.tolist(), src.tolist()):
+            seen_a, seen_b = self.seen[row], other.seen[j]
+            fill_a, fill_b = min(seen_a, size), min(seen_b, other.reservoir_size)
+            take_b = (self.rng.hypergeometric(seen_b, seen_a, min(size, seen_a + seen_b))
+                      if seen_a else min(seen_b, size))
+            take_b = min(take_b, fill_b)
+            take_a = min(size - take_b, fill_a)
+            picked = np.concatenate([
+                self.reservoir[row, self.rng.permutation(fill_a)[:take_a]],
+                other.reservoir[j, self.rng.permutation(fill_b)[:take_b]]])
+            self.reservoir[row] = np.nan
+            self.reservoir[row, :len(picked)] = picked
+            self.seen[row] = seen_a + seen_b
+        return self
+
+    def summary(self, level=LEVEL, quantiles=None):
+        """Ramka: kolumny kluczy, n i dla każdej metryki średnia, sd, se, CI, kwantyle"""
+        k = len(self._keys)
+        q_low, q_high = quantiles or ((1 - level) / 2, (1 + level) / 2)
+        z = NormalDist().inv_cdf((1 + level) / 2)
+        count, mean = self.count[:k], self.mean[:k]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sd = np.sqrt(np.where(count > 1, self.m2[:k] / (count - 1), np.nan))
+            se = sd / np.sqrt(count)
+        mean = np.where(count > 0, mean, np.nan)
+        if k:
+            filled = np.arange(self.reservoir_size) < self.seen[:k, None]
+            sample = np.where(filled[:, :, None], self.reservoir[:k], np.nan)
+            with warnings.catch_warnings():
+                # Klucze bez wartości w rezerwuarze → NaN (bez ostrzeżenia)
+                warnings.simplefilter("ignore", RuntimeWarning)
+                q = np.nanquantile(sample, [q_low, q_high], axis=1)
+        else:
+            q = np.zeros((2, 0, len(self.metrics)))
+
+        keys = list(zip(*self._keys)) if k else [[] for _ in self.key_names]
+        out = pd.DataFrame({name: list(col) for name, col in zip(self.key_names, keys)})
+        for j, metric in enumerate(self.metrics):
+            out[metric] = mean[:, j]
+            out[f"{metric}_sd"] = sd[:, j]
+            out[f"{metric}_se"] = se[:, j]
+            out[f"{metric}_ci_low"] = mean[:, j] - z * se[:, j]
+            out[f"{metric}_ci_high"] = mean[:, j] + z * se[:, j]
+            out[f"{metric}_q_low"] = q[0, :, j]
+            out[f"{metric}_q_high"] = q[1, :, j]
+        out["n"] = self.seen[:k]
+        return out.sort_values(list(self.key_names), ignore_index=True)
+
+    # ── Zapis / odczyt stanu ────────────────────────────────────────────
+
+    def state(self, prefix=""):
+        """Tablice stanu do np.savez (klucze jako osobne kolumny, bez pickle)"""
+        k = len(self._keys)
+        arrays = {"seen": self.seen[:k], "count": self.count[:k], "mean": self.mean[:k],
+                  "m2": self.m2[:k], "reservoir": self.reservoir[:k]}
+        for i, col in enumerate(zip(*self._keys) if k else [() for _ in self.key_names]):
+            arrays[f"key_{i}"] = np.asarray(col)
+        meta = {"key_names": self.key_names, "metrics": self.metrics,
+                "reservoir_size": self.reservoir_size,
+                "rng": self.rng.bit_generator.state}
+        arrays["meta"] = np.array(json.dumps(meta))
+        return {prefix + name: value for name, value in arrays.items()}
+
+    @classmethod
+    def from_state(cls, arrays, prefix=""):
+        meta = json.loads(str(arrays[prefix + "meta"]))
+        stats = cls(meta["key_names"], meta["metrics"], meta["reservoir_size"])
+        stats.rng.bit_generator.state = meta["rng"]
+        cols = [arrays[f"{prefix}key_{i}"].tolist() for i in range(len(stats.key_names))]
+        stats._keys = list(zip(*cols)) if cols and cols[0] else []
+        stats._index = {key: row for row, key in enumerate(stats._keys)}
+        stats.seen = arrays[prefix + "seen"].copy()
+        stats.count = arrays[prefix + "count"].copy()
+        stats.mean = arrays[prefix + "mean"].copy()
+        stats.m2 = arrays[prefix + "m2"].copy()
+        stats.reservoir = arrays[prefix + "reservoir"].copy()
+        return stats
+
+
+# ── Osobniki i kohorty ──────────────────────────────────────────────────
+
+class ReplicateStats:
+    """
+    Statystyki osobników (klucz ID) i kohort urodzenia (klucz level, cohort)
+    aktualizowane ramką podsumowania każdej zakończonej repliki.
+    """
+
+    def __init__(self, metrics, cohort_levels=COHORT_LEVELS,
+                 reservoir_size=RESERVOIR_SIZE, seed=None):
+        self.metrics = tuple(metrics)
+        self.cohort_levels = tuple(cohort_levels)
+        self.individuals = OnlineStats(("ID",), self.metrics, reservoir_size, seed)
+        self.cohorts = OnlineStats(("level", "cohort"), self.metrics, reservoir_size,
+                                   None if seed is None else seed + 1)
+        self.folders = []
+
+    def __contains__(self, folder):
+        return str(folder) in self.folders
+
+    def add(self, frame, folder=None):
+        """Dołącza replikę: ramka z kolumną ID, metrykami i (opcjonalnie) kohortami"""
+        frame = frame.assign(ID=frame["ID"].astype(str))
+        self.individuals.update_frame(frame)
+        for level in self.cohort_levels:
+            if level not in frame.columns:
+                continue
+            known = frame.dropna(subset=[level])
+            means = known.groupby(known[level].astype(np.int64))[list(self.metrics)].mean()
+            keys = [(level, int(c)) for c in means.index]
+            self.cohorts.update(keys, means.to_numpy(dtype=np.float64))
+        if folder is None and "Folder" in frame.columns and len(frame):
+            folder = frame["Folder"].iloc[0]
+        if folder is not None:
+            self.folders.append(str(folder))
+
+    def merge(self, other):
+        overlap = set(self.folders) & set(other.folders)
+        if overlap:
+            raise ValueError(f"Repliki obecne w obu stanach: {sorted(overlap)[:5]}")
+        self.individuals.merge(other.individuals)
+        self.cohorts.merge(other.cohorts)
+        self.folders.extend(other.folders)
+        return self
+
+    def summaries(self, level=LEVEL):
+        """(podsumowanie osobników, podsumowanie kohort)"""
+        return self.individuals.summary(level), self.cohorts.summary(level)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {**self.individuals.state("ind_"), **self.cohorts.state("coh_"),
+                  "folders": np.asarray(self.folders, dtype=str),
+                  "cohort_levels": np.asarray(self.cohort_levels, dtype=str)}
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            individuals = OnlineStats.from_state(arrays, "ind_")
+            stats = cls(individuals.metrics, arrays["cohort_levels"].tolist(),
+                        individuals.reservoir_size)
+            stats.individuals = individuals
+            stats.cohorts = OnlineStats.from_state(arrays, "coh_")
+            stats.folders = arrays["folders"].tolist()
+        return stats
+
+    def write_summaries(self, path, level=LEVEL):
+        """Zapisuje <stan>_by_id.parquet i <stan>_by_cohort.parquet obok stanu"""
+        path = Path(path)
+        by_id, by_cohort = self.summaries(level)
+        out_id = path.with_name(path.stem + "_by_id.parquet")
+        out_cohort = path.with_name(path.stem + "_by_cohort.parquet")
+        by_id.to_parquet(out_id, index=False)
+        by_cohort.to_parquet(out_cohort, index=False)
+        return out_id, out_cohort
+
+
+def open_stats(path, metrics, cohort_levels=COHORT_LEVELS, resume=True, seed=None):
+    """Stan z pliku (wznowienie kampanii) albo nowy"""
+    if resume and Path(path).exists():
+        stats = ReplicateStats.load(path)
+        if stats.metrics != tuple(metrics):
+            raise ValueError(f"Stan {path} ma inne metryki: {stats.metrics}")
+        return stats
+    return ReplicateStats(metrics, cohort_levels, seed=seed)
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser(description="Summaries and confidence intervals from online replicate statistics.")
+    ap.add_argument("state", nargs="+", help="pliki stanu .npz (np. results/replicate_stats.npz)")
+    ap.add_argument("--merge-out", help="połącz stany z kilku przebiegów i zapisz jako nowy stan")
+    ap.add_argument("--level", type=float, default=LEVEL, help="poziom ufności (domyślnie 0.95)")
+    args = ap.parse_args()
+
+    stats = ReplicateStats.load(args.state[0])
+    for path in args.state[1:]:
+        stats.merge(ReplicateStats.load(path))
+    target = args.state[0]
+    if args.merge_out:
+        target = stats.save(args.merge_out)
+    elif len(args.state) > 1:
+        ap.error("kilka stanów wymaga --merge-out")
+
+    out_id, out_cohort = stats.write_summaries(target, args.level)
+    print(f"[✓] {len(stats.folders)} replik, {len(stats.individuals)} osobników, "
+          f"{len(stats.cohorts)} kohort → {out_id}, {out_cohort}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pedigree.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Rodowód w pamięci jako graf indeksowany liczbami całkowitymi:
+  osobnik i ma ojca sire[i] i matkę dam[i] (-1 = rodzic nieznany)
+• Porządek topologiczny liczony raz, jako pokolenia (generation depth):
+  rodzice zawsze w niższym pokoleniu niż potomek
+• Przejścia po rodowodzie (pochodzenie od założycieli, przodkowie,
+  potomkowie) to jedna pętla po pokoleniach z operacjami NumPy
+  na całym pokoleniu – bez rekurencji i bez przeszukiwania ramki
+• Używany przez founders_pedigree.py i inbreeding.py
+
+Rodzice występujący tylko w kolumnach SIRE/DAM (bez własnego wiersza)
+dodawani są jako osobniki o nieznanych rodzicach.
+"""
+
+import numpy as np
+import pandas as pd
+
+PED_COLUMNS = ["ID", "SIRE", "DAM", "SEX", "PHENOTYPE"]
+PLINK_COLUMNS = ["FID", "IID", "FATHER", "MOTHER", "SEX", "PHENO"]
+MISSING_PARENT = (0, "0", "NA", ".")
+
+# Założyciele rodowodu żubrów (jak w founders_pedigree.py)
+FOUNDERS = (15, 16, 35, 42, 45, 46, 87, 89, 95, 96, 100, 147)
+
+
+def read_ped(path):
+    """Wczytuje plik .ped (kolumny rozdzielone białymi znakami, bez nagłówka)"""
+    return pd.read_csv(path, sep=r"\s+", names=PED_COLUMNS)
+
+
+def read_plink_ped(path):
+    """
+    Wczytuje rodowód w układzie PLINK (FID IID FATHER MOTHER SEX PHENO),
+    np. pyped_rodowod eksportowany dla py_ped_sim, w kolumnach ID/SIRE/DAM
+    """
+    ped = pd.read_csv(path, sep=r"\s+", names=PLINK_COLUMNS)
+    return ped.rename(columns={"IID": "ID", "FATHER": "SIRE", "MOTHER": "DAM"})
+
+
+def _is_missing(values):
+    """Rodzic nieznany: brak wartości, 0/NA/. lub liczba ujemna"""
+    values = pd.Series(values)
+    numeric = pd.to_numeric(values, errors="coerce")
+    return values.isna() | values.isin(MISSING_PARENT) | (numeric <= 0)
+
+
+class Pedigree:
+    """
+    Rodowód indeksowany: ids[i] ↔ indeks i, tablice sire/dam (int32, -1 = brak).
+    levels[g] – indeksy osobników z pokolenia g (g = 0: oboje rodzice nieznani).
+    """
+
+    def __init__(self, ids, sire, dam):
+        self.ids = np.asarray(ids, dtype=object)
+        self.sire = np.asarray(sire, dtype=np.int32)
+        self.dam = np.asarray(dam, dtype=np.int32)
+        self.index = {ind: i for i, ind in enumerate(self.ids)}
+        self.depth = self._generation_depth()
+        self.order = np.argsort(self.depth, kind="stable")
+        bounds = np.searchsorted(self.depth[self.order], np.arange(1, self.depth.max(initial=-1) + 1))
+        self.levels = np.split(self.order, bounds)
+
+    @classmethod
+    def from_frame(cls, ped, id_col="ID", sire_col="SIRE", dam_col="DAM"):
+        """Buduje rodowód z ramki (duplikaty ID – obowiązuje pierwszy wiersz)"""
+        ped = ped.drop_duplicates(id_col)
+        sire_missing = _is_missing(ped[sire_col]).to_numpy()
+        dam_missing = _is_missing(ped[dam_col]).to_numpy()
+
+        # Wspólne kodowanie: najpierw osobniki z wierszami, potem rodzice bez wierszy
+        all_ids = pd.concat([ped[id_col], ped[sire_col][~sire_missing],
+                             ped[dam_col][~dam_missing]], ignore_index=True)
+        codes, uniques = pd.factorize(all_ids)
+        n_rows = len(ped)
+        n = len(uniques)
+
+        sire = np.full(n, -1, dtype=np.int32)
+        dam = np.full(n, -1, dtype=np.int32)
+        row_codes = codes[:n_rows]
+        n_sire = int((~sire_missing).sum())
+        sire[row_codes[~sire_missing]] = codes[n_rows:n_rows + n_sire]
+        dam[row_codes[~dam_missing]] = codes[n_rows + n_sire:]
+        return cls(np.asarray(uniques, dtype=object), sire, dam)
+
+    @classmethod
+    def from_ped_file(cls, path):
+        return cls.from_frame(read_ped(path))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ── Porządek topologiczny ──────────────────────────────────────────
+
+    def _generation_depth(self):
+        """
+        Pokolenie = 1 + max(pokolenie rodziców), 0 dla osobników bez rodziców.
+        Liczone poziomami (Kahn): w każdym kroku wszystkie osobniki,
+        których znani rodzice mają już pokolenie. Cykl → ValueError.
+        """
+        n = len(self.ids)
+        depth = np.full(n, -1, dtype=np.int32)
+        has_sire, has_dam = self.sire >= 0, self.dam >= 0
+        sire_idx = np.where(has_sire, self.sire, 0)
+        dam_idx = np.where(has_dam, self.dam, 0)
+
+        pending = np.ones(n, dtype=bool)
+        level = 0
+        while pending.any():
+            sire_done = ~has_sire | (depth[sire_idx] >= 0)
+            dam_done = ~has_dam | (depth[dam_idx] >= 0)
+            ready = pending & sire_done & dam_done
+            if not ready.any():
+                cycle = self.ids[pending][:10]
+                raise ValueError(f"Cykl w rodowodzie (np. osobniki: {list(cycle)})")
+            depth[ready] = level
+            pending &= ~ready
+            level += 1
+        return depth
+
+    # ── Indeksy ─────────────────────────────────────────────────────────
+
+    def indices(self, ids, strict=False):
+        """Indeksy podanych ID; nieznane ID są pomijane (strict=True → KeyError)"""
+        if strict:
+            return np.fromiter((self.index[i] for i in ids), dtype=np.int64)
+        return np.fromiter((self.index[i] for i in ids if i in self.index), dtype=np.int64)
+
+    def mask(self, ids):
+        """Maska logiczna osobników o podanych ID"""
+        out = np.zeros(len(self), dtype=bool)
+        out[self.indices(ids)] = True
+        return out
+
+    # ── Przejścia po rodowodzie ────────────────────────────────────────
+
+    def descends_from(self, founders):
+        """
+        Maska osobników wywodzących się wyłącznie od podanych założycieli:
+        założyciel albo oboje rodzice znani i spełniający ten sam warunek.
+        Jedno przejście w porządku topologicznym (rodzice przed potomkami).
+        """
+        ok = self.mask(founders)
+        for level in self.levels[1:]:
+            s, d = self.sire[level], self.dam[level]
+            parents_ok = (s >= 0) & (d >= 0) & ok[np.maximum(s, 0)] & ok[np.maximum(d, 0)]
+            ok[level] |= parents_ok
+        return ok
+
+    def ancestors(self, ids, include_self=True):
+        """Maska wszystkich przodków podanych osobników (przejście od najmłodszych)"""
+        start = self.mask(ids)
+        marked = start.copy()
+        for level in reversed(self.levels[1:]):
+            hit = level[marked[level]]
+            for parent in (self.sire[hit], self.dam[hit]):
+                marked[parent[parent >= 0]] = True
+        return marked if include_self else marked & ~start
+
+    def descendants(self, ids, include_self=True):
+        """Maska wszystkich potomków podanych osobników (przejście od najstarszych)"""
+        start = self.mask(ids)
+        marked = start.copy()
+        for level in self.levels[1:]:
+            s, d = self.sire[level], self.dam[level]
+            marked[level] |= (s >= 0) & marked[np.maximum(s, 0)]
+            marked[level] |= (d >= 0) & marked[np.maximum(d, 0)]
+        return marked if include_self else marked & ~start
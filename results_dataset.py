@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+results_dataset.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Wyniki replik przechowywane jako zbiór Parquet partycjonowany po Folder
+  (układ hive: <katalog>/Folder=<wartość>/part-0.parquet)
+• Nowa replika = nowa partycja; istniejące pliki nie są przepisywane
+• Odczyt z filtrowaniem partycji/wierszy i wyborem kolumn (pushdown)
+• Opcjonalne scalanie do jednego pliku strumieniowo (ParquetWriter,
+  po jednej paczce wierszy), bez pd.concat w pamięci
+
+Zbiory:
+• results/homozyg_dataset       – średnia homozygotyczność (merge_hom_part.py)
+• results/genetic_load_dataset  – obciążenie m2 (merge_mut_part.py,
+                                   calculate_genetic_load.py --dataset)
+• results/genetic_load_dominance_dataset – obciążenie i dopasowanie wg h
+                                   (calculate_genetic_load.py --dominance --dataset)
+• results/replicate_summary_dataset – podsumowanie replik (analyze_replicates.py --dataset)
+"""
+
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# ── Ścieżki ─────────────────────────────────────────────────────────────
+BASE = Path("/media/raid/home/kpatan/slim/homozygosity")
+HOM_DATASET = BASE / "results" / "homozyg_dataset"
+LOAD_DATASET = BASE / "results" / "genetic_load_dataset"
+DOMINANCE_DATASET = BASE / "results" / "genetic_load_dominance_dataset"
+REPLICATE_DATASET = BASE / "results" / "replicate_summary_dataset"
+
+PARTITION = "Folder"
+
+
+def partition_dir(root, folder):
+    """Katalog partycji jednej repliki"""
+    return Path(root) / f"{PARTITION}={folder}"
+
+
+def existing_partitions(root):
+    """Wartości Folder (jako tekst) już obecne w zbiorze"""
+    root = Path(root)
+    if not root.exists():
+        return set()
+    prefix = f"{PARTITION}="
+    return {p.name[len(prefix):] for p in root.iterdir()
+            if p.is_dir() and p.name.startswith(prefix)}
+
+
+def append_partition(df, root, folder):
+    """
+    Zapisuje wiersze jednej repliki jako partycję Folder=<folder>.
+    Kolumna Folder nie jest zapisywana w pliku (wynika ze ścieżki).
+    Zapis przez plik tymczasowy + os.replace, więc przerwany zapis
+    nie zostawia uszkodzonej partycji.
+    """
+    out_dir = partition_dir(root, folder)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df.drop(columns=[PARTITION], errors="ignore"),
+                                 preserve_index=False)
+    target = out_dir / "part-0.parquet"
+    tmp = out_dir / ".part-0.parquet.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, target)
+    return target
+
+
+def append_frame(df, root, skip_existing=False):
+    """Dzieli ramkę po Folder i dopisuje każdą replikę jako partycję"""
+    present = existing_partitions(root) if skip_existing else set()
+    written = 0
+    for folder, part in df.groupby(PARTITION, sort=False):
+        if str(folder) in present:
+            continue
+        append_partition(part, root, folder)
+        written += 1
+    return written
+
+
+def open_results(root):
+    """
+    Otwiera zbiór jako pyarrow.dataset.
+    Schematy plików są ujednolicane (np. Year int64/double z różnych replik).
+    """
+    files = sorted(str(p) for p in Path(root).glob(f"{PARTITION}=*/*.parquet"))
+    if not files:
+        raise FileNotFoundError(f"Pusty zbiór wyników: {root}")
+    partitioning = ds.partitioning(flavor="hive")
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files],
+                              promote_options="permissive")
+    part_schema = ds.dataset(files, partitioning=partitioning,
+                             partition_base_dir=str(root)).schema.field(PARTITION)
+    schema = schema.append(part_schema)
+    return ds.dataset(files, schema=schema, format="parquet",
+                      partitioning=partitioning, partition_base_dir=str(root))
+
+
+def _as_expression(filters):
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def read_results(root, columns=None, filters=None):
+    """
+    Czyta zbiór do pandas, wczytując tylko wskazane kolumny i wiersze.
+    filters: wyrażenie pyarrow.dataset albo lista w stylu
+             [("Folder", "in", [1, 2]), ("Year", ">=", 1990)].
+    """
+    table = open_results(root).to_table(columns=columns, filter=_as_expression(filters))
+    return table.to_pandas()
+
+
+def compact(root, out_file, columns=None, filters=None, batch_size=65_536):
+    """
+    Scala zbiór do jednego pliku Parquet strumieniowo – w pamięci jest
+    najwyżej jedna paczka wierszy naraz. Zwraca liczbę zapisanych wierszy.
+    """
+    dataset = open_results(root)
+    out_file = Path(out_file)
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+
+    writer, rows = None, 0
+    try:
+        for batch in dataset.to_batches(columns=columns, filter=_as_expression(filters),
+                                        batch_size=batch_size):
+            if writer is None:
+                writer = pq.ParquetWriter(out_file, batch.schema, compression="zstd")
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
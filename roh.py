@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+roh.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Wspólne obliczenia ROH (Runs of Homozygosity) na macierzy
+  homozygotyczności w oknach (osobniki × okna)
+• Używane przez calculate_roh_pct.py i analyze_replicates.py; okna
+  przeliczane na bp krokiem z window_layout (roh_pct_from_layout)
+• Segmenty ROH: ciągi sąsiednich okien ROH wyznaczane przez kodowanie
+  długości serii (np.diff na całej macierzy, bez pętli po osobnikach)
+• Przegląd progów: histogram okien w przedziałach między progami, więc
+  dowolna liczba progów kosztuje jeden przebieg po macierzy
+"""
+
+import numpy as np
+
+ROH_THRESHOLD = 0.9  # próg dla homozygotyczności, aby zaliczyć okno do ROH
+
+# Granice klas długości ROH w bp: 1–2, 2–4, 4–8, >8 Mb
+LENGTH_CLASSES = (1_000_000, 2_000_000, 4_000_000, 8_000_000)
+
+
+def roh_window_mask(matrix, threshold=ROH_THRESHOLD):
+    """
+    Maska okien ROH (homozygotyczność >= próg).
+    Próg rzutowany jest na typ macierzy, aby w float32 okna równe
+    dokładnie progowi (np. 0.9000) były zaliczone.
+    """
+    matrix = np.asarray(matrix)
+    return matrix >= matrix.dtype.type(threshold)
+
+
+def roh_pct(matrix, step_size, genome_length, threshold=ROH_THRESHOLD):
+    """
+    Odsetek genomu w ROH dla każdego osobnika:
+    liczba okien ROH × step_size / genome_length × 100
+    """
+    num_windows_roh = roh_window_mask(matrix, threshold).sum(axis=1)
+    return (num_windows_roh * step_size / genome_length) * 100
+
+
+def roh_pct_from_layout(matrix, layout, threshold=ROH_THRESHOLD):
+    """
+    ROH% z krokiem okien i długością genomu z window_layout
+    (homozygosity_io.py) – jedno miejsce przeliczenia okien na bp
+    dla calculate_roh_pct.py i analyze_replicates.py
+    """
+    return roh_pct(matrix, layout["step_size"], layout["chrom_length"], threshold)
+
+
+def roh_pct_sweep(matrix, thresholds, step_size, genome_length):
+    """
+    ROH% dla wielu progów naraz.
+    Każde okno trafia do przedziału = liczba progów <= jego wartość;
+    liczba okien >= progu j to suma przedziałów powyżej j (skumulowana od końca).
+    Zwraca macierz (osobniki × len(thresholds)) w kolejności podanych progów.
+    """
+    matrix = np.asarray(matrix)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    order = np.argsort(thresholds)
+    edges = thresholds[order].astype(matrix.dtype)
+
+    n_rows, n_bins = matrix.shape[0], len(edges) + 1
+    bins = np.searchsorted(edges, matrix, side="right")
+    flat = (np.arange(n_rows)[:, None] * n_bins + bins).ravel()
+    hist = np.bincount(flat, minlength=n_rows * n_bins).reshape(n_rows, n_bins)
+
+    at_least = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    counts = np.empty_like(at_least)
+    counts[:, order] = at_least
+    return counts * step_size / genome_length * 100
+
+
+def widen_windows(matrix, window_size, step_size, new_window_size):
+    """
+    Przybliża homozygotyczność w szerszych oknach jako średnią kolejnych okien.
+    Możliwe tylko dla new_window_size = window_size + k × step_size (k >= 0);
+    w przeciwnym razie zwraca None. Średnia jest nieważona liczbą wariantów.
+    """
+    extra = new_window_size - window_size
+    if extra < 0 or extra % step_size:
+        return None
+    k = extra // step_size + 1
+    if k == 1:
+        return matrix
+    csum = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=csum[:, 1:])
+    return (csum[:, k:] - csum[:, :-k]) / k
+
+
+def roh_segments(mask, starts, ends):
+    """
+    Segmenty ROH z maski okien (wiersze × okna).
+    Ciąg sąsiednich okien ROH to jeden segment od początku pierwszego
+    do końca ostatniego okna; nakładające się segmenty tego samego wiersza
+    są scalane, więc nakładanie się okien nie jest liczone podwójnie.
+    Zwraca (rows, seg_start, seg_end, length) – po jednym elemencie na segment.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+
+    # Kolejność wierszowa nonzero paruje początki i końce serii
+    rows, first = np.nonzero(edges == 1)
+    _, after_last = np.nonzero(edges == -1)
+
+    seg_start = np.asarray(starts)[first]
+    seg_end = np.asarray(ends)[after_last - 1]
+
+    # Przy nakładających się oknach serie rozdzielone jednym oknem mogą się
+    # pokrywać – scalamy je, aby żaden odcinek genomu nie był liczony dwa razy
+    if len(rows):
+        new_seg = np.ones(len(rows), dtype=bool)
+        new_seg[1:] = (rows[1:] != rows[:-1]) | (seg_start[1:] > seg_end[:-1])
+        heads = np.flatnonzero(new_seg)
+        rows = rows[heads]
+        seg_start = seg_start[heads]
+        seg_end = np.maximum.reduceat(seg_end, heads)
+    return rows, seg_start, seg_end, seg_end - seg_start
+
+
+def froh_by_class(rows, lengths, n_rows, genome_length, classes=LENGTH_CLASSES):
+    """
+    Odsetek genomu w ROH (%) w klasach długości dla każdego wiersza.
+    Klasa k obejmuje segmenty o długości [classes[k], classes[k+1]),
+    ostatnia – wszystkie >= classes[-1]; krótsze niż classes[0] są pomijane.
+    genome_length: liczba lub tablica (po jednej wartości na wiersz).
+    Zwraca macierz (n_rows × len(classes)).
+    """
+    cls = np.searchsorted(classes, lengths, side="right") - 1
+    keep = cls >= 0
+    flat = rows[keep] * len(classes) + cls[keep]
+    total = np.bincount(flat, weights=lengths[keep], minlength=n_rows * len(classes))
+    genome_length = np.reshape(np.asarray(genome_length, dtype=np.float64), (-1, 1))
+    return total.reshape(n_rows, len(classes)) / genome_length * 100
+
+
+def class_labels(classes=LENGTH_CLASSES):
+    """Nazwy kolumn klas, np. ROH_pct_1_2Mb, ..., ROH_pct_gt8Mb"""
+    mb = [f"{c / 1e6:g}" for c in classes]
+    labels = [f"ROH_pct_{lo}_{hi}Mb" for lo, hi in zip(mb[:-1], mb[1:])]
+    return labels + [f"ROH_pct_gt{mb[-1]}Mb"]
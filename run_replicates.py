@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_replicates.py
+───────────────────────────────────────────────────────────────
+Cel:
+• Zastępuje pętlę run_py_ped_sim_1.sh: repliki py_ped_sim uruchamiane
+  równolegle (limit procesów i budżet pamięci), a nie jedna po drugiej
+• Przypisanie założycieli (12 próbek z i0–i49 → 15, 16, …, 147)
+  losowane z ziarnem zależnym od numeru repliki – powtarzalne
+• Plik manifest.jsonl zapisuje ukończone repliki; ponowne uruchomienie
+  pomija je (wznowienie po przerwaniu)
+• Wyniki finalout_<i>_*.vcf kompresowane strumieniowo zaraz po
+  zakończeniu repliki (bez drugiego przebiegu gzip); domyślnie BGZF
+  z indeksem .tbi (bgzf_index.py), więc działają zapytania o regiony
+• Polecenie symulatora to szablon (--command), więc py_ped_sim można
+  zastąpić innym programem, np. lokalnym zamiennikiem w testach
+
+Pola szablonu: {replicate} {founder_file} {prefix} {pedigree} {vcf} {seed}
+
+Uruchamianie:
+python run_replicates.py --start 1 --end 33 --workers 48 --memory-gb 180 --job-memory-gb 3
+python run_replicates.py --start 1 --end 5 --command "python fake_sim.py {founder_file} {prefix}"
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from bgzf_index import bgzip_vcf
+from pedigree import FOUNDERS
+
+# ── Parametry ───────────────────────────────────────────────────────────
+N_SOURCE_SAMPLES = 50  # próbki i0–i49 w wisentinfo_slim_fil.vcf
+DEFAULT_COMMAND = ("python run_ped_sim.py -t sim_genomes_exact -mu 0 -n {pedigree} "
+                   "-e {founder_file} -v {vcf} -o {prefix}")
+MANIFEST = "manifest.jsonl"
+
+# ── Przypisanie założycieli ─────────────────────────────────────────────
+
+def founder_assignment(replicate, seed=0, founders=FOUNDERS, n_samples=N_SOURCE_SAMPLES):
+    """Losuje różne próbki i<k> dla założycieli; ziarno = (seed, replicate)"""
+    rng = np.random.default_rng([seed, replicate])
+    picks = rng.choice(n_samples, size=len(founders), replace=False)
+    return [(f"i{k}", founder) for k, founder in zip(picks, founders)]
+
+
+def write_founder_file(path, assignment):
+    """Zapis pliku exact_founder_input (wiersze "i7 15") przez plik tymczasowy"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text("".join(f"{sample} {founder}\n" for sample, founder in assignment))
+    os.replace(tmp, path)
+    return path
+
+# ── Manifest ────────────────────────────────────────────────────────────
+
+def read_manifest(path):
+    """Ukończone repliki: numer → wpis (ostatni wpis dla repliki wygrywa)"""
+    done = {}
+    if Path(path).exists():
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                entry = json.loads(line)
+                if entry.get("status") == "done":
+                    done[entry["replicate"]] = entry
+                else:
+                    done.pop(entry["replicate"], None)
+    return {i: e for i, e in done.items() if all(Path(o).exists() for o in e["outputs"])}
+
+
+def append_manifest(path, entry):
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+# ── Kompresja strumieniowa ──────────────────────────────────────────────
+
+def gzip_stream(path, chunk_size=1 << 20):
+    """Kompresuje plik kawałkami do <plik>.gz (przez plik tymczasowy) i usuwa oryginał"""
+    path = Path(path)
+    target = path.with_name(path.name + ".gz")
+    tmp = path.with_name(path.name + ".gz.tmp")
+    with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, chunk_size)
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+# ── Jedna replika ───────────────────────────────────────────────────────
+
+def run_replicate(replicate, args):
+    """Przypisanie założycieli → symulacja → kompresja; zwraca wpis manifestu"""
+    workdir = Path(args.workdir).resolve()
+    # Ścieżki w szablonie (founder_file, pedigree, vcf) są względem katalogu roboczego
+    founder_file = Path(args.founder_dir) / f"exact_founder_input_{replicate}.txt"
+    write_founder_file(workdir / founder_file, founder_assignment(replicate, args.seed))
+    prefix = f"finalout_{replicate}"
+    fields = {"replicate": replicate, "founder_file": founder_file, "prefix": prefix,
+              "pedigree": args.pedigree, "vcf": args.vcf, "seed": args.seed}
+
+    # Pozostałości po przerwanej próbie
+    for stale in workdir.glob(f"{prefix}_*.vcf*"):
+        stale.unlink()
+
+    log_dir = workdir / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    started = time.time()
+    with open(log_dir / f"replicate_{replicate}.log", "w") as log:
+        proc = subprocess.run(shlex.split(args.command.format(**fields)), cwd=workdir,
+                              stdout=log, stderr=subprocess.STDOUT)
+
+    entry = {"replicate": replicate, "seed": args.seed, "founder_file": str(founder_file),
+             "returncode": proc.returncode, "seconds": round(time.time() - started, 1)}
+    outputs = sorted(workdir.glob(f"{prefix}_*.vcf"))
+    if proc.returncode != 0 or not outputs:
+        return {**entry, "status": "failed", "outputs": []}
+
+    if args.compress == "bgzip":
+        outputs = [bgzip_vcf(p) for p in outputs]
+    elif args.compress == "gzip":
+        outputs = [gzip_stream(p) for p in outputs]
+    return {**entry, "status": "done", "outputs": [str(p) for p in outputs]}
+
+# ── Uruchamianie z linii poleceń ─────────────────────────────────────────
+
+def effective_workers(workers, memory_gb=None, job_memory_gb=None):
+    """Liczba równoległych replik: limit procesów i budżet pamięci"""
+    if memory_gb and job_memory_gb:
+        workers = min(workers, max(1, int(memory_gb // job_memory_gb)))
+    return max(1, workers)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run pedigree simulation replicates in parallel, resumably.")
+    ap.add_argument("--start", type=int, default=1)
+    ap.add_argument("--end", type=int, default=33)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--memory-gb", type=float, help="budżet pamięci dla wszystkich replik")
+    ap.add_argument("--job-memory-gb", type=float, help="szacowana pamięć jednej repliki")
+    ap.add_argument("--seed", type=int, default=0, help="ziarno przypisań założycieli")
+    ap.add_argument("--workdir", default=".", help="katalog roboczy symulatora")
+    ap.add_argument("--founder-dir", default="mydata", help="względem --workdir")
+    ap.add_argument("--pedigree", default="mydata/mypedigree.nx")
+    ap.add_argument("--vcf", default="mydata/wisentinfo_slim_fil.vcf")
+    ap.add_argument("--command", default=DEFAULT_COMMAND, help="szablon polecenia symulatora")
+    ap.add_argument("--manifest", default=None, help=f"domyślnie <workdir>/{MANIFEST}")
+    ap.add_argument("--compress", choices=["bgzip", "gzip", "none"], default="bgzip",
+                    help="bgzip: BGZF + indeks .tbi, gzip: zwykły gzip")
+    args = ap.parse_args()
+
+    manifest = Path(args.manifest or Path(args.workdir) / MANIFEST)
+    done = read_manifest(manifest)
+    todo = [i for i in range(args.start, args.end + 1) if i not in done]
+    workers = effective_workers(args.workers, args.memory_gb, args.job_memory_gb)
+    print(f"{len(done)} replik ukończonych, {len(todo)} do uruchomienia ({workers} równolegle)")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futs = {pool.submit(run_replicate, i, args): i for i in todo}
+        for fut in tqdm(as_completed(futs), total=len(futs), desc="Replikacje"):
+            entry = fut.result()
+            append_manifest(manifest, entry)
+            if entry["status"] != "done":
+                failed.append(entry["replicate"])
+
+    if failed:
+        print(f"[!] Nieudane repliki: {sorted(failed)} (logi w {Path(args.workdir) / 'logs'})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -8,86 +8,337 @@ Cel:
 • Dzieli chromosom na przesuwające się okna (sliding windows)
 • Dla każdego osobnika liczy odsetek homozygotycznych pozycji w każdym oknie
 • Zapisuje wynik do osobnych plików tekstowych: output_<ID>.txt
+  albo (tryb kolumnowy) do jednego pliku .parquet / .arrow na replikę
+
+Silnik:
+• Plik VCF czytany jest dokładnie raz (strumieniowo, bez zapytań o region);
+  warianty kolejnych kontigów trafiają do osobnych liczników
+• Magazyn .gts lub VCF z indeksem .tbi/.csi (bgzf_index.py): kontigi
+  liczone równolegle (--workers), każdy proces czyta tylko swój region
+• Dla każdego osobnika budowane są skumulowane liczniki pozycji
+  homozygotycznych i wywołanych (NumPy, sumy prefiksowe)
+• Wartość każdego okna to różnica dwóch sum prefiksowych, więc czas
+  zależy od liczby wariantów, a nie od window_size / step_size
 
 Format wyjściowy:
 Window_center    Homozygosity
 
+Tryb kolumnowy (gdy ścieżka wyjściowa kończy się na .parquet/.arrow/.feather):
+macierz osobniki × okna (float32) + wektor Window_center, patrz homozygosity_io.py;
+przy wielu kontigach okna kontigów następują po sobie (window_layout.contigs),
+a plik tekstowy osobnika ma trzecią kolumnę Contig (okna wszystkich kontigów
+w jednym pliku, czytanym przez homozygosity_io.read_txt_folder)
+
 Przykład uruchomienia:
 python vcf_to_homozygosity.py finalout_17_genomes.vcf.gz out_17 200000 10000
+python vcf_to_homozygosity.py finalout_17_genomes.vcf.gz out_17.parquet 200000 10000
+python vcf_to_homozygosity.py finalout_17_genomes.gts out_17.parquet 200000 10000
+python vcf_to_homozygosity.py bison.vcf.gz bison.parquet 200000 10000 --workers 8 --fai bison.fa.fai
 """
 
-import sys
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from cyvcf2 import VCF
+from homozygosity_io import (
+    contig_layout, is_columnar_path, window_bounds, write_homozygosity_matrix
+)
+from genome import (
+    GENOME_LENGTH, contig_lengths, has_index, load_contigs, select_contigs
+)
+from genotype_store import is_store, open_store
 
-def count_homozygosity_sliding_windows(
-    vcf_file, 
-    output_dir="output_files", 
-    window_size=200000, 
-    step_size=10000, 
-    default_length=106_932_631
+# Kody genotypu w bloku: brak danych / heterozygota / homozygota
+GT_MISSING, GT_HET, GT_HOM = 0, 1, 2
+
+# Liczba wariantów dekodowanych do jednego bloku genotypów
+CHUNK_SIZE = 4096
+
+# Magazyn .gts nie wymaga dekodowania, więc bloki mogą być większe
+STORE_CHUNK_SIZE = 65536
+
+# Dawka (-1 brak, 0, 1, 2) → kod genotypu
+DOSAGE_TO_CODE = np.array([GT_MISSING, GT_HOM, GT_HET, GT_HOM], dtype=np.int8)
+
+# ── Funkcje pomocnicze ──────────────────────────────────────────────────
+
+def encode_genotypes(gt):
+    """
+    Koduje macierz alleli (osobniki × ploidia) do GT_MISSING / GT_HET / GT_HOM.
+    Pomija brakujące dane (np. ./. lub 0/.), tak jak poprzednia pętla.
+    """
+    a0, a1 = gt[:, 0], gt[:, 1]
+    called = (a0 >= 0) & (a1 >= 0)
+    return called.astype(np.int8) + (called & (a0 == a1))
+
+
+def codes_from_dosage(dosage):
+    """Koduje dawki z magazynu .gts do GT_MISSING / GT_HET / GT_HOM"""
+    return DOSAGE_TO_CODE[np.clip(dosage, -1, 2) + 1]
+
+
+def _resolve_boundaries(bounds, b_ptr, limit, positions, block_cum, totals_before, out):
+    """
+    Uzupełnia out[k] = liczniki dla POS <= bounds[k] dla wszystkich granic
+    bounds[k] < limit (te granice nie mogą się już zmienić).
+    """
+    b_end = np.searchsorted(bounds, limit, side="left")
+    if b_end <= b_ptr:
+        return b_ptr
+    rows = np.searchsorted(positions, bounds[b_ptr:b_end], side="right") - 1
+    has_rows = rows >= 0
+    out[b_ptr:b_end][~has_rows] = totals_before
+    out[b_ptr:b_end][has_rows] = block_cum[rows[has_rows]]
+    return b_end
+
+
+class WindowCounter:
+    """
+    Akumulator liczników homozygotyczności w oknach przesuwnych.
+
+    Przyjmuje kolejne bloki (positions, codes) posortowane po POS, gdzie
+    codes ma kształt (warianty × osobniki) i wartości GT_MISSING/GT_HET/GT_HOM.
+    Trzyma skumulowane liczniki tylko w granicach okien, więc pamięć zależy
+    od liczby okien × osobników, a nie od liczby wariantów.
+    """
+
+    def __init__(self, chrom_length, n_samples, window_size=200000, step_size=10000):
+        starts, ends, self.centers = window_bounds(chrom_length, window_size, step_size)
+
+        # Okno [start, end] = C(end) − C(start − 1), gdzie C(x) to liczniki dla POS <= x
+        self.bounds, inverse = np.unique(np.concatenate([starts - 1, ends]), return_inverse=True)
+        self.lo_idx, self.hi_idx = inverse[:len(starts)], inverse[len(starts):]
+
+        self.hom_at = np.zeros((len(self.bounds), n_samples), dtype=np.int32)
+        self.called_at = np.zeros((len(self.bounds), n_samples), dtype=np.int32)
+        self.hom_total = np.zeros(n_samples, dtype=np.int32)
+        self.called_total = np.zeros(n_samples, dtype=np.int32)
+        self.b_ptr = 0
+
+    def update(self, positions, codes):
+        """Dodaje blok wariantów (positions rosnąco, codes: warianty × osobniki)"""
+        if len(positions) == 0:
+            return
+        hom_cum = np.cumsum(codes == GT_HOM, axis=0, dtype=np.int32)
+        called_cum = np.cumsum(codes != GT_MISSING, axis=0, dtype=np.int32)
+        hom_cum += self.hom_total
+        called_cum += self.called_total
+        # Granice < ostatniej pozycji bloku są już ostateczne (VCF jest posortowany)
+        limit = positions[-1]
+        _resolve_boundaries(self.bounds, self.b_ptr, limit, positions,
+                            hom_cum, self.hom_total, self.hom_at)
+        self.b_ptr = _resolve_boundaries(self.bounds, self.b_ptr, limit, positions,
+                                         called_cum, self.called_total, self.called_at)
+        self.hom_total = hom_cum[-1].copy()
+        self.called_total = called_cum[-1].copy()
+
+    def result(self):
+        """Zwraca (centers, matrix) – odsetek homozygot (osobniki × okna)"""
+        # Pozostałe granice obejmują wszystkie warianty
+        self.hom_at[self.b_ptr:] = self.hom_total
+        self.called_at[self.b_ptr:] = self.called_total
+
+        hom = (self.hom_at[self.hi_idx] - self.hom_at[self.lo_idx]).T
+        called = (self.called_at[self.hi_idx] - self.called_at[self.lo_idx]).T
+        matrix = np.divide(hom, called, out=np.zeros(hom.shape), where=called > 0)
+        return self.centers, matrix
+
+
+# ── Kontigi ─────────────────────────────────────────────────────────────
+
+def feed_counters(variants, counters, n_samples, chunk_size=CHUNK_SIZE, new_counter=None):
+    """
+    Rozdziela warianty do liczników kontigów (słownik nazwa → WindowCounter)
+    w jednym przebiegu; warianty spoza słownika są pomijane, chyba że
+    new_counter(nazwa) tworzy dla nich nowy licznik (VCF bez ##contig).
+    """
+    gt_block = np.empty((chunk_size, n_samples), dtype=np.int8)
+    pos_block = np.empty(chunk_size, dtype=np.int64)
+    current, n = None, 0
+    for variant in variants:
+        counter = counters.get(variant.CHROM)
+        if counter is None:
+            if new_counter is None:
+                continue
+            counter = counters[variant.CHROM] = new_counter(variant.CHROM)
+        if counter is not current:
+            if n:
+                current.update(pos_block[:n], gt_block[:n])
+            current, n = counter, 0
+        gt_block[n] = encode_genotypes(variant.genotype.array())
+        pos_block[n] = variant.POS
+        n += 1
+        if n == chunk_size:
+            current.update(pos_block, gt_block)
+            n = 0
+    if n:
+        current.update(pos_block[:n], gt_block[:n])
+
+
+def contig_matrix(source, chrom, chrom_length, window_size=200000, step_size=10000):
+    """
+    (centers, matrix) jednego kontigu: wycinek magazynu .gts albo zapytanie
+    o region w zindeksowanym VCF – zadanie dla puli procesów.
+    """
+    if is_store(source):
+        store = open_store(source)
+        counter = WindowCounter(chrom_length, len(store.samples), window_size, step_size)
+        for positions, dosages in store.iter_blocks(STORE_CHUNK_SIZE, chrom=chrom):
+            counter.update(positions, codes_from_dosage(dosages))
+        return counter.result()
+    vcf = VCF(str(source))
+    counter = WindowCounter(chrom_length, len(vcf.samples), window_size, step_size)
+    feed_counters(vcf(chrom), {chrom: counter}, len(vcf.samples))
+    return counter.result()
+
+
+def homozygosity_by_contig(
+    vcf_file,
+    window_size=200000,
+    step_size=10000,
+    default_length=GENOME_LENGTH,
+    contigs=None,
+    workers=1,
+    chunk_size=CHUNK_SIZE,
 ):
-    # Upewnij się, że katalog wyjściowy istnieje
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    """
+    Homozygotyczność w oknach osobno dla każdego kontigu.
+    contigs: lista (nazwa, długość); domyślnie z nagłówka VCF / magazynu.
+    Magazyn .gts i VCF z indeksem (.tbi/.csi): kontigi liczone równolegle
+    w puli workers procesów; pozostałe VCF – jeden przebieg rozdzielający
+    warianty do liczników kontigów.
+    Zwraca (sample_names, contigs, parts), parts[k] = (centers, matrix) kontigu k.
+    """
+    source = open_store(vcf_file) if is_store(vcf_file) else VCF(str(vcf_file))
+    sample_names = source.samples
+    if contigs is None:
+        contigs = contig_lengths(source, default_length)
+    contigs = list(contigs)
+
+    if is_store(vcf_file) or (has_index(vcf_file) and workers > 1 and len(contigs) > 1):
+        tasks = [(vcf_file, name, length, window_size, step_size) for name, length in contigs]
+        if workers > 1 and len(contigs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(contigs))) as pool:
+                parts = list(pool.map(contig_matrix, *zip(*tasks)))
+        else:
+            parts = [contig_matrix(*task) for task in tasks]
+        return sample_names, contigs, parts
+
+    # Jeden przebieg po VCF (bez indeksu albo bez równoległości)
+    n_samples = len(sample_names)
+    make = lambda length: WindowCounter(length, n_samples, window_size, step_size)
+    counters = {name: make(length) for name, length in contigs}
+
+    def discover(name):
+        # VCF bez ##contig – kontigi w kolejności z pliku, długość domyślna
+        contigs.append((name, default_length))
+        return make(default_length)
+
+    feed_counters(source, counters, n_samples, chunk_size, None if contigs else discover)
+    return sample_names, contigs, [counters[name].result() for name, _ in contigs]
+
 
-    vcf = VCF(vcf_file)
-    chrom_name = vcf.seqnames[0]
+def combine_contigs(contigs, parts, window_size=200000, step_size=10000):
+    """Okna wszystkich kontigów kolejno: (centers, matrix, layout)"""
+    centers = np.concatenate([c for c, _ in parts])
+    matrix = np.hstack([m for _, m in parts])
+    return centers, matrix, contig_layout(contigs, window_size, step_size)
 
-    # Pobranie długości chromosomu (jeśli nie podano w nagłówku, użyj default_length)
-    try:
-        chrom_length = vcf.seqlens[0]
-    except AttributeError:
-        chrom_length = default_length
 
-    sample_names = vcf.samples  # Lista nazw osobników w VCF
+def homozygosity_matrix(
+    vcf_file,
+    window_size=200000,
+    step_size=10000,
+    default_length=GENOME_LENGTH,
+    chunk_size=CHUNK_SIZE,
+    contigs=None,
+    workers=1,
+):
+    """
+    Liczy homozygotyczność w oknach przesuwnych w jednym przebiegu po VCF.
+
+    Zwraca (sample_names, centers, matrix), gdzie matrix ma kształt
+    (liczba osobników × liczba okien) i zawiera odsetek pozycji
+    homozygotycznych (0 dla okien bez wywołanych genotypów).
+    Przy wielu kontigach okna kolejnych kontigów następują po sobie
+    (patrz homozygosity_by_contig).
+    vcf_file może też wskazywać katalog magazynu .gts (genotype_store.py).
+    """
+    sample_names, contigs, parts = homozygosity_by_contig(
+        vcf_file, window_size, step_size, default_length, contigs, workers, chunk_size
+    )
+    centers, matrix, _ = combine_contigs(contigs, parts, window_size, step_size)
+    return sample_names, centers, matrix
+
 
-    # Utwórz pliki wyjściowe z nagłówkiem dla każdego osobnika
-    for sample in sample_names:
+def write_txt(output_dir, sample_names, centers, matrix, window_contigs=None):
+    """
+    Jeden zapis na osobnika: output_<ID>.txt z kolumnami Window_center,
+    Homozygosity; window_contigs (kontig każdego okna) – trzecia kolumna Contig.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    header = "Window_center\tHomozygosity"
+    if window_contigs is not None:
+        header += "\tContig"
+        contig_column = np.asarray(window_contigs, dtype=str)
+    for sample, row in zip(sample_names, matrix):
         filename = os.path.join(output_dir, f"output_{sample}.txt")
-        with open(filename, "w") as fh:
-            fh.write("Window_center\tHomozygosity\n")
-
-    # Przesuwanie się po genomie oknami (sliding window)
-    for start in range(0, chrom_length, step_size):
-        end = min(start + window_size, chrom_length)
-        center = (start + end) // 2
-
-        # Liczniki dla każdego osobnika
-        homozygous_counts = {sample: 0 for sample in sample_names}
-        total_counts = {sample: 0 for sample in sample_names}
-
-        # Iteracja po wariantach w bieżącym oknie
-        for variant in vcf(f"{chrom_name}:{start}-{end}"):
-            for idx, genotype in enumerate(variant.genotypes):
-                # Pomijamy brakujące dane (np. ./.)
-                if genotype[0] < 0 or genotype[1] < 0:
-                    continue
-                sample = sample_names[idx]
-                total_counts[sample] += 1
-                if genotype[0] == genotype[1]:
-                    homozygous_counts[sample] += 1
-
-        # Oblicz homozygotyczność i dopisz do pliku
-        for sample in sample_names:
-            if total_counts[sample] > 0:
-                homozygosity = homozygous_counts[sample] / total_counts[sample]
-            else:
-                homozygosity = 0
-            filename = os.path.join(output_dir, f"output_{sample}.txt")
-            with open(filename, "a") as fh:
-                fh.write(f"{center}\t{homozygosity:.4f}\n")
+        if window_contigs is None:
+            data, fmt = np.column_stack([centers, row]), ("%d", "%.4f")
+        else:
+            data = np.column_stack([np.char.mod("%d", centers), np.char.mod("%.4f", row),
+                                    contig_column])
+            fmt = "%s"
+        np.savetxt(filename, data, fmt=fmt, delimiter="\t", header=header, comments="")
+
+
+def count_homozygosity_sliding_windows(
+    vcf_file,
+    output_dir="output_files",
+    window_size=200000,
+    step_size=10000,
+    default_length=GENOME_LENGTH,
+    contigs=None,
+    workers=1,
+):
+    sample_names, contigs, parts = homozygosity_by_contig(
+        vcf_file, window_size, step_size, default_length, contigs, workers
+    )
+
+    # Tryb kolumnowy: jeden plik na replikę (okna wszystkich kontigów)
+    if is_columnar_path(output_dir):
+        centers, matrix, layout = combine_contigs(contigs, parts, window_size, step_size)
+        write_homozygosity_matrix(output_dir, sample_names, centers, matrix, layout)
+        return
+
+    # Pliki tekstowe: przy wielu kontigach jeden plik na osobnika z kolumną Contig
+    if len(contigs) == 1:
+        write_txt(output_dir, sample_names, *parts[0])
+        return
+    centers, matrix, _ = combine_contigs(contigs, parts, window_size, step_size)
+    window_contigs = np.repeat([str(name) for name, _ in contigs],
+                               [len(part_centers) for part_centers, _ in parts])
+    write_txt(output_dir, sample_names, centers, matrix, window_contigs)
 
 # ── Uruchamianie z linii poleceń ─────────────────────────────────────────
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python vcf_to_homozygosity_windows.py <vcf_file> [output_dir] [window_size] [step_size]")
-        sys.exit(1)
+def main():
+    ap = argparse.ArgumentParser(description="Sliding-window homozygosity per sample from a VCF.")
+    ap.add_argument("vcf_file", help="VCF (.vcf/.vcf.gz) lub magazyn .gts")
+    ap.add_argument("output_dir", nargs="?", default="output_files",
+                    help="katalog plików .txt albo plik .parquet/.arrow")
+    ap.add_argument("window_size", nargs="?", type=int, default=200000)
+    ap.add_argument("step_size", nargs="?", type=int, default=10000)
+    ap.add_argument("--contigs", nargs="+", help="wybrane kontigi (domyślnie wszystkie z nagłówka)")
+    ap.add_argument("--fai", help="długości kontigów z indeksu FASTA (.fai) lub GFF3")
+    ap.add_argument("--workers", type=int, default=1, help="kontigi liczone równolegle")
+    args = ap.parse_args()
 
-    vcf_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) >= 3 else "output_files"
-    window_size = int(sys.argv[3]) if len(sys.argv) >= 4 else 200000
-    step_size = int(sys.argv[4]) if len(sys.argv) >= 5 else 10000
+    contigs = load_contigs(args.fai) if args.fai else load_contigs(args.vcf_file)
+    contigs = select_contigs(contigs, args.contigs) if (args.fai or args.contigs) else None
+    count_homozygosity_sliding_windows(args.vcf_file, args.output_dir, args.window_size,
+                                       args.step_size, contigs=contigs, workers=args.workers)
 
-    count_homozygosity_sliding_windows(vcf_file, output_dir, window_size, step_size)
+if __name__ == "__main__":
+    main()